@@ -0,0 +1,772 @@
+import base64
+import os
+import sys
+import time
+
+import numpy as np
+
+from backend.BinEffect import BinStatistics, compute_bin_effect
+from backend.EffectCurves import (encode_curves, global_curve, partition_tree, partitioning_text, regional_curve,
+                                  statistics_curve)
+from backend.JacobianEngine import FiniteDifferenceJacobian, KerasJacobian
+from backend.KerasInference import KerasInference
+from backend.LRUCache import LRUCache
+from backend.Metrics import metrics
+from backend.PlotRenderer import IMAGE_FORMATS, renderer_from_env
+from backend.PredictionCache import PredictionCache
+from backend.ResultStore import result_key, result_store_from_env
+from backend.Startup import lazy_import
+from backend.Subsampler import SAMPLE_STRATEGIES, Subsampler, rows_within_budget
+
+
+def encode_plot_to_base64(image_bytes):
+    return base64.b64encode(image_bytes).decode('utf-8')
+
+
+# Rendering pool shared by requests; job workers render inline
+_plot_renderer = None
+
+
+def get_plot_renderer():
+    global _plot_renderer
+    if _plot_renderer is None:
+        _plot_renderer = renderer_from_env()
+    return _plot_renderer
+
+
+def shutdown_plot_renderer():
+    global _plot_renderer
+    if _plot_renderer is not None:
+        _plot_renderer.shutdown()
+        _plot_renderer = None
+
+
+def _patch_effector(module):
+    # Override the utils function with the vectorized O(N log B) version
+    module.utils.compute_bin_effect = compute_bin_effect
+
+
+# Imported on the first analysis, so the server starts without them
+effector = lazy_import('effector', on_import=_patch_effector)
+tf = lazy_import('tensorflow')
+
+
+def is_keras_model(model):
+    # Keras models can only exist once TensorFlow is imported; this avoids importing it for other models
+    return 'tensorflow' in sys.modules and isinstance(model, tf.keras.Model)
+
+
+def make_keras_jacobian(model):
+    """Compiled Jacobian service for a loaded Keras model, cached in the model registry"""
+    return KerasJacobian(
+        model,
+        chunk_size=int(os.environ.get('JACOBIAN_CHUNK_SIZE', 8192)),
+        jit_compile=os.environ.get('JACOBIAN_XLA', '0') == '1'
+    )
+
+
+def get_model_jacobian(model_registry, model_id, model, params, features):
+    """Autodiff Jacobian for Keras models, batched finite differences for everything else"""
+    if is_keras_model(model):
+        return model_registry.artifact(model_id, 'jacobian', make_keras_jacobian)
+
+    # Effector only reads the columns of the analyzed features
+    return FiniteDifferenceJacobian(
+        model.predict,
+        step=params['jacobian_step'],
+        relative_step=params['jacobian_relative_step'],
+        central=params['jacobian_central'],
+        features=features,
+        rows_independent=getattr(model, 'rows_independent', True)
+    )
+
+
+def make_keras_inference(model):
+    """Compiled predict function for a loaded Keras model, cached in the model registry"""
+    return KerasInference(
+        model,
+        max_batch=int(os.environ.get('KERAS_INFERENCE_BATCH', 8192)),
+        jit_compile=os.environ.get('KERAS_INFERENCE_XLA', '0') == '1'
+    )
+
+
+def get_model_inference(model_registry, model_id, model):
+    """Compiled inference for Keras models, their own predict for everything else"""
+    if is_keras_model(model):
+        return model_registry.artifact(model_id, 'inference', make_keras_inference)
+    return model.predict
+
+
+def make_prediction_cache(model, predict=None):
+    """Memoized predict function of a loaded model, cached in the model registry"""
+    return PredictionCache(
+        metrics.timed_predict(predict or model.predict),
+        max_rows=int(os.environ.get('PREDICTION_CACHE_ROWS', 1_000_000)),
+        rows_independent=getattr(model, 'rows_independent', True)
+    )
+
+
+def get_model_predict(model_registry, model_id, model, params):
+    """Timed predict function passed to effector, memoized when the request opts in"""
+    predict = get_model_inference(model_registry, model_id, model)
+    if params.get('prediction_cache'):
+        return model_registry.artifact(model_id, 'prediction_cache',
+                                       lambda loaded: make_prediction_cache(loaded, predict))
+    return metrics.timed_predict(predict)
+
+
+ANALYSIS_METHODS = ('pdp', 'rhale', 'regional_rhale', 'regional_pdp')
+
+# Rows used by RHALE and for the average model output, as in effector's own default
+GLOBAL_NOF_INSTANCES = 10_000
+
+
+def parse_bool(value, default=False):
+    if value is None:
+        return default
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def parse_list(value):
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+
+def parse_sample_size(value):
+    if value is None or value == '':
+        return None
+    if value == 'all':
+        return 'all'
+    size = int(value)
+    if size < 1:
+        raise ValueError(f"Invalid sample_size {value}; use a positive number of rows or 'all'")
+    return size
+
+
+def parse_plot_options(form):
+    """Rendering options given in the request; the rest come from the renderer defaults"""
+    options = {}
+    if form.get('dpi'):
+        options['dpi'] = int(form.get('dpi'))
+    if form.get('figsize'):
+        options['figsize'] = tuple(float(size) for size in parse_list(form.get('figsize')))
+        if len(options['figsize']) != 2:
+            raise ValueError("figsize must be 'width,height' in inches")
+    if form.get('image_format'):
+        options['image_format'] = form.get('image_format')
+        if options['image_format'] not in IMAGE_FORMATS:
+            raise ValueError(f"Invalid image_format {options['image_format']}; choose from {', '.join(IMAGE_FORMATS)}")
+    if form.get('compress_image') is not None:
+        options['compress'] = parse_bool(form.get('compress_image'))
+    return options
+
+
+def parse_analysis_params(form):
+    """Typed analysis parameters from the request form"""
+    params = {
+        'method': form.get('method', 'pdp'),
+        'feature_index': int(form.get('feature_index', 0)),
+        'target_name': form.get('target_name', 'prediction'),
+        'node_idx': int(form.get('node_idx', 1)),
+        'jacobian_step': float(form.get('jacobian_step', 1e-2)),
+        'jacobian_relative_step': parse_bool(form.get('jacobian_relative_step'), default=True),
+        'jacobian_central': parse_bool(form.get('jacobian_central'), default=True),
+        'output': form.get('output', 'plot'),
+        'curve_encoding': form.get('curve_encoding', 'json'),
+        'nof_points': int(form.get('nof_points', 30)),
+        'plot_options': parse_plot_options(form),
+        'use_cache': parse_bool(form.get('use_cache'), default=True),
+        'prediction_cache': parse_bool(form.get('prediction_cache'), default=False),
+        'sample_strategy': form.get('sample_strategy', 'uniform'),
+        'sample_size': parse_sample_size(form.get('sample_size')),
+        'seed': int(form.get('seed', 0)),
+        'budget_rows': int(form['budget_rows']) if form.get('budget_rows') else None,
+        'budget_seconds': float(form['budget_seconds']) if form.get('budget_seconds') else None,
+        'incremental': parse_bool(form.get('incremental'))
+    }
+    if params['output'] not in ('plot', 'curves'):
+        raise ValueError(f"Invalid output {params['output']}; choose from plot, curves")
+    if params['curve_encoding'] not in ('json', 'base64'):
+        raise ValueError(f"Invalid curve_encoding {params['curve_encoding']}; choose from json, base64")
+    if params['sample_strategy'] not in SAMPLE_STRATEGIES:
+        raise ValueError(f"Invalid sample_strategy {params['sample_strategy']}; "
+                         f"choose from {', '.join(SAMPLE_STRATEGIES)}")
+    return params
+
+
+def parse_batch_params(form, n_features):
+    """Analysis parameters plus the feature and method lists of a batch request"""
+    params = parse_analysis_params(form)
+
+    features = form.get('features', 'all')
+    if features == 'all':
+        params['features'] = list(range(n_features))
+    else:
+        params['features'] = [int(feature) for feature in parse_list(features)]
+    invalid = [feature for feature in params['features'] if not 0 <= feature < n_features]
+    if invalid or not params['features']:
+        raise ValueError(f"Invalid features {invalid or features}; the dataset has {n_features} features")
+
+    params['methods'] = parse_list(form.get('methods', 'pdp,rhale'))
+    invalid = [method for method in params['methods'] if method not in ANALYSIS_METHODS]
+    if invalid or not params['methods']:
+        raise ValueError(f"Invalid methods {invalid or params['methods']}; choose from {', '.join(ANALYSIS_METHODS)}")
+
+    try:
+        params['n_jobs'] = int(form.get('n_jobs', 1))
+    except ValueError:
+        params['n_jobs'] = 0
+    if params['n_jobs'] < 1:
+        raise ValueError(f"Invalid n_jobs {form.get('n_jobs')}; use a positive number of jobs")
+
+    return params
+
+
+def split_batch_params(params, n_jobs):
+    """Split the features of a batch into at most n_jobs batches of similar size"""
+    features = params['features']
+    n_jobs = max(1, min(n_jobs, len(features)))
+    return [{**params, 'features': features[i::n_jobs]} for i in range(n_jobs)]
+
+
+def merge_batch_results(results_list):
+    merged = {}
+    for results in results_list:
+        for method, per_feature in results.items():
+            merged.setdefault(method, {}).update(per_feature)
+    return merged
+
+
+# Fixed settings of each method. They are part of the result cache key, so
+# changing one invalidates the cached results of that method.
+REGIONAL_RHALE_BINNING = {
+    'init_nof_bins': 100,
+    'min_points_per_bin': 100,
+    'discount': 1.,
+    'cat_limit': 10
+}
+
+REGIONAL_RHALE_FIT = {
+    'heter_small_enough': 0.1,
+    'heter_pcg_drop_thres': 0.2,
+    'max_depth': 2,
+    'nof_candidate_splits_for_numerical': 10,
+    'min_points_per_subregion': 10,
+    'candidate_conditioning_features': "all",
+    'split_categorical_features': True
+}
+
+REGIONAL_PDP_FIT = {
+    'heter_small_enough': 0.1,
+    'heter_pcg_drop_thres': 0.1,
+    'max_depth': 2,
+    'nof_candidate_splits_for_numerical': 5,
+    'min_points_per_subregion': 10,
+    'candidate_conditioning_features': "all",
+    'split_categorical_features': True
+}
+
+# nof_instances is the default sample size; effector gets the presampled rows
+METHOD_SETTINGS = {
+    'pdp': {'nof_instances': 300},
+    'rhale': {'nof_instances': GLOBAL_NOF_INSTANCES, 'binning': 'greedy'},
+    'regional_rhale': {'nof_instances': 'all', 'cat_limit': 10, 'binning': REGIONAL_RHALE_BINNING,
+                       'fit': REGIONAL_RHALE_FIT},
+    'regional_pdp': {'nof_instances': 1000, 'cat_limit': 10, 'fit': REGIONAL_PDP_FIT}
+}
+
+# Model evaluations per sampled row and feature, besides the nof_points curve evaluation of PDPs
+MODEL_EVALUATIONS_PER_ROW = {
+    'pdp': 0,
+    'rhale': 2,
+    'regional_rhale': 2,
+    'regional_pdp': 50
+}
+
+# Progressive analyses start on this many rows and grow the sample by PROGRESSIVE_GROWTH per stage
+PROGRESSIVE_FIRST_ROWS = 500
+PROGRESSIVE_GROWTH = 8
+# RHALE bins of the first stage, doubled per stage; the exact stage uses greedy binning
+PROGRESSIVE_FIRST_BINS = 10
+
+# Bump when the cached analysis format or computation changes
+RESULT_VERSION = 2
+
+
+def create_effect(method, X_train, predict, feature_names, params, data_effect=None):
+    """Build the effector object of a method, reusing a precomputed Jacobian when given"""
+    settings = METHOD_SETTINGS[method]
+
+    if method == 'pdp':
+        return effector.PDP(
+            data=X_train,
+            model=predict,
+            feature_names=feature_names,
+            target_name=params['target_name'],
+            nof_instances='all'
+        )
+
+    elif method == 'rhale':
+        return effector.RHALE(
+            data=X_train,
+            model=predict,
+            data_effect=data_effect,
+            feature_names=feature_names,
+            target_name=params['target_name']
+        )
+
+    elif method == 'regional_rhale':
+        return effector.RegionalRHALE(
+            data=X_train,
+            model=predict,
+            data_effect=data_effect,
+            cat_limit=settings['cat_limit'],
+            feature_names=feature_names,
+            nof_instances='all'
+        )
+
+    elif method == 'regional_pdp':
+        return effector.RegionalPDP(
+            data=X_train,
+            model=predict,
+            cat_limit=settings['cat_limit'],
+            feature_names=feature_names,
+            nof_instances='all'
+        )
+
+    raise ValueError(f"Unknown method: {method}")
+
+
+def fit_regional(effect, method, feature_index):
+    if method == 'regional_rhale':
+        effect.fit(
+            features=feature_index,
+            binning_method=effector.binning_methods.Greedy(**REGIONAL_RHALE_BINNING),
+            **REGIONAL_RHALE_FIT
+        )
+
+    elif method == 'regional_pdp':
+        effect.fit(features=feature_index, **REGIONAL_PDP_FIT)
+
+
+def analyze_feature(effect, method, feature_index, params):
+    """Fit one feature on an effector object and return its numeric analysis
+
+    The analysis holds the curve, the plot title and, for regional methods,
+    the partition tree and its text summary. It does not depend on the output
+    options, so it is what the result store caches.
+    """
+    analysis = {'title': None}
+
+    if method in ('regional_rhale', 'regional_pdp'):
+        fit_regional(effect, method, feature_index)
+        analysis['partitioning_info'] = partitioning_text(effect, feature_index)
+        analysis['partition_tree'] = partition_tree(effect, feature_index)
+        analysis['curve'] = regional_curve(effect, method, feature_index, params['node_idx'], params['nof_points'])
+        analysis['title'] = next((node['name'] for node in analysis['partition_tree']
+                                  if node['idx'] == analysis['curve']['node_idx']), None)
+    else:
+        if method == 'rhale' and params.get('rhale_bins'):
+            # Coarse fixed binning of progressive stages
+            binning = effector.binning_methods.Fixed(nof_bins=params['rhale_bins'], min_points_per_bin=0)
+            effect.fit(features=feature_index, centering=True, binning_method=binning)
+        analysis['curve'] = global_curve(effect, method, feature_index, params['nof_points'])
+
+    return analysis
+
+
+def analysis_key(model_id, dataset_id, method, feature_index, params):
+    """Result store key of one method on one feature"""
+    parts = {
+        'version': RESULT_VERSION,
+        'model_id': model_id,
+        'dataset_id': dataset_id,
+        'method': method,
+        'feature_index': feature_index,
+        'settings': METHOD_SETTINGS[method],
+        'nof_points': params['nof_points']
+    }
+    if method.startswith('regional'):
+        parts['node_idx'] = params['node_idx']
+    if method in ('rhale', 'regional_rhale'):
+        parts['jacobian'] = [params['jacobian_step'], params['jacobian_relative_step'], params['jacobian_central']]
+    parts['sampling'] = [params.get(name) for name in
+                         ('sample_strategy', 'sample_size', 'seed', 'budget_rows', 'budget_seconds')]
+    return result_key('analysis', **parts)
+
+
+# Incremental RHALE states of this process, used when there is no result store
+_incremental_states = LRUCache(max_items=int(os.environ.get('INCREMENTAL_STATES_MAX', 256)))
+
+
+def incremental_key(model_id, dataset_id, feature_index, params):
+    """Store key of the incremental RHALE state of one feature"""
+    return result_key(
+        'incremental_rhale',
+        version=RESULT_VERSION,
+        model_id=model_id,
+        dataset_id=dataset_id,
+        feature_index=feature_index,
+        binning=METHOD_SETTINGS['rhale']['binning'],
+        jacobian=[params['jacobian_step'], params['jacobian_relative_step'], params['jacobian_central']]
+    )
+
+
+def load_incremental_state(result_store, key):
+    return _incremental_states.get(key) if result_store is None else result_store.get(key)
+
+
+def save_incremental_state(result_store, key, state):
+    if result_store is None:
+        _incremental_states.put(key, state)
+    else:
+        result_store.put(key, state, kind='incremental')
+
+
+def _predict_rows(predict, x, skip):
+    return np.asarray(predict(x)).reshape(len(x), -1)[skip:, 0]
+
+
+def run_incremental_rhale(model_registry, model_id, X_train, features, params, lineage, result_store=None):
+    """RHALE analyses updated from the bin statistics of an earlier version of the dataset
+
+    lineage lists [dataset_id, n_rows] of the dataset and of the datasets it
+    was appended to, newest first. The stored state of the newest of them is
+    updated with the Jacobian and the predictions of the rows appended since,
+    so the cost grows with the new rows only. Features without a state, or
+    all features with use_cache=false, are fitted on all rows with greedy
+    bins, which later updates keep and extend. Every row is used; sampling
+    parameters do not apply. Returns {feature_index: analysis}.
+    """
+    model = model_registry.get(model_id)
+    predict = get_model_predict(model_registry, model_id, model, params)
+    dataset_id, n_rows = lineage[0]
+    # Sequence models predict a row from the rows before it, which the new rows need as context
+    context = getattr(model, 'context_rows', 0)
+
+    starts = {}
+    previous = {}
+    for feature_index in features:
+        starts[feature_index] = 0
+        if not params.get('use_cache', True):
+            continue
+        for ancestor_id, ancestor_rows in lineage:
+            state = load_incremental_state(result_store, incremental_key(model_id, ancestor_id, feature_index, params))
+            if state is not None and state['n_rows'] == ancestor_rows:
+                starts[feature_index] = ancestor_rows
+                previous[feature_index] = state
+                break
+
+    analyses = {}
+    for start in sorted(set(starts.values())):
+        group = [feature_index for feature_index in features if starts[feature_index] == start]
+        first = max(0, start - context)
+        rows = np.asarray(X_train[first:])
+
+        model_jac = get_model_jacobian(model_registry, model_id, model, params, group)
+        if isinstance(model_jac, FiniteDifferenceJacobian) and model_jac.relative_step:
+            # Appended rows use the steps of the first fit, which depend on its rows
+            if start:
+                model_jac.step = [previous[feature_index]['jacobian_step'] for feature_index in group]
+            else:
+                model_jac.step = model_jac.step_sizes(rows, group)
+            model_jac.relative_step = False
+        steps = np.broadcast_to(model_jac.step, len(group)) if isinstance(model_jac, FiniteDifferenceJacobian) \
+            else [None] * len(group)
+        if start < n_rows:
+            with metrics.timed('jacobian'):
+                data_effect = np.asarray(model_jac(rows))[start - first:]
+            prediction_sum = float(np.sum(_predict_rows(predict, rows, start - first)))
+            metrics.increment('incremental_rows', n_rows - start)
+        else:
+            # Analyzed already; the stored state is current
+            data_effect = np.zeros((0, X_train.shape[1]))
+            prediction_sum = 0.0
+        if not start:
+            axis_limits = np.array([np.min(rows, axis=0), np.max(rows, axis=0)])
+
+        for k, feature_index in enumerate(group):
+            with metrics.timed('fit'):
+                if start:
+                    state = previous[feature_index]
+                    statistics = state['statistics'].copy()
+                    feature_prediction_sum = state['prediction_sum'] + prediction_sum
+                else:
+                    bins = effector.binning_methods.find_limits(X_train, data_effect, feature_index, axis_limits,
+                                                                METHOD_SETTINGS['rhale']['binning'])
+                    if bins.limits is False:
+                        raise ValueError(f"Impossible to compute bins for feature {feature_index}")
+                    statistics = BinStatistics(bins.limits)
+                    feature_prediction_sum = prediction_sum
+                statistics.update(X_train[start:, feature_index], data_effect[:, feature_index])
+
+                curve = statistics_curve(statistics, avg_output=feature_prediction_sum / n_rows)
+
+            save_incremental_state(result_store, incremental_key(model_id, dataset_id, feature_index, params), {
+                'n_rows': n_rows,
+                'statistics': statistics,
+                'prediction_sum': feature_prediction_sum,
+                'jacobian_step': steps[k]
+            })
+            analyses[feature_index] = {'title': None, 'curve': curve, 'sample_size': n_rows,
+                                       'updated_rows': n_rows - start}
+
+    return analyses
+
+
+def sample_sizes(predict, X_train, missing, params):
+    """Rows sampled per method, capped by the row and time budgets of the request"""
+    sizes = {}
+    for method, _ in missing:
+        size = params.get('sample_size') or METHOD_SETTINGS[method]['nof_instances']
+        size = len(X_train) if size == 'all' else min(int(size), len(X_train))
+        if params.get('budget_rows'):
+            size = min(size, params['budget_rows'])
+        sizes[method] = size
+
+    if params.get('budget_seconds') and missing:
+        evaluations = sum(MODEL_EVALUATIONS_PER_ROW[method] + params['nof_points'] for method, _ in missing)
+        budget = rows_within_budget(predict, X_train, evaluations, params['budget_seconds'])
+        sizes = {method: min(size, budget) for method, size in sizes.items()}
+    return sizes
+
+
+def render_plot(result_store, read_store, key, analysis, method, feature_name, params):
+    """Start rendering a plot, or return the stored image; returns (future or bytes, image key)"""
+    renderer = get_plot_renderer()
+    options = {
+        'dpi': renderer.dpi,
+        'figsize': renderer.figsize,
+        'image_format': renderer.image_format,
+        'compress': renderer.compress,
+        **params['plot_options']
+    }
+    render_args = {'feature_name': feature_name, 'target_name': params['target_name'], 'title': analysis['title']}
+
+    image_key = None
+    if result_store is not None and key is not None:
+        image_key = result_key('plot', analysis=key, method=method, **render_args, **options)
+        image = result_store.get(image_key) if read_store else None
+        if image is not None:
+            return image, None
+
+    return renderer.submit(analysis['curve'], method, **render_args, **options), image_key
+
+
+def run_batch_analysis(model_registry, model_id, X_train, feature_names, params, dataset_id=None,
+                       result_store=None, lineage=None):
+    """Run several methods on several features, sharing model outputs between them
+
+    Rows are subsampled with the seeded strategy of the request, and each
+    method builds one effector object per row sample, shared by its features.
+    The Jacobian is computed once per sample for all RHALE features and
+    methods, and the average model output is predicted once. With a result store and
+    a dataset ID, stored analyses and images are reused and only the missing
+    ones are computed. With incremental=true, RHALE is updated from the state
+    of the dataset's lineage (see run_incremental_rhale). Returns
+    {method: {feature_index: results}}.
+    """
+    model = model_registry.get(model_id)
+    methods = params['methods']
+    features = params['features']
+    use_store = result_store is not None and dataset_id is not None
+    # use_cache=false recomputes and refreshes the stored results
+    read_store = use_store and params.get('use_cache', True)
+
+    analyses = {}
+    keys = {}
+    if params.get('incremental') and 'rhale' in methods and dataset_id is not None:
+        for feature_index, analysis in run_incremental_rhale(
+                model_registry, model_id, X_train, features, params, lineage or [[dataset_id, len(X_train)]],
+                result_store=result_store).items():
+            analyses['rhale', feature_index] = analysis
+
+    for method in methods:
+        for feature_index in features:
+            if (method, feature_index) in analyses:
+                continue
+            if use_store:
+                keys[method, feature_index] = analysis_key(model_id, dataset_id, method, feature_index, params)
+            if read_store:
+                analysis = result_store.get(keys[method, feature_index])
+                if analysis is not None:
+                    analyses[method, feature_index] = analysis
+    missing = [(method, feature_index) for method in methods for feature_index in features
+               if (method, feature_index) not in analyses]
+    missing_methods = {method for method, _ in missing}
+
+    predict = get_model_predict(model_registry, model_id, model, params)
+    sampler = Subsampler(params.get('sample_strategy', 'uniform'), seed=params.get('seed', 0))
+    stratified = sampler.strategy == 'stratified'
+    sizes = sample_sizes(predict, X_train, missing, params)
+
+    # Methods with the same sample size share rows; stratified samples also depend on the feature
+    samples = {}
+    for method, feature_index in missing:
+        sample = (sizes[method], feature_index if stratified else None)
+        if sample not in samples:
+            with metrics.timed('sample'):
+                rows = sampler.indices(X_train, sizes[method], feature_index)
+                samples[sample] = X_train if rows is None else X_train[rows]
+
+    # One Jacobian per sample, for all RHALE features that use it
+    data_effects = {}
+    rhale_features = {}
+    for method, feature_index in missing:
+        if method in ('rhale', 'regional_rhale'):
+            sample = (sizes[method], feature_index if stratified else None)
+            rhale_features.setdefault(sample, set()).add(feature_index)
+    for sample, jacobian_features in rhale_features.items():
+        model_jac = get_model_jacobian(model_registry, model_id, model, params, sorted(jacobian_features))
+        with metrics.timed('jacobian'):
+            data_effects[sample] = np.asarray(model_jac(samples[sample]))
+
+    avg_output = None
+    if missing_methods & {'pdp', 'rhale'}:
+        rows = Subsampler(seed=params.get('seed', 0)).indices(X_train, GLOBAL_NOF_INSTANCES)
+        avg_output = float(np.mean(predict(X_train if rows is None else X_train[rows])))
+
+    effects = {}
+    for method, feature_index in missing:
+        sample = (sizes[method], feature_index if stratified else None)
+        if (method, sample) not in effects:
+            effects[method, sample] = create_effect(method, samples[sample], predict, feature_names, params,
+                                                    data_effect=data_effects.get(sample))
+            if avg_output is not None:
+                effects[method, sample].avg_output = avg_output
+
+        with metrics.timed('fit'):
+            analysis = analyze_feature(effects[method, sample], method, feature_index, params)
+        analysis['sample_size'] = len(samples[sample])
+        analyses[method, feature_index] = analysis
+        if use_store:
+            result_store.put(keys[method, feature_index], analysis, kind='analysis')
+
+    results = {}
+    pending_images = []
+    for method in methods:
+        results[method] = {}
+        for feature_index in features:
+            analysis = analyses[method, feature_index]
+            feature_results = {'sample_size': analysis.get('sample_size')}
+            if 'updated_rows' in analysis:
+                feature_results['updated_rows'] = analysis['updated_rows']
+            if 'partitioning_info' in analysis:
+                feature_results['partitioning_info'] = analysis['partitioning_info']
+
+            if params['output'] == 'curves':
+                if 'partition_tree' in analysis:
+                    feature_results['partition_tree'] = analysis['partition_tree']
+                feature_results[f'{method}_curve'] = encode_curves(analysis['curve'], params['curve_encoding'])
+            else:
+                # All plots of the batch render in the pool concurrently
+                submitted = time.perf_counter()
+                image, image_key = render_plot(result_store if use_store else None, read_store,
+                                               keys.get((method, feature_index)), analysis, method,
+                                               feature_names[feature_index], params)
+                pending_images.append((feature_results, f'{method}_plot', image, image_key, submitted))
+            results[method][str(feature_index)] = feature_results
+
+    image_format = params['plot_options'].get('image_format', get_plot_renderer().image_format)
+    for feature_results, name, image, image_key, submitted in pending_images:
+        if not isinstance(image, bytes):
+            image = image.result()
+            metrics.observe('render', time.perf_counter() - submitted)
+        if image_key is not None:
+            result_store.put(image_key, image, kind='plot')
+        feature_results[name] = encode_plot_to_base64(image)
+        feature_results['plot_format'] = image_format
+
+    return results
+
+
+def run_analysis(model_registry, model_id, X_train, feature_names, params, dataset_id=None, result_store=None,
+                 lineage=None):
+    """Run one feature effect method for one feature and return the encoded results"""
+    method = params['method']
+    feature_index = params['feature_index']
+    if method not in ANALYSIS_METHODS:
+        return {}
+
+    batch_params = {**params, 'methods': [method], 'features': [feature_index]}
+    results = run_batch_analysis(model_registry, model_id, X_train, feature_names, batch_params,
+                                 dataset_id=dataset_id, result_store=result_store, lineage=lineage)
+    return results[method][str(feature_index)]
+
+
+# Worker processes keep their own registry so each model loads once per worker
+_worker_model_registry = None
+_worker_result_store = None
+
+
+def progressive_stages(params, n_rows):
+    """Parameters of the coarse stages of a progressive analysis, followed by the exact request
+
+    Coarse stages fit the same method on growing subsamples, with fixed RHALE
+    binning and fewer PDP grid points; stages as large as the exact sample are
+    skipped.
+    """
+    method = params['method']
+    final_size = params.get('sample_size') or METHOD_SETTINGS[method]['nof_instances']
+    final_size = n_rows if final_size == 'all' else min(int(final_size), n_rows)
+    if params.get('budget_rows'):
+        final_size = min(final_size, params['budget_rows'])
+
+    stages = []
+    size, bins, points = PROGRESSIVE_FIRST_ROWS, PROGRESSIVE_FIRST_BINS, 10
+    while size < final_size:
+        stages.append({
+            **params,
+            'sample_size': size,
+            'budget_seconds': None,
+            'rhale_bins': bins,
+            'nof_points': min(points, params['nof_points'])
+        })
+        size, bins, points = size * PROGRESSIVE_GROWTH, bins * 2, points * 2
+    stages.append(params)
+    return stages
+
+
+def run_progressive_analysis(model_registry, model_id, X_train, feature_names, params, dataset_id=None,
+                             result_store=None, lineage=None):
+    """Yield (stage, n_stages, results), from coarse estimates to the exact result
+
+    Only the exact result is stored; when it is stored already it is the only
+    stage. Work for a stage starts when the previous one has been consumed,
+    so a client that stops reading stops the computation.
+    """
+    if params.get('incremental') and params['method'] == 'rhale':
+        # Incremental updates are fast already, and coarse stages could not reuse their state
+        stages = [params]
+    else:
+        stages = progressive_stages(params, len(X_train))
+    if result_store is not None and dataset_id is not None and params.get('use_cache', True):
+        key = analysis_key(model_id, dataset_id, params['method'], params['feature_index'], params)
+        if key in result_store:
+            stages = stages[-1:]
+
+    for stage, stage_params in enumerate(stages, start=1):
+        exact = stage == len(stages)
+        results = run_analysis(model_registry, model_id, X_train, feature_names, stage_params,
+                               dataset_id=dataset_id if exact else None,
+                               result_store=result_store if exact else None, lineage=lineage if exact else None)
+        yield stage, len(stages), results
+
+
+def run_analysis_job(job):
+    """Entry point for analyses executed in JobQueue worker processes"""
+    global _worker_model_registry, _worker_result_store, _plot_renderer
+    if _worker_model_registry is None:
+        from backend.ModelRegistry import ModelRegistry
+        _plot_renderer = renderer_from_env(max_workers=0)
+        _worker_result_store = result_store_from_env()
+        _worker_model_registry = ModelRegistry(
+            max_models=int(os.environ.get('MODEL_REGISTRY_MAX_MODELS', 8)),
+            max_bytes=int(os.environ.get('MODEL_REGISTRY_MAX_BYTES', 2 * 1024 ** 3))
+        )
+
+    model_id = _worker_model_registry.register(job['model_bytes'], job['file_extension'])
+    # Shared datasets arrive as a path and are mapped instead of copied through the pipe
+    data = np.load(job['data_path'], mmap_mode='r') if job.get('data_path') else job['data']
+    run = run_batch_analysis if 'methods' in job['params'] else run_analysis
+    return run(_worker_model_registry, model_id, data, job['feature_names'], job['params'],
+               dataset_id=job.get('dataset_id'), result_store=_worker_result_store, lineage=job.get('lineage'))
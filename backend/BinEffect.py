@@ -0,0 +1,196 @@
+import numpy as np
+
+
+def bin_indices(xs, limits):
+    """Index of the right-open bin [limits[k], limits[k + 1]) holding each point
+
+    Points outside [limits[0], limits[-1]) and NaNs get index -1. Runs in
+    O(N log B) with a single np.searchsorted instead of one mask per bin.
+    """
+    limits = np.asarray(limits)
+    nof_bins = len(limits) - 1
+
+    # searchsorted places NaNs after every limit, so they fall outside as well
+    ind = np.searchsorted(limits, xs, side='right') - 1
+    ind[ind >= nof_bins] = -1
+    return ind
+
+
+def compute_bin_effect(xs, df_dxs, limits):
+    """Vectorized drop-in for Effector's compute_bin_effect using np.nan for empty bins"""
+    empty_symbol = np.nan
+
+    xs = np.asarray(xs)
+    df_dxs = np.asarray(df_dxs)
+    nof_bins = len(limits) - 1
+
+    ind = bin_indices(xs, limits)
+    inside = ind >= 0
+    ind = ind[inside]
+
+    # Aggregate counts and effect sums per bin in one pass each
+    points_per_bin = np.bincount(ind, minlength=nof_bins)
+    aggregated_effect = np.bincount(ind, weights=df_dxs[inside], minlength=nof_bins)
+
+    # Empty bins keep the empty symbol
+    bin_effects = np.full([nof_bins], empty_symbol)
+    np.divide(aggregated_effect, points_per_bin, out=bin_effects, where=points_per_bin > 0)
+
+    return bin_effects, points_per_bin
+
+
+def compute_bin_effect_batched(xs_list, df_dxs_list, limits_list):
+    """compute_bin_effect for several features or subregions in one call
+
+    Each group may have its own number of points and its own bin limits; a
+    single limits array is shared by all groups. Bin indices of all groups
+    are offset into one index space so a single np.bincount aggregates
+    everything. Returns a list of (bin_effects, points_per_bin) tuples.
+    """
+    empty_symbol = np.nan
+
+    nof_groups = len(xs_list)
+    if len(df_dxs_list) != nof_groups:
+        raise ValueError(f"Got {nof_groups} xs groups but {len(df_dxs_list)} df_dxs groups")
+
+    # A single 1D array of limits is shared by all groups
+    if isinstance(limits_list, np.ndarray) and limits_list.ndim == 1:
+        limits_list = [limits_list] * nof_groups
+    if len(limits_list) != nof_groups:
+        raise ValueError(f"Got {nof_groups} xs groups but {len(limits_list)} limits")
+
+    nof_bins = np.array([len(limits) - 1 for limits in limits_list], dtype=int)
+    offsets = np.concatenate([[0], np.cumsum(nof_bins)])
+
+    indices = []
+    weights = []
+    for k in range(nof_groups):
+        ind = bin_indices(np.asarray(xs_list[k]), limits_list[k])
+        inside = ind >= 0
+        indices.append(ind[inside] + offsets[k])
+        weights.append(np.asarray(df_dxs_list[k])[inside])
+
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=int)
+    weights = np.concatenate(weights) if weights else np.zeros(0)
+
+    total_bins = int(offsets[-1])
+    points_per_bin = np.bincount(indices, minlength=total_bins)
+    aggregated_effect = np.bincount(indices, weights=weights, minlength=total_bins)
+
+    bin_effects = np.full([total_bins], empty_symbol)
+    np.divide(aggregated_effect, points_per_bin, out=bin_effects, where=points_per_bin > 0)
+
+    return [
+        (bin_effects[offsets[k]:offsets[k + 1]], points_per_bin[offsets[k]:offsets[k + 1]])
+        for k in range(nof_groups)
+    ]
+
+
+def fill_nans(values):
+    """Fill NaN bins by linear interpolation between their neighbours, as effector does"""
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+    if missing.all():
+        raise ValueError("Every bin holds at most one point; use fewer bins")
+    filled = values.copy()
+    filled[missing] = np.interp(np.flatnonzero(missing), np.flatnonzero(~missing), values[~missing])
+    return filled
+
+
+class BinStatistics:
+    """Per-bin count, mean and sum of squared deviations of one feature's effects
+
+    The statistics of new points are merged in with Chan's parallel update,
+    so adding rows costs time proportional to the new rows and gives the
+    same bin effects and variances as a pass over all rows with the same
+    limits. Points beyond the limits add one bin on that side; existing bins
+    never move, so updates stay exact. Unlike bin_indices, the last bin also
+    holds points on its right limit.
+    """
+
+    def __init__(self, limits):
+        self.limits = np.asarray(limits, dtype=float).copy()
+        nof_bins = len(self.limits) - 1
+        self.count = np.zeros(nof_bins, dtype=np.int64)
+        self.mean = np.zeros(nof_bins)
+        self.m2 = np.zeros(nof_bins)
+
+    @property
+    def nof_points(self):
+        return int(self.count.sum())
+
+    def copy(self):
+        statistics = BinStatistics(self.limits)
+        statistics.count, statistics.mean, statistics.m2 = self.count.copy(), self.mean.copy(), self.m2.copy()
+        return statistics
+
+    def _extend(self, xs):
+        """Add a bin on each side that new points fall beyond"""
+        xs = xs[~np.isnan(xs)]
+        if not len(xs):
+            return
+        low, high = xs.min(), xs.max()
+        before = int(low < self.limits[0])
+        after = int(high > self.limits[-1])
+        if not (before or after):
+            return
+        self.limits = np.concatenate([[low] * before, self.limits, [high] * after])
+        pad = (before, after)
+        self.count = np.pad(self.count, pad)
+        self.mean = np.pad(self.mean, pad)
+        self.m2 = np.pad(self.m2, pad)
+
+    def update(self, xs, df_dxs):
+        """Merge the effects df_dxs of points xs into the bins and return self"""
+        xs = np.asarray(xs, dtype=float)
+        df_dxs = np.asarray(df_dxs, dtype=float)
+        self._extend(xs)
+        nof_bins = len(self.limits) - 1
+
+        ind = bin_indices(xs, self.limits)
+        ind[xs == self.limits[-1]] = nof_bins - 1
+        inside = (ind >= 0) & ~np.isnan(df_dxs)
+        ind = ind[inside]
+        df_dxs = df_dxs[inside]
+
+        # Statistics of the new points alone
+        count = np.bincount(ind, minlength=nof_bins)
+        mean = np.zeros(nof_bins)
+        np.divide(np.bincount(ind, weights=df_dxs, minlength=nof_bins), count, out=mean, where=count > 0)
+        m2 = np.bincount(ind, weights=(df_dxs - mean[ind]) ** 2, minlength=nof_bins)
+
+        # Chan et al.: merge two (count, mean, M2) summaries without revisiting their points
+        total = self.count + count
+        weight = np.zeros(nof_bins)
+        np.divide(count, total, out=weight, where=total > 0)
+        delta = mean - self.mean
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * weight
+        self.count = total
+        return self
+
+    def bin_effect(self):
+        """Mean effect per bin, NaN for empty bins"""
+        return np.where(self.count > 0, self.mean, np.nan)
+
+    def bin_variance(self):
+        """Population variance of the effect per bin, NaN for bins with fewer than two points"""
+        variance = np.full(len(self.count), np.nan)
+        np.divide(self.m2, self.count, out=variance, where=self.count > 1)
+        return variance
+
+    def ale_params(self):
+        """The parameters effector's compute_ale_params returns for the merged points"""
+        if self.count.sum() == 0:
+            raise ValueError("No bin holds any points")
+        bin_variance = self.bin_variance()
+        with np.errstate(invalid='ignore'):
+            bin_estimator_variance = bin_variance / self.count
+        return {
+            'limits': self.limits,
+            'dx': np.diff(self.limits),
+            'points_per_bin': self.count.copy(),
+            'bin_effect': fill_nans(self.bin_effect()),
+            'bin_variance': fill_nans(bin_variance),
+            'bin_estimator_variance': fill_nans(bin_estimator_variance)
+        }
@@ -1,57 +1,318 @@
-import io
 import json
+import logging
 import os
 import pickle
+import shutil
 import tempfile
-import traceback
 
 import numpy as np
-import pandas as pd
-import requests
-import tensorflow as tf
 
+from backend.Metrics import metrics
+from backend.ModelDownloader import model_downloader_from_env
 from backend.ModelWrapper import ModelWrapper
+from backend.Startup import lazy_import
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+    import pyarrow.json as pa_json
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Columnar formats read through pyarrow
+PARQUET_EXTENSIONS = ('parquet', 'pq')
+ARROW_EXTENSIONS = ('arrow', 'feather', 'ipc')
+JSON_LINES_EXTENSIONS = ('jsonl', 'ndjson')
+
+pd = lazy_import('pandas')
+tf = lazy_import('tensorflow')
+
+
+logger = logging.getLogger(__name__)
 
 
 class DataModelFetcher:
+    # Rows parsed per CSV chunk; bounds the pandas working set
+    CSV_CHUNK_ROWS = 100_000
+    # Rows per block when scanning or filling missing values
+    IMPUTE_BLOCK_ROWS = 262_144
+    COPY_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, dtype=None, spool_dir=None, downloader=None):
+        # Parsed data is stored compactly (float32 unless DATASET_DTYPE says otherwise)
+        self.dtype = np.dtype(dtype or os.environ.get('DATASET_DTYPE', 'float32'))
+        self.spool_dir = spool_dir or os.environ.get('DATASET_SPOOL_DIR') or None
+        # Created on the first model_url, so uploads alone never touch the download cache
+        self._downloader = downloader
+
+    @property
+    def downloader(self):
+        if self._downloader is None:
+            self._downloader = model_downloader_from_env()
+        return self._downloader
+
+    def stats(self):
+        """Download cache statistics; None until the first model_url created the downloader"""
+        return self._downloader.stats() if self._downloader is not None else None
+
     def parse_data_file(self, file_data):
         """Parse data from uploaded file"""
+        data, _ = self.parse_dataset(file_data)
+        return data
+
+    def _map_spooled(self, path, shape):
+        """Memory-map a spooled raw file; the file is unlinked and lives as long as the mapping"""
+        data = np.memmap(path, dtype=self.dtype, mode='r+', shape=shape)
         try:
-            file_extension = file_data.filename.split('.')[-1].lower()
-            print(f"Processing file with extension: {file_extension}")
+            os.unlink(path)
+        except OSError:
+            pass  # Windows keeps mapped files; they stay in the spool directory
+        return data
 
-            if file_extension == 'csv':
-                # Read CSV with pandas
-                df = pd.read_csv(io.BytesIO(file_data.read()))
-                print(f"CSV columns: {df.columns.tolist()}")
+    def _read_csv(self, file_data):
+        """Stream a CSV in chunks into a memory-mapped compact array
+
+        Per-column sums and counts of the present values are accumulated on the
+        way, so missing values can be filled without another pass over the data.
+        """
+        stream = getattr(file_data, 'stream', file_data)
+        columns = None
+        n_rows = 0
+        missing_blocks = []
+
+        with tempfile.NamedTemporaryFile(suffix='.raw', dir=self.spool_dir, delete=False) as spool:
+            try:
+                for chunk in pd.read_csv(stream, chunksize=self.CSV_CHUNK_ROWS):
+                    if columns is None:
+                        logger.debug("CSV columns: %s", chunk.columns.tolist())
+
+                        # Handle timestamp column if present
+                        if 'Timestamp' in chunk.columns:
+                            chunk = chunk.drop('Timestamp', axis=1)
+
+                        # Keep numeric and boolean columns (booleans become 0/1)
+                        columns = chunk.select_dtypes(include=['number', 'bool']).columns
+                        if len(columns) != len(chunk.columns):
+                            non_numeric = set(chunk.columns) - set(columns)
+                            logger.info("Dropped non-numeric columns: %s", non_numeric)
+                        sums = np.zeros(len(columns))
+                        counts = np.zeros(len(columns), dtype=np.int64)
+
+                    block = chunk[columns].to_numpy(dtype=self.dtype)
+                    missing = np.isnan(block)
+                    if missing.any():
+                        missing_blocks.append((n_rows, n_rows + len(block)))
+                    sums += np.nansum(block, axis=0, dtype=np.float64)
+                    counts += len(block) - missing.sum(axis=0)
+
+                    spool.write(block.tobytes())
+                    n_rows += len(block)
+            except Exception:
+                spool.close()
+                os.unlink(spool.name)
+                raise
+
+        if columns is None or n_rows == 0 or len(columns) == 0:
+            os.unlink(spool.name)
+            raise ValueError("Data is empty")
+
+        data = self._map_spooled(spool.name, (n_rows, len(columns)))
+        if missing_blocks:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = sums / counts
+            self.impute_missing(data, means=means, blocks=missing_blocks)
+        return data, [str(col) for col in columns]
+
+    def _spool_upload(self, file_data, suffix):
+        """Copy an upload to a spool file in fixed-size chunks and return its path"""
+        with tempfile.NamedTemporaryFile(suffix=suffix, dir=self.spool_dir, delete=False) as spool:
+            shutil.copyfileobj(getattr(file_data, 'stream', file_data), spool, self.COPY_CHUNK_SIZE)
+        return spool.name
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _read_npy(self, file_data):
+        """Spool an uploaded .npy to disk and memory-map it instead of copying it into memory"""
+        path = self._spool_upload(file_data, '.npy')
+        try:
+            # Copy-on-write: filling missing values never modifies the spooled file
+            data = np.load(path, mmap_mode='c')
+        finally:
+            self._unlink(path)
+
+        if not np.issubdtype(data.dtype, np.floating):
+            data = data.astype(self.dtype)
+        return data
+
+    @staticmethod
+    def _feature_columns(schema):
+        """Names of the numeric and boolean columns of an Arrow schema"""
+        columns = []
+        for field in schema:
+            if field.name == 'Timestamp':
+                continue
+            if pa.types.is_integer(field.type) or pa.types.is_floating(field.type) or pa.types.is_boolean(field.type):
+                columns.append(field.name)
+        dropped = set(schema.names) - set(columns)
+        if dropped:
+            logger.info("Dropped non-numeric columns: %s", dropped)
+        return columns
+
+    def _table_to_array(self, table, columns=None):
+        """Convert Arrow columns into one compact 2D array, filling nulls with column means
+
+        Nulls are filled in Arrow, so columns without nulls are viewed without a
+        copy and written straight into the result.
+        """
+        if columns is None:
+            columns = self._feature_columns(table.schema)
+        if not columns or table.num_rows == 0:
+            raise ValueError("Data is empty")
 
-                # Handle timestamp column if present
-                if 'Timestamp' in df.columns:
-                    df = df.drop('Timestamp', axis=1)
+        data = np.empty((table.num_rows, len(columns)), dtype=self.dtype)
+        for i, name in enumerate(columns):
+            column = table.column(name)
+            if pa.types.is_boolean(column.type):
+                column = pc.cast(column, pa.int8())
+            if column.null_count:
+                logger.info("Found missing values in %s, filling with mean", name)
+                column = pc.fill_null(pc.cast(column, pa.float64()), pc.mean(column))
+            data[:, i] = column.to_numpy()
+        return data, [str(name) for name in columns]
 
-                # Convert boolean columns to int
-                bool_columns = df.select_dtypes(include=['bool']).columns
-                for col in bool_columns:
-                    df[col] = df[col].astype(int)
+    def _require_pyarrow(self, file_extension):
+        if pa is None:
+            raise ValueError(f"Reading .{file_extension} files requires pyarrow")
 
-                # Ensure all data is numeric
-                numeric_df = df.select_dtypes(include=['float64', 'int64'])
-                if len(numeric_df.columns) != len(df.columns):
-                    non_numeric = set(df.columns) - set(numeric_df.columns)
-                    print(f"Dropped non-numeric columns: {non_numeric}")
+    def _read_columnar(self, file_data, file_extension):
+        """Read Parquet or Arrow IPC/Feather files, loading only the numeric columns
 
-                # Convert to numpy array
-                data = numeric_df.to_numpy()
+        The upload is spooled to disk and memory-mapped, so uncompressed Arrow
+        buffers are read without copies.
+        """
+        self._require_pyarrow(file_extension)
+        path = self._spool_upload(file_data, f'.{file_extension}')
+        try:
+            if file_extension in PARQUET_EXTENSIONS:
+                columns = self._feature_columns(pq.read_schema(path, memory_map=True))
+                table = pq.read_table(path, columns=columns, memory_map=True)
+            else:
+                with pa.memory_map(path) as source:
+                    columns = self._feature_columns(pa.ipc.open_file(source).schema)
+                table = feather.read_table(path, columns=columns, memory_map=True)
+            return self._table_to_array(table, columns)
+        finally:
+            self._unlink(path)
+
+    def _read_json_lines(self, file_data):
+        """Parse JSON Lines records with the multithreaded columnar pyarrow reader"""
+        self._require_pyarrow('jsonl')
+        table = pa_json.read_json(getattr(file_data, 'stream', file_data))
+        return self._table_to_array(table)
+
+    def _read_json(self, file_data):
+        """Parse JSON rows, records or columns
+
+        Accepts a list of rows, {"data": rows} with optional "feature_names",
+        a list of records, or an object mapping column names to values.
+        """
+        content = file_data.read()
+        json_data = orjson.loads(content) if orjson is not None else json.loads(content.decode('utf-8'))
+        del content
+
+        feature_names = None
+        if isinstance(json_data, dict) and 'data' in json_data:
+            feature_names = json_data.get('feature_names') or json_data.get('columns')
+            json_data = json_data['data']
+
+        if isinstance(json_data, dict):
+            # Columnar: one array per feature, non-numeric columns are dropped
+            feature_names, columns = [], []
+            for name in list(json_data):
+                try:
+                    columns.append(np.asarray(json_data.pop(name), dtype=self.dtype))
+                    feature_names.append(str(name))
+                except (TypeError, ValueError):
+                    logger.info("Dropped non-numeric column: %s", name)
+            return np.column_stack(columns) if columns else np.empty((0, 0), dtype=self.dtype), feature_names
+
+        if json_data and isinstance(json_data[0], dict):
+            feature_names = list(json_data[0])
+            json_data = [[record.get(name) for name in feature_names] for record in json_data]
+
+        # None (JSON null) becomes NaN and is filled later
+        data = np.array(json_data, dtype=self.dtype)
+        return data, [str(name) for name in feature_names] if feature_names else None
+
+    def impute_missing(self, data, means=None, blocks=None):
+        """Fill NaNs in place with column means, one block of rows at a time
+
+        Returns True if anything was filled. Means and the row blocks that contain
+        NaNs may be passed in when they were collected while reading the data.
+        """
+        if blocks is None:
+            blocks = []
+            sums = np.zeros(data.shape[1])
+            counts = np.zeros(data.shape[1], dtype=np.int64)
+            for start in range(0, len(data), self.IMPUTE_BLOCK_ROWS):
+                block = data[start:start + self.IMPUTE_BLOCK_ROWS]
+                missing = np.isnan(block)
+                if missing.any():
+                    blocks.append((start, start + len(block)))
+                if means is None:
+                    sums += np.nansum(block, axis=0, dtype=np.float64)
+                    counts += len(block) - missing.sum(axis=0)
+            if means is None:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    means = sums / counts
+
+        if not blocks:
+            return False
+
+        logger.info("Found missing values, filling with mean")
+        means = np.asarray(means, dtype=data.dtype)
+        for start, stop in blocks:
+            block = data[start:stop]
+            rows, cols = np.nonzero(np.isnan(block))
+            block[rows, cols] = means[cols]
+        return True
+
+    @metrics.timed('parse')
+    def parse_dataset(self, file_data):
+        """Parse data from uploaded file, returning the data and its feature names"""
+        try:
+            feature_names = None
+            file_extension = file_data.filename.split('.')[-1].lower()
+            logger.info("Processing file with extension: %s", file_extension)
+
+            if file_extension == 'csv':
+                # Missing values are filled while streaming
+                data, feature_names = self._read_csv(file_data)
 
             elif file_extension == 'json':
-                json_data = json.loads(file_data.read().decode('utf-8'))
-                if isinstance(json_data, dict) and 'data' in json_data:
-                    data = np.array(json_data['data'])
-                else:
-                    data = np.array(json_data)
+                data, feature_names = self._read_json(file_data)
+
+            elif file_extension in JSON_LINES_EXTENSIONS:
+                data, feature_names = self._read_json_lines(file_data)
+
+            elif file_extension in PARQUET_EXTENSIONS + ARROW_EXTENSIONS:
+                # Nulls are filled while converting the Arrow columns
+                data, feature_names = self._read_columnar(file_data, file_extension)
 
             elif file_extension == 'npy':
-                data = np.load(io.BytesIO(file_data.read()))
+                data = self._read_npy(file_data)
             else:
                 raise ValueError(f"Unsupported file format: {file_extension}")
 
@@ -59,64 +320,72 @@ class DataModelFetcher:
             if data is None or data.size == 0:
                 raise ValueError("Data is empty")
 
-            print(f"Data type: {type(data)}")
-            print(f"Data shape before processing: {data.shape}")
-
-            # Handle missing values
-            if np.isnan(data).any():
-                print("Found missing values, filling with mean")
-                # Fill missing values with mean of each column
-                for col in range(data.shape[1]):
-                    col_data = data[:, col]
-                    mean_val = np.nanmean(col_data)
-                    data[:, col] = np.where(np.isnan(col_data), mean_val, col_data)
+            logger.debug("Data type %s, shape before processing: %s", type(data).__name__, data.shape)
 
             # Ensure data is 2D
             if data.ndim == 1:
                 data = data.reshape(-1, 1)
 
-            print(f"Final data shape: {data.shape}")
-            print(f"Sample data:\n{data[:2]}")
+            # Handle missing values
+            if file_extension in ('json', 'npy'):
+                self.impute_missing(data)
 
-            return data
+            logger.info("Final data shape: %s", data.shape)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sample data:\n%s", data[:2])
+
+            # Generate feature names if the format does not carry them
+            if not feature_names or len(feature_names) != data.shape[1]:
+                feature_names = [f'feature_{i}' for i in range(data.shape[1])]
+
+            return data, feature_names
 
         except Exception as e:
-            print(f"Error parsing file: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Error parsing file: %s", e)
             raise ValueError(f"Failed to parse file data: {str(e)}")
 
+    @metrics.timed('model_read')
+    def read_model(self, model_file=None, model_url=None):
+        """Read raw model bytes and file extension from either file or URL"""
+        if model_file:
+            file_extension = model_file.filename.split('.')[-1].lower()
+            model_bytes = model_file.read()
+        elif model_url:
+            model_bytes, file_extension = self.downloader.read(model_url)
+        else:
+            raise ValueError("No model provided")
+        return model_bytes, file_extension
+
     def handle_model(self, model_file=None, model_url=None):
         """Handle model from either file or URL"""
         try:
-            if model_file:
-                file_extension = model_file.filename.split('.')[-1].lower()
-                with tempfile.NamedTemporaryFile(suffix=f'.{file_extension}', delete=False) as tmp:
-                    tmp.write(model_file.read())
-                    model_path = tmp.name
-            elif model_url:
-                response = requests.get(model_url)
-                file_extension = model_url.split('.')[-1].lower()
-                with tempfile.NamedTemporaryFile(suffix=f'.{file_extension}', delete=False) as tmp:
-                    tmp.write(response.content)
-                    model_path = tmp.name
-            else:
-                raise ValueError("No model provided")
+            model_bytes, file_extension = self.read_model(model_file=model_file, model_url=model_url)
+        except Exception as e:
+            logger.exception("Error loading model: %s", e)
+            raise ValueError(f"Failed to load model: {str(e)}")
+        return self.load_model(model_bytes, file_extension)
+
+    @metrics.timed('load')
+    def load_model(self, model_bytes, file_extension):
+        """Load and validate a model from its raw bytes"""
+        try:
+            with tempfile.NamedTemporaryFile(suffix=f'.{file_extension}', delete=False) as tmp:
+                tmp.write(model_bytes)
+                model_path = tmp.name
 
             try:
-                print(f"Loading model with extension: {file_extension}")
+                logger.info("Loading model with extension: %s", file_extension)
 
                 if file_extension == 'pkl':
-                    print("Loading pickle model")
                     with open(model_path, 'rb') as f:
                         original_model = pickle.load(f)
-                    print(f"Loaded model type: {type(original_model).__name__}")
+                    logger.info("Loaded pickle model of type %s", type(original_model).__name__)
 
                     # Create wrapper
                     model = ModelWrapper(original_model)
 
                     # Test with minimal sample data
                     try:
-                        print("\nTesting prediction...")
                         # Create test data with exact dimensions
                         n_samples = max(model.input_chunk_length, 48)
 
@@ -125,15 +394,12 @@ class DataModelFetcher:
                         # Scale to reasonable values (between 0 and 1)
                         sample_data = (sample_data - sample_data.min()) / (sample_data.max() - sample_data.min())
 
-                        print(f"Test input shape: {sample_data.shape}")
-                        print("Testing prediction...")
+                        logger.debug("Testing prediction on input of shape %s", sample_data.shape)
                         pred = model.predict(sample_data)
-                        print(f"Test prediction successful, shape: {pred.shape}")
+                        logger.debug("Test prediction successful, shape: %s", pred.shape)
 
                     except Exception as e:
-                        print("Test prediction failed:")
-                        print(f"Error: {str(e)}")
-                        print(f"Traceback: {traceback.format_exc()}")
+                        logger.exception("Test prediction failed: %s", e)
                         raise
                     return model
 
@@ -147,9 +413,7 @@ class DataModelFetcher:
             finally:
                 if os.path.exists(model_path):
                     os.unlink(model_path)
-                    print("Cleaned up temporary files")
 
         except Exception as e:
-            print(f"Error loading model: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Error loading model: %s", e)
             raise ValueError(f"Failed to load model: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from backend.DataModelFetcher import DataModelFetcher
+from backend.LRUCache import LRUCache
+
+
+class DatasetStore:
+    """Parsed datasets kept in memory under a content-addressed dataset ID
+
+    Each upload is parsed once into a cleaned float array plus its feature
+    names. Repeated analyses refer to the dataset by ID, so they skip both the
+    upload and the parsing. Memory is bounded with LRU eviction.
+
+    With a shared_dir, every dataset is also written there once as .npy and
+    read back memory-mapped. Server processes sharing the directory then
+    serve each other's datasets from the same page cache, without a private
+    copy per process.
+
+    Rows appended to a dataset make a new dataset whose lineage lists the
+    datasets it extends, so analyses can update results of the earlier rows.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, data_fetcher=None, max_datasets=16, max_bytes=4 * 1024 ** 3, shared_dir=None,
+                 max_shared_bytes=32 * 1024 ** 3):
+        self.data_fetcher = data_fetcher or DataModelFetcher()
+        self._cache = LRUCache(max_items=max_datasets, max_bytes=max_bytes)
+        self.shared_dir = shared_dir
+        self.max_shared_bytes = max_shared_bytes
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    def compute_dataset_id(self, file_data):
+        """Hash the uploaded file contents without keeping a copy in memory"""
+        digest = hashlib.sha256()
+        extension = file_data.filename.split('.')[-1].lower()
+        digest.update(extension.encode('utf-8'))
+        while True:
+            chunk = file_data.read(self.CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+        file_data.seek(0)
+        return digest.hexdigest()
+
+    def add(self, file_data):
+        """Parse an uploaded file unless it is already stored and return its ID"""
+        dataset_id = self.compute_dataset_id(file_data)
+        if dataset_id in self:
+            return dataset_id
+
+        data, feature_names = self.data_fetcher.parse_dataset(file_data)
+        return self.put(dataset_id, data, feature_names, filename=file_data.filename)
+
+    def append(self, dataset_id, file_data):
+        """Append the rows of an uploaded file to a stored dataset and return the ID of the result
+
+        The file must have the same feature columns. Missing values of the new
+        rows are filled from the new rows only. The result is a new contiguous
+        array, as analyses expect: the parent rows are copied and, with a shared
+        directory, written to a new .npy file, so every append costs time and
+        space for the whole history, not just the new rows.
+        """
+        parent = self.get_entry(dataset_id)
+        upload_id = self.compute_dataset_id(file_data)
+        appended_id = hashlib.sha256(f"{dataset_id}+{upload_id}".encode('utf-8')).hexdigest()
+        if appended_id in self:
+            return appended_id
+
+        rows, feature_names = self.data_fetcher.parse_dataset(file_data)
+        if rows.shape[1] != parent['data'].shape[1] or (feature_names is not None and
+                                                          list(feature_names) != parent['feature_names']):
+            raise ValueError(f"Appended rows have features {feature_names or rows.shape[1]}, "
+                             f"the dataset has {parent['feature_names']}")
+        data = np.concatenate([parent['data'], rows.astype(parent['data'].dtype, copy=False)])
+        lineage = [[dataset_id, int(parent['data'].shape[0])]] + parent['lineage']
+        return self.put(appended_id, data, parent['feature_names'], filename=file_data.filename, lineage=lineage)
+
+    def put(self, dataset_id, data, feature_names, filename=None, lineage=None):
+        """Store an already parsed dataset"""
+        if not np.issubdtype(data.dtype, np.floating):
+            data = data.astype(float)
+        lineage = lineage or []
+        if self.shared_dir:
+            data = self._write_shared(dataset_id, data, feature_names, filename, lineage)
+        entry = {
+            'data': data,
+            'feature_names': list(feature_names),
+            'filename': filename,
+            'lineage': lineage
+        }
+        self._cache.put(dataset_id, entry, nbytes=data.nbytes)
+        return dataset_id
+
+    def get_entry(self, dataset_id):
+        entry = self._cache.get(dataset_id)
+        if entry is None:
+            entry = self._read_shared(dataset_id)
+        if entry is None:
+            raise KeyError(f"Unknown dataset_id: {dataset_id}")
+        return entry
+
+    def _shared_paths(self, dataset_id):
+        # IDs come from requests; only hex digests name files
+        if not dataset_id or not all(c in '0123456789abcdef' for c in dataset_id):
+            return None, None
+        base = os.path.join(self.shared_dir, dataset_id)
+        return base + '.npy', base + '.json'
+
+    def shared_path(self, dataset_id):
+        """Path of the shared .npy copy of a dataset, or None"""
+        if not self.shared_dir:
+            return None
+        data_path, _ = self._shared_paths(dataset_id)
+        return data_path if data_path and os.path.exists(data_path) else None
+
+    def _write_shared(self, dataset_id, data, feature_names, filename, lineage):
+        """Write the dataset to the shared directory once and return it memory-mapped"""
+        data_path, meta_path = self._shared_paths(dataset_id)
+        if not os.path.exists(data_path):
+            # Written under temporary names and renamed, so readers never see partial files
+            with tempfile.NamedTemporaryFile(dir=self.shared_dir, suffix='.part', delete=False) as tmp:
+                np.save(tmp, data)
+            with tempfile.NamedTemporaryFile('w', dir=self.shared_dir, suffix='.part', delete=False) as meta:
+                json.dump({'feature_names': list(feature_names), 'filename': filename, 'lineage': lineage}, meta)
+            os.replace(meta.name, meta_path)
+            os.replace(tmp.name, data_path)
+            self._prune(keep=data_path)
+        return np.load(data_path, mmap_mode='r')
+
+    def _read_shared(self, dataset_id):
+        """Map a dataset another process wrote to the shared directory into the local cache"""
+        data_path = self.shared_path(dataset_id)
+        if data_path is None:
+            return None
+        try:
+            with open(data_path[:-len('.npy')] + '.json') as f:
+                meta = json.load(f)
+            data = np.load(data_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        os.utime(data_path)
+        entry = {'data': data, 'feature_names': meta['feature_names'], 'filename': meta['filename'],
+                 'lineage': meta.get('lineage', [])}
+        self._cache.put(dataset_id, entry, nbytes=data.nbytes)
+        return entry
+
+    def _prune(self, keep=None):
+        """Remove least recently used shared datasets while the directory is over max_shared_bytes
+
+        Processes that still map a removed file keep reading it until they unmap it.
+        """
+        entries = []
+        for name in os.listdir(self.shared_dir):
+            if name.endswith('.npy'):
+                path = os.path.join(self.shared_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_shared_bytes:
+                break
+            if path == keep:
+                continue
+            for stale in (path, path[:-len('.npy')] + '.json'):
+                try:
+                    os.unlink(stale)
+                except OSError:
+                    pass
+            total -= size
+
+    def get(self, dataset_id):
+        """Return (data, feature_names) for a dataset ID"""
+        entry = self.get_entry(dataset_id)
+        return entry['data'], entry['feature_names']
+
+    def lineage(self, dataset_id):
+        """[dataset_id, n_rows] of the dataset and of each dataset it was appended to, newest first"""
+        entry = self.get_entry(dataset_id)
+        return [[dataset_id, int(entry['data'].shape[0])]] + entry['lineage']
+
+    def __contains__(self, dataset_id):
+        return dataset_id in self._cache or self.shared_path(dataset_id) is not None
+
+    def describe(self, dataset_id):
+        entry = self.get_entry(dataset_id)
+        return {
+            'dataset_id': dataset_id,
+            'filename': entry['filename'],
+            'n_rows': int(entry['data'].shape[0]),
+            'n_features': int(entry['data'].shape[1]),
+            'feature_names': entry['feature_names'],
+            'nbytes': int(entry['data'].nbytes),
+            'parent_id': entry['lineage'][0][0] if entry['lineage'] else None
+        }
+
+    def stats(self):
+        return {**self._cache.stats(), 'shared_dir': self.shared_dir}
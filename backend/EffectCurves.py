@@ -0,0 +1,149 @@
+import base64
+import contextlib
+import io
+
+import numpy as np
+
+
+def _float_array(values):
+    return np.asarray(values, dtype=float)
+
+
+def global_curve(effect, method, feature, nof_points=30):
+    """Numeric feature effect curve of a fitted (or fittable) global effector object
+
+    RHALE curves are piecewise linear between the bin limits, so they are
+    evaluated exactly at the limits and returned with the per-bin effects.
+    PDP curves are evaluated on nof_points evenly spaced points.
+    """
+    if method in ('rhale', 'regional_rhale'):
+        # Fits the feature with the default binning if needed
+        effect.eval(feature, effect.axis_limits[:1, feature], centering=True)
+        params = effect.feature_effect['feature_' + str(feature)]
+        x = _float_array(params['limits'])
+        y, variance = effect.eval(feature, x, heterogeneity=True, centering=True)
+        curve = {
+            'x': x,
+            'y': _float_array(y),
+            'std': np.sqrt(_float_array(variance)),
+            'bin_limits': x,
+            'bin_effect': _float_array(params['bin_effect']),
+            'bin_std': np.sqrt(_float_array(params['bin_variance'])),
+            'points_per_bin': _float_array(params['points_per_bin'])
+        }
+    else:
+        x = np.linspace(effect.axis_limits[0, feature], effect.axis_limits[1, feature], nof_points)
+        y, variance = effect.eval(feature, x, heterogeneity=True, centering=True)
+        curve = {
+            'x': x,
+            'y': _float_array(y),
+            'std': np.sqrt(_float_array(variance))
+        }
+
+    if effect.avg_output is not None:
+        curve['avg_output'] = float(effect.avg_output)
+    return curve
+
+
+def statistics_curve(statistics, avg_output=None, points_for_centering=100):
+    """RHALE curve of accumulated BinStatistics, in the format of global_curve
+
+    The accumulated effect is piecewise linear between the bin limits; it is
+    centered to a zero mean over the midpoints of points_for_centering evenly
+    spaced points, like effector's zero_integral centering.
+    """
+    params = statistics.ale_params()
+    x = _float_array(params['limits'])
+    y = np.concatenate([[0.], np.cumsum(params['bin_effect'] * params['dx'])])
+    grid = np.linspace(x[0], x[-1], points_for_centering)
+    y = y - np.mean(np.interp(0.5 * (grid[:-1] + grid[1:]), x, y))
+
+    # The variance at each limit is that of the bin it opens; the last limit closes the last bin
+    bin_variance = _float_array(params['bin_variance'])
+    curve = {
+        'x': x,
+        'y': y,
+        'std': np.sqrt(np.append(bin_variance, bin_variance[-1])),
+        'bin_limits': x,
+        'bin_effect': _float_array(params['bin_effect']),
+        'bin_std': np.sqrt(bin_variance),
+        'points_per_bin': _float_array(params['points_per_bin'])
+    }
+    if avg_output is not None:
+        curve['avg_output'] = float(avg_output)
+    return curve
+
+
+def partition_tree(effect, feature):
+    """Nodes of the pruned partition tree of a fitted regional effector object"""
+    tree = effect.tree_pruned.get('feature_' + str(feature))
+    if tree is None:
+        return []
+
+    nodes = []
+    for node in tree.nodes:
+        nodes.append({
+            'idx': node.idx,
+            'name': node.name,
+            'parent_idx': node.parent_node.idx if node.parent_node is not None else None,
+            'level': node.level,
+            'heterogeneity': float(node.heterogeneity),
+            'weight': float(node.weight),
+            'nof_instances': int(node.nof_instances),
+            'split_feature': int(node.foc_index) if node.foc_index is not None else None,
+            'split_type': node.foc_type,
+            'split_position': float(node.foc_position) if node.foc_position is not None else None,
+            'comparison': node.foc_comparison_operator
+        })
+    return nodes
+
+
+def partitioning_text(effect, feature):
+    """Text summary of the partition tree, as printed by effector"""
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        if hasattr(effect, 'show_partitioning'):
+            effect.show_partitioning(features=feature, only_important=True)
+        else:
+            effect.summary(features=feature, only_important=True)
+    return buffer.getvalue()
+
+
+def regional_curve(effect, method, feature, node_idx, nof_points=30):
+    """Numeric effect curve of one node of a fitted regional effector object
+
+    Features without important splits only have the root node, which is used
+    instead of a missing node; the returned node_idx says which one was drawn.
+    """
+    tree = effect.tree_pruned.get('feature_' + str(feature))
+    if tree is None:
+        raise ValueError(f"Feature {feature} has no partition tree")
+    if tree.get_node_by_idx(node_idx) is None:
+        node_idx = tree.get_root().idx
+
+    # Effector builds a global effect object on the node's data for eval and plot
+    node_effect = effect._create_fe_object(feature, node_idx, None)
+    curve = global_curve(node_effect, method, feature, nof_points)
+    curve['node_idx'] = node_idx
+    return curve
+
+
+def encode_curves(value, encoding='json'):
+    """Make arrays in nested results JSON-serializable
+
+    'json' gives plain lists with NaN as null; 'base64' gives little-endian
+    float32 buffers that the front end can wrap in a Float32Array.
+    """
+    if isinstance(value, dict):
+        return {key: encode_curves(item, encoding) for key, item in value.items()}
+    if isinstance(value, list):
+        return [encode_curves(item, encoding) for item in value]
+    if isinstance(value, np.ndarray):
+        if encoding == 'base64':
+            return {
+                'dtype': 'float32',
+                'shape': list(value.shape),
+                'data': base64.b64encode(value.astype('<f4').tobytes()).decode('ascii')
+            }
+        return [None if np.isnan(item) else item for item in value.astype(float).tolist()]
+    return value
@@ -0,0 +1,133 @@
+import numpy as np
+
+from backend.Startup import lazy_import
+
+tf = lazy_import('tensorflow')
+
+
+class KerasJacobian:
+    """Compiled, chunked input gradients of a Keras model
+
+    The gradient step is wrapped once in a tf.function with a fixed
+    [None, n_features] float32 signature, so varying batch sizes never trigger
+    a retrace. Rows are processed in chunks of at most chunk_size to bound peak
+    memory. With XLA, chunks are padded to power-of-two buckets so only a few
+    shapes are ever compiled.
+    """
+
+    def __init__(self, model, chunk_size=8192, jit_compile=False):
+        self.model = model
+        self.chunk_size = int(chunk_size)
+        self.jit_compile = jit_compile
+        self._function = None
+        self._n_features = None
+
+        input_shape = getattr(model, 'input_shape', None)
+        if isinstance(input_shape, tuple) and input_shape and input_shape[-1] is not None:
+            self._n_features = int(input_shape[-1])
+            self._build(self._n_features)
+
+    def _build(self, n_features):
+        model = self.model
+
+        def gradient(x):
+            with tf.GradientTape() as tape:
+                tape.watch(x)
+                prediction = model(x, training=False)
+            return tape.gradient(prediction, x)
+
+        self._n_features = n_features
+        self._function = tf.function(
+            gradient,
+            input_signature=[tf.TensorSpec([None, n_features], tf.float32)],
+            jit_compile=self.jit_compile
+        )
+
+    def _padded_rows(self, rows):
+        """Bucketed chunk length so XLA compiles one program per bucket"""
+        if not self.jit_compile:
+            return rows
+        bucket = 1 << max(int(rows - 1).bit_length(), 5)
+        return min(bucket, self.chunk_size)
+
+    def __call__(self, x):
+        # Convert once; this is free when the data is already float32
+        x = np.asarray(x, dtype=np.float32)
+        if self._function is None or x.shape[1] != self._n_features:
+            self._build(x.shape[1])
+
+        jacobian = np.empty(x.shape, dtype=np.float32)
+        for start in range(0, len(x), self.chunk_size):
+            chunk = x[start:start + self.chunk_size]
+            rows = len(chunk)
+            padded_rows = self._padded_rows(rows)
+            if padded_rows > rows:
+                chunk = np.concatenate([chunk, np.zeros((padded_rows - rows, x.shape[1]), dtype=np.float32)])
+            jacobian[start:start + rows] = self._function(tf.constant(chunk)).numpy()[:rows]
+        return jacobian
+
+
+class FiniteDifferenceJacobian:
+    """Finite-difference Jacobian of any batch predict function
+
+    All +h (and -h for central differences) perturbations of all requested
+    features are stacked into one batch, so the gradients of N rows and d
+    features cost one predict call instead of d x N small ones. Columns of
+    features outside the requested subset are NaN.
+    """
+
+    def __init__(self, predict, step=1e-2, relative_step=True, central=True, features=None,
+                 max_batch_rows=1_000_000, rows_independent=True):
+        self.predict = predict
+        self.step = step
+        self.relative_step = relative_step
+        self.central = central
+        self.features = features
+        self.max_batch_rows = int(max_batch_rows)
+        # Sequence models (sliding windows) must see each perturbed copy as a separate batch
+        self.rows_independent = rows_independent
+
+    def step_sizes(self, x, features):
+        """Per-feature step, scaled by the feature's standard deviation when relative"""
+        step = np.broadcast_to(np.asarray(self.step, dtype=float), (len(features),)).copy()
+        if self.relative_step:
+            scale = np.std(x[:, features], axis=0)
+            step *= np.where(scale > 0, scale, 1.0)
+        return step
+
+    def _predict_blocks(self, batch):
+        """Predict a (n_blocks, n_rows, n_features) stack and return (n_blocks, n_rows)"""
+        n_blocks, n_rows, n_features = batch.shape
+        if self.rows_independent:
+            predictions = np.asarray(self.predict(batch.reshape(-1, n_features)))
+            return predictions.reshape(n_blocks, n_rows, -1)[:, :, 0]
+        return np.stack([np.asarray(self.predict(block)).reshape(n_rows, -1)[:, 0] for block in batch])
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=float)
+        n_rows, n_features = x.shape
+        features = np.arange(n_features) if self.features is None else np.asarray(self.features, dtype=int)
+        step = self.step_sizes(x, features)
+
+        # Central differences need +h and -h blocks; forward ones need +h and the unperturbed data
+        n_blocks = 2 * len(features) if self.central else len(features) + 1
+        rows_per_chunk = max(1, self.max_batch_rows // n_blocks) if self.rows_independent else n_rows
+
+        jacobian = np.full((n_rows, n_features), np.nan)
+        for start in range(0, n_rows, rows_per_chunk):
+            chunk = x[start:start + rows_per_chunk]
+
+            # One allocation holding every perturbed copy of the chunk
+            batch = np.broadcast_to(chunk, (n_blocks,) + chunk.shape).copy()
+            for k, feature in enumerate(features):
+                batch[k, :, feature] += step[k]
+                if self.central:
+                    batch[len(features) + k, :, feature] -= step[k]
+
+            predictions = self._predict_blocks(batch)
+            upper = predictions[:len(features)]
+            lower = predictions[len(features):] if self.central else predictions[-1:]
+            denominator = 2 * step if self.central else step
+            jacobian[start:start + len(chunk), features] = ((upper - lower) / denominator[:, None]).T
+
+        return jacobian
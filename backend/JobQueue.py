@@ -0,0 +1,269 @@
+import importlib
+import multiprocessing
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from multiprocessing.connection import wait
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+def _import_function(target):
+    module_name, function_name = target.split(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _worker_main(target, conn, initializer=None):
+    """Worker process loop: run each received job with the target function"""
+    if initializer is not None:
+        _import_function(initializer)()
+    function = _import_function(target)
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        job_id, payload = message
+        try:
+            conn.send((job_id, 'done', function(payload), None))
+        except Exception as e:
+            conn.send((job_id, 'failed', None, f"{str(e)}\nTraceback: {traceback.format_exc()}"))
+
+
+class JobQueue:
+    """Asynchronous jobs executed on a pool of local worker processes
+
+    Workers are started with the 'spawn' method: TensorFlow is not fork-safe
+    once initialized in the parent. Each worker is a long-lived process that
+    runs one job at a time, so at most max_workers jobs run concurrently.
+    Running jobs are cancelled by terminating and replacing their worker.
+    Submitting more than max_queued waiting jobs raises QueueFullError.
+    An optional 'module:function' initializer runs once in each new worker.
+    Job IDs start with id_prefix, e.g. to tell which server process owns a job.
+    """
+
+    def __init__(self, target, max_workers=2, max_queued=16, max_finished=256, poll_interval=0.1,
+                 initializer=None, id_prefix=''):
+        self.target = target
+        self.initializer = initializer
+        self.id_prefix = id_prefix
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.poll_interval = poll_interval
+
+        self._context = multiprocessing.get_context('spawn')
+        self._jobs = OrderedDict()  # job_id -> job record
+        self._pending = deque()
+        self._workers = []  # dicts with process, conn and the running job_id
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._dispatcher = None
+        self._closed = False
+
+    def _start(self):
+        """Start workers and the dispatcher thread on first use"""
+        if self._dispatcher is not None:
+            return
+        for _ in range(self.max_workers):
+            self._workers.append(self._spawn_worker())
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def _spawn_worker(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(self.target, child_conn, self.initializer),
+                                        daemon=True)
+        process.start()
+        child_conn.close()
+        return {'process': process, 'conn': parent_conn, 'job_id': None}
+
+    def submit(self, payload):
+        """Queue a job and return its ID, or raise QueueFullError"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Job queue is shut down")
+            if len(self._pending) >= self.max_queued:
+                raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+
+            self._start()
+            job_id = self.id_prefix + uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'payload': payload,
+                'result': None,
+                'error': None,
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None
+            }
+            self._pending.append(job_id)
+            self._trim_finished()
+
+        self._wakeup.set()
+        return job_id
+
+    def status(self, job_id):
+        """Public view of a job, without payload or result"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise KeyError(f"Unknown job_id: {job_id}")
+            info = {key: value for key, value in job.items() if key not in ('payload', 'result')}
+            if job['status'] == 'queued':
+                info['queue_position'] = self._pending.index(job_id)
+            return info
+
+    def result(self, job_id):
+        """Return (status, result, error) for a job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise KeyError(f"Unknown job_id: {job_id}")
+            return job['status'], job['result'], job['error']
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job finishes and return (status, result, error)"""
+        with self._finished:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise KeyError(f"Unknown job_id: {job_id}")
+            self._finished.wait_for(lambda: job['status'] not in ('queued', 'running'), timeout)
+            return job['status'], job['result'], job['error']
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns False if it already finished"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise KeyError(f"Unknown job_id: {job_id}")
+
+            if job['status'] == 'queued':
+                self._pending.remove(job_id)
+            elif job['status'] == 'running':
+                # The only way to stop running work is to replace its worker
+                for index, worker in enumerate(self._workers):
+                    if worker['job_id'] == job_id:
+                        worker['process'].terminate()
+                        worker['conn'].close()
+                        self._workers[index] = self._spawn_worker()
+                        break
+            else:
+                return False
+
+            self._finish(job, 'cancelled')
+
+        self._wakeup.set()
+        return True
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return {
+                'max_workers': self.max_workers,
+                'max_queued': self.max_queued,
+                'queued': len(self._pending),
+                'running': sum(1 for worker in self._workers if worker['job_id'] is not None),
+                'jobs': counts
+            }
+
+    def shutdown(self):
+        """Stop the workers and cancel every queued or running job"""
+        with self._lock:
+            self._closed = True
+            for worker in self._workers:
+                worker['process'].terminate()
+                worker['conn'].close()
+            self._workers = []
+            self._pending.clear()
+            for job in self._jobs.values():
+                if job['status'] in ('queued', 'running'):
+                    self._finish(job, 'cancelled', error="Job queue shut down")
+        self._wakeup.set()
+
+    def _finish(self, job, status, result=None, error=None):
+        job['status'] = status
+        job['result'] = result
+        job['error'] = error
+        job['payload'] = None
+        job['finished_at'] = time.time()
+        self._finished.notify_all()
+
+    def _trim_finished(self):
+        """Forget the oldest finished jobs beyond max_finished"""
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job['status'] in ('done', 'failed', 'cancelled')]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _assign_jobs(self):
+        for index, worker in enumerate(self._workers):
+            if not self._pending:
+                break
+            if worker['job_id'] is not None:
+                continue
+
+            job_id = self._pending.popleft()
+            job = self._jobs[job_id]
+            try:
+                worker['conn'].send((job_id, job['payload']))
+            except OSError:
+                # The idle worker died since the last poll: requeue the job and replace the worker
+                self._pending.appendleft(job_id)
+                worker['conn'].close()
+                self._workers[index] = self._spawn_worker()
+                continue
+            except Exception as e:
+                # e.g. a payload that cannot be pickled; the worker is unaffected
+                self._finish(job, 'failed', error=f"Could not send job to worker: {e}")
+                continue
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+            worker['job_id'] = job_id
+
+    def _dispatch_loop(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                self._assign_jobs()
+                connections = [worker['conn'] for worker in self._workers if worker['job_id'] is not None]
+
+            ready = wait(connections, timeout=self.poll_interval) if connections else []
+            if not connections:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+            with self._lock:
+                for index, worker in enumerate(self._workers):
+                    if worker['job_id'] is None:
+                        continue
+                    job = self._jobs.get(worker['job_id'])
+
+                    if worker['conn'] in ready:
+                        try:
+                            job_id, status, result, error = worker['conn'].recv()
+                        except (EOFError, OSError):
+                            job_id, status, result, error = worker['job_id'], 'failed', None, 'Worker exited'
+                        if job is not None and job['status'] == 'running':
+                            self._finish(job, status, result, error)
+                        worker['job_id'] = None
+
+                    elif not worker['process'].is_alive():
+                        # Worker crashed (e.g. out of memory): fail its job and replace it
+                        if job is not None and job['status'] == 'running':
+                            self._finish(job, 'failed', error=f"Worker exited with code {worker['process'].exitcode}")
+                        worker['conn'].close()
+                        self._workers[index] = self._spawn_worker()
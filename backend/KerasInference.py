@@ -0,0 +1,100 @@
+import threading
+
+import numpy as np
+
+from backend.Startup import lazy_import
+
+tf = lazy_import('tensorflow')
+
+
+class KerasInference:
+    """Compiled predict function of a Keras model
+
+    Keras' predict builds a data adapter, callbacks and a progress bar on
+    every call, which dominates the small, varying batches effector sends
+    while evaluating grids and searching splits. Here the model is called
+    directly inside one tf.function with a fixed [None, n_features] float32
+    signature, so new batch sizes never trigger a retrace. Inputs are split
+    into chunks of at most max_batch rows. With XLA, which compiles one
+    program per concrete shape, chunks are padded to power-of-two buckets of
+    at least min_bucket rows so only a few shapes are ever compiled.
+    Returns what predict returns for the first model output.
+    """
+
+    def __init__(self, model, max_batch=8192, jit_compile=False, min_bucket=32):
+        self.model = model
+        self.max_batch = int(max_batch)
+        self.jit_compile = jit_compile
+        self.min_bucket = int(min_bucket)
+        self._function = None
+        self._n_features = None
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.calls = 0
+        self.rows = 0
+        self.padded_rows = 0
+
+        input_shape = getattr(model, 'input_shape', None)
+        if isinstance(input_shape, tuple) and input_shape and input_shape[-1] is not None:
+            self._build(int(input_shape[-1]))
+
+    def _build(self, n_features):
+        model = self.model
+
+        def forward(x):
+            return tf.nest.flatten(model(x, training=False))[0]
+
+        self._n_features = n_features
+        self._function = tf.function(
+            forward,
+            input_signature=[tf.TensorSpec([None, n_features], tf.float32)],
+            jit_compile=self.jit_compile
+        )
+
+    def _padded_rows(self, rows):
+        """Bucketed chunk length so XLA compiles one program per bucket"""
+        if not self.jit_compile:
+            return rows
+        bucket = 1 << max(int(rows - 1).bit_length(), self.min_bucket.bit_length() - 1)
+        return min(bucket, self.max_batch)
+
+    def __call__(self, x):
+        # Convert once; this is free when the data is already float32
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        with self._lock:
+            if self._function is None or x.shape[1] != self._n_features:
+                self._build(x.shape[1])
+            function = self._function
+
+        outputs = []
+        padded_total = 0
+        for start in range(0, max(len(x), 1), self.max_batch):
+            chunk = x[start:start + self.max_batch]
+            rows = len(chunk)
+            padded_rows = self._padded_rows(rows)
+            if padded_rows > rows:
+                chunk = np.concatenate([chunk, np.zeros((padded_rows - rows, x.shape[1]), dtype=np.float32)])
+            outputs.append(function(tf.constant(chunk)).numpy()[:rows])
+            padded_total += len(chunk)
+
+        with self._lock:
+            self.calls += 1
+            self.rows += len(x)
+            self.padded_rows += padded_total
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+    def tracing_count(self):
+        return self._function.experimental_get_tracing_count() if self._function is not None else 0
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'rows': self.rows,
+            'padded_rows': self.padded_rows,
+            'traces': self.tracing_count(),
+            'jit_compile': self.jit_compile,
+            'max_batch': self.max_batch
+        }
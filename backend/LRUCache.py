@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by item count and total size in bytes"""
+
+    def __init__(self, max_items=None, max_bytes=None, on_evict=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.RLock()
+        self.total_bytes = 0
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the cached value and mark it as most recently used"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def peek(self, key, default=None):
+        """Return the cached value without touching recency or statistics"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else default
+
+    def put(self, key, value, nbytes=0):
+        """Insert a value and evict least recently used entries over the bounds"""
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+
+            # Never evict the entry that was just inserted
+            while len(self._entries) > 1 and self._over_bounds():
+                old_key, (old_value, old_nbytes) = self._entries.popitem(last=False)
+                self.total_bytes -= old_nbytes
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+
+        # Call eviction hooks outside the lock
+        if self.on_evict:
+            for old_key, old_value in evicted:
+                self.on_evict(old_key, old_value)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, nbytes = self._entries.pop(key)
+            self.total_bytes -= nbytes
+            return value
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def _over_bounds(self):
+        if self.max_items is not None and len(self._entries) > self.max_items:
+            return True
+        if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'items': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_items': self.max_items,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,168 @@
+import bisect
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+
+# Upper bounds in seconds of the latency histogram buckets, roughly x2.5 apart
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, 150, 600)
+
+# Stages of the current request, collected when the request asked for a profile
+_profile = contextvars.ContextVar('profile', default=None)
+
+
+def configure_logging(level=None):
+    """Level-gated logging for the backend, set by LOG_LEVEL (default INFO)"""
+    level = level or os.environ.get('LOG_LEVEL', 'INFO')
+    logging.basicConfig(level=level.upper(), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+
+class Histogram:
+    """Count, sum, extremes and cumulative bucket counts of observed values"""
+
+    def __init__(self, buckets=TIME_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bucket bound below which a fraction q of the observations fall"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': {str(bound): count for bound, count in zip(self.buckets + ('+Inf',), self.counts)}
+        }
+
+
+class Metrics:
+    """Process-wide stage timings and counters
+
+    Each stage keeps a histogram of its durations; counters accumulate
+    amounts such as predicted rows. Observations are also added to the
+    profile of the current request when one is being recorded.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+        profile = _profile.get()
+        if profile is not None:
+            entry = profile.setdefault(stage, {'count': 0, 'seconds': 0.0})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+        profile = _profile.get()
+        if profile is not None:
+            profile.setdefault('counters', {})
+            profile['counters'][name] = profile['counters'].get(name, 0) + amount
+
+    @contextlib.contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed_predict(self, predict):
+        """Wrap a predict function so its calls and rows are counted and timed"""
+        def timed(x):
+            start = time.perf_counter()
+            try:
+                return predict(x)
+            finally:
+                self.observe('predict', time.perf_counter() - start)
+                self.increment('predict_rows', len(x))
+        return timed
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'uptime_seconds': time.time() - self.started,
+                'stages': {stage: histogram.snapshot() for stage, histogram in sorted(self._histograms.items())},
+                'counters': dict(sorted(self._counters.items()))
+            }
+
+    def prometheus(self, prefix='effector'):
+        """Metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                name = f'{prefix}_{stage}_seconds'
+                lines.append(f'# TYPE {name} histogram')
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum {histogram.sum}')
+                lines.append(f'{name}_count {histogram.count}')
+            for counter, value in sorted(self._counters.items()):
+                lines.append(f'# TYPE {prefix}_{counter}_total counter')
+                lines.append(f'{prefix}_{counter}_total {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+@contextlib.contextmanager
+def request_profile(enabled=True):
+    """Collect {stage: {count, seconds}} of the work done in this context"""
+    if not enabled:
+        yield None
+        return
+    profile = {}
+    token = _profile.set(profile)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile['total_seconds'] = time.perf_counter() - start
+        _profile.reset(token)
+
+
+metrics = Metrics()
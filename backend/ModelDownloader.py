@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class DownloadTooLargeError(ValueError):
+    pass
+
+
+class ModelDownloader:
+    """Downloads model files through a pooled session into an on-disk cache
+
+    Bodies are streamed to disk in chunks and never held in memory as a
+    whole. Cached files are revalidated with ETag / Last-Modified, so an
+    unchanged model costs one 304 response. Downloads over max_bytes are
+    aborted, and the least recently used files are removed once the cache
+    grows over max_cache_bytes.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3, max_cache_bytes=8 * 1024 ** 3, timeout=(5, 60),
+                 pool_size=8, retries=3, session=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_cache_bytes = max_cache_bytes
+        # (connect, read) timeout in seconds; the read timeout applies per chunk
+        self.timeout = timeout
+        os.makedirs(cache_dir, exist_ok=True)
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                max_retries=Retry(total=retries, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                                  allowed_methods=('GET',))
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+        self._locks = {}
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.downloads = 0
+        self.revalidations = 0
+        self.bytes_downloaded = 0
+
+    @staticmethod
+    def file_extension(url):
+        """Extension of the file named by the URL path, ignoring query and fragment"""
+        return os.path.basename(urlparse(url).path).split('.')[-1].lower()
+
+    def _paths(self, url):
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name + '.bin'), os.path.join(self.cache_dir, name + '.json')
+
+    def _url_lock(self, url):
+        with self._lock:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def download(self, url):
+        """Return the path of an up-to-date local copy of the file at url"""
+        data_path, meta_path = self._paths(url)
+        with self._url_lock(url):
+            meta = None
+            if os.path.exists(data_path) and os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    meta = json.load(f)
+
+            headers = {}
+            if meta is not None:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 304 and meta is not None:
+                    self.revalidations += 1
+                    os.utime(data_path)
+                    return data_path
+                response.raise_for_status()
+
+                length = response.headers.get('Content-Length')
+                if length is not None and int(length) > self.max_bytes:
+                    raise DownloadTooLargeError(f"Model at {url} is {length} bytes; the limit is {self.max_bytes}")
+
+                size = self._write(response, url, data_path)
+                meta = {
+                    'url': url,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'size': size
+                }
+
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+            self.downloads += 1
+            self.bytes_downloaded += size
+
+        self._prune(keep=data_path)
+        return data_path
+
+    def _write(self, response, url, data_path):
+        """Stream the body to a temporary file and move it into place; returns its size"""
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.part', delete=False) as tmp:
+            try:
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise DownloadTooLargeError(f"Model at {url} exceeds the limit of {self.max_bytes} bytes")
+                    tmp.write(chunk)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        os.replace(tmp.name, data_path)
+        return size
+
+    def read(self, url):
+        """Return (bytes, file extension) of the model at url"""
+        with open(self.download(url), 'rb') as f:
+            return f.read(), self.file_extension(url)
+
+    def _prune(self, keep=None):
+        """Remove least recently used cached files while the cache is over max_cache_bytes"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.bin'):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_cache_bytes:
+                break
+            if path == keep:
+                continue
+            for stale in (path, path[:-len('.bin')] + '.json'):
+                try:
+                    os.unlink(stale)
+                except OSError:
+                    pass
+            total -= size
+
+    def stats(self):
+        return {
+            'cache_dir': self.cache_dir,
+            'downloads': self.downloads,
+            'revalidations': self.revalidations,
+            'bytes_downloaded': self.bytes_downloaded
+        }
+
+
+def model_downloader_from_env():
+    """Downloader configured from MODEL_DOWNLOAD_* environment variables"""
+    return ModelDownloader(
+        os.environ.get('MODEL_DOWNLOAD_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'effector-backend',
+                                                                'models')),
+        max_bytes=int(os.environ.get('MODEL_DOWNLOAD_MAX_BYTES', 2 * 1024 ** 3)),
+        max_cache_bytes=int(os.environ.get('MODEL_DOWNLOAD_CACHE_BYTES', 8 * 1024 ** 3)),
+        timeout=(5, float(os.environ.get('MODEL_DOWNLOAD_TIMEOUT', 60)))
+    )
@@ -0,0 +1,156 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from backend.DataModelFetcher import DataModelFetcher
+from backend.LRUCache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Content-addressed registry of loaded models with LRU eviction
+
+    Models are identified by the SHA-256 of their file contents, so uploading
+    the same model twice returns the same model_id and loading, validation and
+    warm-up only run the first time.
+
+    With a shared_dir, model files are also written there, so a process that
+    never saw the upload loads the model from disk on its first request.
+    """
+
+    def __init__(self, data_fetcher=None, max_models=8, max_bytes=2 * 1024 ** 3, shared_dir=None):
+        self.data_fetcher = data_fetcher or DataModelFetcher()
+        self._cache = LRUCache(max_items=max_models, max_bytes=max_bytes)
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self.shared_dir = shared_dir
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    @staticmethod
+    def compute_model_id(model_bytes, file_extension):
+        """Model ID is the content hash of the model file and its format"""
+        digest = hashlib.sha256(model_bytes)
+        digest.update(file_extension.encode('utf-8'))
+        return digest.hexdigest()
+
+    def register(self, model_bytes, file_extension):
+        """Load a model unless an identical one is already registered and return its ID"""
+        model_id = self.compute_model_id(model_bytes, file_extension)
+
+        # Serialize loads of the same model so concurrent uploads load it once
+        with self._lock:
+            load_lock = self._load_locks.setdefault(model_id, threading.Lock())
+
+        try:
+            with load_lock:
+                if self._cache.get(model_id) is None:
+                    logger.info("Registering model %s (%s, %s bytes)", model_id[:12], file_extension, len(model_bytes))
+                    model = self.data_fetcher.load_model(model_bytes, file_extension)
+                    entry = {
+                        'model': model,
+                        'model_id': model_id,
+                        # Kept so the model can be shipped to worker processes
+                        'model_bytes': model_bytes,
+                        'file_extension': file_extension,
+                        'model_type': type(getattr(model, 'model', model)).__name__,
+                        'nbytes': len(model_bytes),
+                        'artifacts': {}
+                    }
+                    self._cache.put(model_id, entry, nbytes=len(model_bytes))
+                    self._write_shared(model_id, model_bytes, file_extension)
+        finally:
+            with self._lock:
+                self._load_locks.pop(model_id, None)
+        return model_id
+
+    def register_upload(self, model_file=None, model_url=None):
+        """Read a model from an uploaded file or URL and register it"""
+        try:
+            model_bytes, file_extension = self.data_fetcher.read_model(model_file=model_file, model_url=model_url)
+        except Exception as e:
+            raise ValueError(f"Failed to load model: {str(e)}")
+        return self.register(model_bytes, file_extension)
+
+    def get_entry(self, model_id):
+        entry = self._cache.get(model_id)
+        if entry is None and self._shared_path(model_id) is not None:
+            self._load_shared(model_id)
+            entry = self._cache.get(model_id)
+        if entry is None:
+            raise KeyError(f"Unknown model_id: {model_id}")
+        return entry
+
+    def _shared_path(self, model_id):
+        """Path of the shared copy of a model file, or None"""
+        # IDs come from requests; only hex digests name files
+        if not self.shared_dir or not model_id or not all(c in '0123456789abcdef' for c in model_id):
+            return None
+        prefix = model_id + '.'
+        for name in os.listdir(self.shared_dir):
+            if name.startswith(prefix) and not name.endswith('.part'):
+                return os.path.join(self.shared_dir, name)
+        return None
+
+    def _write_shared(self, model_id, model_bytes, file_extension):
+        if not self.shared_dir or self._shared_path(model_id) is not None:
+            return
+        with tempfile.NamedTemporaryFile(dir=self.shared_dir, suffix='.part', delete=False) as tmp:
+            tmp.write(model_bytes)
+        os.replace(tmp.name, os.path.join(self.shared_dir, f"{model_id}.{file_extension}"))
+
+    def _load_shared(self, model_id):
+        path = self._shared_path(model_id)
+        with open(path, 'rb') as f:
+            model_bytes = f.read()
+        logger.info("Loading model %s from the shared directory", model_id[:12])
+        self.register(model_bytes, path[len(os.path.join(self.shared_dir, model_id)) + 1:])
+
+    def get(self, model_id):
+        """Return the loaded model for a model ID"""
+        return self.get_entry(model_id)['model']
+
+    def artifact(self, model_id, name, factory):
+        """Return a per-model object (e.g. a compiled function), creating it once
+
+        Artifacts live in the registry entry, so they are evicted with the model.
+        """
+        entry = self.get_entry(model_id)
+        with self._lock:
+            if name not in entry['artifacts']:
+                entry['artifacts'][name] = factory(entry['model'])
+            return entry['artifacts'][name]
+
+    def artifact_stats(self, name):
+        """stats() of one kind of artifact for every registered model that has it"""
+        stats = {}
+        for model_id in self._cache.keys():
+            entry = self._cache.peek(model_id)
+            artifact = entry['artifacts'].get(name) if entry is not None else None
+            if artifact is not None and hasattr(artifact, 'stats'):
+                stats[model_id] = artifact.stats()
+        return stats
+
+    def source(self, model_id):
+        """Return the (bytes, file extension) a registered model was loaded from"""
+        entry = self.get_entry(model_id)
+        return entry['model_bytes'], entry['file_extension']
+
+    def __contains__(self, model_id):
+        return model_id in self._cache or self._shared_path(model_id) is not None
+
+    def describe(self, model_id):
+        entry = self.get_entry(model_id)
+        return {
+            'model_id': model_id,
+            'model_type': entry['model_type'],
+            'file_extension': entry['file_extension'],
+            'nbytes': entry['nbytes']
+        }
+
+    def stats(self):
+        return self._cache.stats()
@@ -1,14 +1,33 @@
-import traceback
-from functools import reduce
+import logging
 
 import numpy as np
 
+from backend.Startup import lazy_import
+
+
+logger = logging.getLogger(__name__)
+
+# Imported by the first time series model; PRELOAD_MODULES moves that to startup
+darts = lazy_import('darts')
+pd = lazy_import('pandas')
+
 
 class ModelWrapper:
-    def __init__(self, model):
+    def __init__(self, model, batched=True):
         self.model = model
         self.model_type = type(model).__name__
-        print(f"Initializing wrapper for model type: {self.model_type}")
+
+        # Batched mode returns one prediction per input row (sliding windows)
+        # instead of a single forecast for the whole input matrix
+        self.batched = batched
+        self._lag_layout = None
+
+        # Batched sequence models predict each row from the rows before it
+        self.rows_independent = self.model_type != 'CatBoostModel'
+
+        # Hourly date index per series length, anchored once per wrapper
+        self._date_index_cache = {}
+        self._date_index_end = None
 
         # Default configuration
         self.input_chunk_length = 24
@@ -22,89 +41,165 @@ class ModelWrapper:
             self.input_chunk_length = model.input_chunk_length
         if hasattr(model, 'output_chunk_length'):
             self.output_chunk_length = model.output_chunk_length
-
-        print("Model configuration:")
-        print(f"- Input chunk length: {self.input_chunk_length}")
-        print(f"- Output chunk length: {self.output_chunk_length}")
-        print(f"- Total features: {self.n_features}")
-        print(f"- Expected covariates: {self.n_covariates}")
-        print(f"- Target index: {self.target_idx}")
+        if hasattr(model, 'n_features_in_'):
+            # scikit-learn estimators know their input width
+            self.n_features = int(model.n_features_in_)
+
+        logger.info("Wrapped %s: input chunk length %s, output chunk length %s, %s features, %s covariates, "
+                    "target index %s", self.model_type, self.input_chunk_length, self.output_chunk_length,
+                    self.n_features, self.n_covariates, self.target_idx)
+
+    def _date_index(self, length):
+        """Cached hourly DatetimeIndex of the given length"""
+        dates = self._date_index_cache.get(length)
+        if dates is None:
+            if self._date_index_end is None:
+                self._date_index_end = pd.Timestamp.now().floor('h')
+            dates = pd.date_range(end=self._date_index_end, periods=length, freq='h')
+            self._date_index_cache[length] = dates
+        return dates
+
+    @staticmethod
+    def _series_from_values(dates, values, columns):
+        """Build a TimeSeries on top of an array slice, without copying when Darts allows it"""
+        try:
+            return darts.TimeSeries.from_times_and_values(dates, values, freq='h', columns=columns, copy=False)
+        except TypeError:
+            # Older Darts versions always copy
+            return darts.TimeSeries.from_times_and_values(dates, values, freq='h', columns=columns)
 
     def _create_time_series(self, X):
-        """Create Darts TimeSeries with correct dimensions"""
-        import pandas as pd
-        from darts import TimeSeries
-        import numpy as np
-
-        print(f"Input data shape: {X.shape}")
-
-        # Ensure we have enough data points
+        """Create the target and multivariate covariate series directly from array slices"""
         if len(X) < self.input_chunk_length:
             raise ValueError(f"Need at least {self.input_chunk_length} data points, got {len(X)}")
 
-        # Create dates aligned with the end
-        dates = pd.date_range(
-            end=pd.Timestamp.now(),
-            periods=len(X),
-            freq='h'
-        )
-
-        # Split features and target
-        features = X[:, :self.n_covariates]  # Take only first n_covariates columns
-        target = X[:, self.target_idx].reshape(-1, 1)  # Reshape target to 2D
+        dates = self._date_index(len(X))
 
-        # Create target series
-        target_df = pd.DataFrame(
-            target,
-            index=dates,
-            columns=['target']
-        )
-        target_series = TimeSeries.from_dataframe(
-            target_df,
-            freq='h',
-            fill_missing_dates=True
+        # Basic slices keep both inputs as views of X
+        target_column = self.target_idx % X.shape[1]
+        target_series = self._series_from_values(dates, X[:, target_column:target_column + 1], ['target'])
+        covariates = self._series_from_values(
+            dates,
+            X[:, :self.n_covariates],
+            [f'feature_{i}' for i in range(self.n_covariates)]
         )
+        return target_series, covariates
 
-        # Create separate series for each covariate
-        covariate_series = []
-        for i in range(self.n_covariates):
-            df = pd.DataFrame(
-                features[:, i].reshape(-1, 1),
-                index=dates,
-                columns=[f'feature_{i}']
-            )
-            series = TimeSeries.from_dataframe(
-                df,
-                freq='h',
-                fill_missing_dates=True
-            )
-            covariate_series.append(series)
-
-        # Combine all covariate series
-        covariates = reduce(
-            lambda x, y: x.concatenate(y, axis=1),
-            covariate_series
+    def _window_length(self):
+        """Number of rows each sliding window must cover to serve every lag"""
+        lags = getattr(self.model, 'lags', None) or {}
+        max_lag = max([-lag for component_lags in lags.values() for lag in component_lags] + [0])
+        return max(self.input_chunk_length, max_lag)
+
+    @property
+    def context_rows(self):
+        """Preceding rows the prediction of a row depends on"""
+        return 0 if self.rows_independent else self._window_length() - 1
+
+    def _sliding_windows(self, X):
+        """Strided (n_rows, n_columns, window_length) view of the window ending at each row
+
+        The first rows are padded by repeating the first observation, so every
+        row gets a full window and one prediction.
+        """
+        window_length = self._window_length()
+        padded = np.pad(X, ((window_length - 1, 0), (0, 0)), mode='edge')
+        # as_strided instead of sliding_window_view, which needs numpy>=1.20
+        row_stride, column_stride = padded.strides
+        return np.lib.stride_tricks.as_strided(
+            padded,
+            shape=(len(X), padded.shape[1], window_length),
+            strides=(row_stride, column_stride, row_stride),
+            writeable=False
         )
 
-        print("Time series created:")
-        print(f"- Target shape: {target_series.values().shape}")
-        print(f"- Covariates shape: {covariates.values().shape}")
-        print(f"- Date range: {dates[0]} to {dates[-1]}")
-        print(f"- Number of covariate components: {len(covariate_series)}")
+    def _native_lag_layout(self):
+        """Map each lagged feature of the underlying regressor to a (column, window position)
+
+        Mirrors the Darts tabularization: target lags first, then future covariate
+        lags, each lag holding all of its components. Returns None when the model
+        uses features this mapping cannot reproduce (past covariates, encoders,
+        static covariates, component-specific lags, probabilistic outputs).
+        """
+        if self._lag_layout is not None:
+            return self._lag_layout or None
+
+        layout = False
+        lags = getattr(self.model, 'lags', None)
+        supported = (
+            lags is not None
+            and set(lags) <= {'target', 'future'}
+            and 'target' in lags
+            and not getattr(self.model, 'component_lags', None)
+            and not getattr(self.model, 'add_encoders', None)
+            and not getattr(self.model, 'likelihood', None)
+            and not getattr(self.model, 'output_chunk_shift', 0)
+            and getattr(self.model, 'static_covariates', None) is None
+            and hasattr(getattr(self.model, 'model', None), 'predict')
+        )
+        if supported:
+            window_length = self._window_length()
+            last = window_length - 1
+            columns = []
+            positions = []
+
+            # Lag -1 is the last row of the window; the forecast step is one row later
+            for lag in lags['target']:
+                columns.append(self.target_idx)
+                positions.append(window_length + lag)
+
+            # Future covariates beyond the window are not known, reuse the last row
+            for lag in lags.get('future', []):
+                for i in range(self.n_covariates):
+                    columns.append(i)
+                    positions.append(min(window_length + lag, last))
+
+            feature_names = getattr(self.model, 'lagged_feature_names', None)
+            if feature_names is None or len(feature_names) == len(columns):
+                layout = (np.array(columns), np.array(positions))
+            else:
+                logger.warning("Lag layout mismatch: %s features vs %s expected by the model",
+                               len(columns), len(feature_names))
+
+        self._lag_layout = layout
+        return layout or None
+
+    def _predict_batched(self, X):
+        """One prediction per row, evaluated on all sliding windows at once"""
+        windows = self._sliding_windows(X)
+        layout = self._native_lag_layout()
+
+        if layout is not None:
+            # Gather every lagged feature of every window in one fancy-indexing step
+            columns, positions = layout
+            features = windows[:, columns, positions]
+            predictions = np.asarray(self.model.model.predict(features))
+            return predictions.reshape(len(X), -1)[:, 0]
+
+        # Fall back to the Darts multi-series predict with one series per window
+        window_length = windows.shape[-1]
+        dates = self._date_index(window_length + 1)
+        target_series = []
+        covariate_series = []
+        for window in windows:
+            values = window.T
+            target_series.append(darts.TimeSeries.from_times_and_values(dates[:-1], values[:, [self.target_idx]]))
+            # Extend the covariates by one step so future lags up to the forecast step exist
+            covariates = np.concatenate([values[:, :self.n_covariates], values[-1:, :self.n_covariates]])
+            covariate_series.append(darts.TimeSeries.from_times_and_values(dates, covariates))
 
-        return target_series, covariates
+        predictions = self.model.predict(n=1, series=target_series, future_covariates=covariate_series)
+        return np.array([prediction.values()[0, 0] for prediction in predictions])
 
     def predict(self, X):
-        print(f"Starting prediction with input shape: {X.shape}")
+        logger.debug("Starting prediction with input shape: %s", np.shape(X))
         try:
-            if self.model_type == 'CatBoostModel':
-                print("Creating time series for prediction")
+            if self.model_type == 'CatBoostModel' and self.batched:
+                result = self._predict_batched(np.asarray(X))
+                return result
+            elif self.model_type == 'CatBoostModel':
                 target_series, covariates = self._create_time_series(X)
 
-                print("Making prediction")
-                print(f"Target series shape: {target_series.values().shape}")
-                print(f"Covariates shape: {covariates.values().shape}")
-
                 # Use only the required window length
                 window_start = -self.input_chunk_length if len(target_series) >= self.input_chunk_length else None
 
@@ -115,13 +210,10 @@ class ModelWrapper:
                 )
 
                 result = predictions.values().flatten()
-                print(f"Prediction shape: {result.shape}")
                 return result
             else:
                 return self.model.predict(X)
 
         except Exception as e:
-            print(f"Prediction error in {self.model_type}:")
-            print(f"Error message: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Prediction error in %s: %s", self.model_type, e)
             raise
\ No newline at end of file
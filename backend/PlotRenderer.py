@@ -0,0 +1,172 @@
+import io
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from backend.Startup import lazy_import
+
+# Imported by the first render, which usually runs in a renderer process
+backend_agg = lazy_import('matplotlib.backends.backend_agg')
+figure_module = lazy_import('matplotlib.figure')
+
+IMAGE_FORMATS = ('png', 'webp')
+
+METHOD_TITLES = {
+    'pdp': 'PDP',
+    'rhale': 'RHALE',
+    'regional_rhale': 'Regional RHALE',
+    'regional_pdp': 'Regional PDP'
+}
+
+
+def _array(values):
+    """Curve arrays arrive as numpy arrays or JSON lists with None for NaN"""
+    return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+
+def _draw_effect(ax, curve, heterogeneity):
+    x, y = _array(curve['x']), _array(curve['y'])
+    ax.plot(x, y, color='tab:blue', linewidth=2, label='average effect')
+    if heterogeneity and 'std' in curve:
+        std = _array(curve['std'])
+        ax.fill_between(x, y - std, y + std, color='tab:red', alpha=0.2, label='heterogeneity (std)')
+    if curve.get('avg_output') is not None:
+        ax.axhline(curve['avg_output'], color='gray', linestyle='--', linewidth=1,
+                   label='average output')
+    ax.grid(alpha=0.3)
+    ax.legend(loc='best', fontsize='small')
+
+
+def _draw_bin_effects(ax, curve):
+    # One step artist and one line collection instead of an artist per bin
+    limits = _array(curve['bin_limits'])
+    effect = _array(curve['bin_effect'])
+    std = _array(curve['bin_std'])
+    centers = (limits[:-1] + limits[1:]) / 2
+    ax.stairs(effect, limits, fill=True, color='tab:blue', alpha=0.5)
+    ax.vlines(centers, effect - std, effect + std, color='tab:red', alpha=0.5, linewidth=0.8)
+    ax.grid(alpha=0.3)
+
+
+def render_curve(curve, method, feature_name='x', target_name='prediction', title=None,
+                 dpi=100, figsize=(8, 5), image_format='png', compress=False):
+    """Render a numeric effect curve to image bytes
+
+    Uses an explicit Figure on the Agg canvas, so nothing touches pyplot's
+    global state and renders are safe to run concurrently. Compressed PNGs are
+    quantized to a 256-colour palette; compressed WebP is lossy.
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Invalid image format {image_format}; choose from {', '.join(IMAGE_FORMATS)}")
+
+    figure = figure_module.Figure(figsize=figsize, dpi=dpi)
+    backend_agg.FigureCanvasAgg(figure)
+    has_bins = 'bin_effect' in curve
+
+    if has_bins:
+        effect_ax, bins_ax = figure.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]})
+    else:
+        effect_ax, bins_ax = figure.subplots(1, 1), None
+
+    _draw_effect(effect_ax, curve, heterogeneity=method.startswith('regional'))
+    effect_ax.set_ylabel(target_name)
+    effect_ax.set_title(title or f"{METHOD_TITLES.get(method, method)} plot")
+
+    if bins_ax is not None:
+        _draw_bin_effects(bins_ax, curve)
+        bins_ax.set_ylabel(f"d{target_name}/d{feature_name}")
+        bins_ax.set_xlabel(feature_name)
+    else:
+        effect_ax.set_xlabel(feature_name)
+    # Fixed margins; tight_layout costs an extra full draw
+    figure.subplots_adjust(left=0.1, right=0.97, bottom=0.1, top=0.93, hspace=0.1)
+
+    buffer = io.BytesIO()
+    if image_format == 'png' and not compress:
+        figure.savefig(buffer, format='png', dpi=dpi)
+        return buffer.getvalue()
+
+    # Pillow, which matplotlib depends on, encodes WebP; matplotlib only saves it from 3.6
+    from PIL import Image
+
+    figure.canvas.draw()
+    image = Image.fromarray(np.asarray(figure.canvas.buffer_rgba())).convert('RGB')
+    if image_format == 'webp':
+        image.save(buffer, format='webp', **({'quality': 80} if compress else {'lossless': True}))
+    else:
+        image.quantize(colors=256).save(buffer, format='png', optimize=True)
+    return buffer.getvalue()
+
+
+def _pool_context():
+    """Process start method that does not re-import the server (and TensorFlow) in renderers"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['backend.PlotRenderer'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class PlotRenderer:
+    """Pool of worker processes that render effect curves to images
+
+    With max_workers=0 images are rendered inline, which is what worker
+    processes that are already off the request thread should use.
+    """
+
+    def __init__(self, max_workers=2, dpi=100, figsize=(8, 5), image_format='png', compress=False):
+        self.max_workers = max_workers
+        self.dpi = dpi
+        self.figsize = tuple(figsize)
+        self.image_format = image_format
+        self.compress = compress
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_pool_context())
+        return self._executor
+
+    def submit(self, curve, method, **options):
+        """Start rendering a curve and return a Future with the image bytes"""
+        options.setdefault('dpi', self.dpi)
+        options.setdefault('figsize', self.figsize)
+        options.setdefault('image_format', self.image_format)
+        options.setdefault('compress', self.compress)
+
+        if self.max_workers == 0:
+            future = Future()
+            try:
+                future.set_result(render_curve(curve, method, **options))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        try:
+            return self._get_executor().submit(render_curve, curve, method, **options)
+        except BrokenProcessPool:
+            # A renderer died (e.g. killed for memory); start a fresh pool once
+            self._executor = None
+            return self._get_executor().submit(render_curve, curve, method, **options)
+
+    def render(self, curve, method, **options):
+        return self.submit(curve, method, **options).result()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def renderer_from_env(max_workers=None):
+    """Renderer configured from PLOT_* environment variables"""
+    return PlotRenderer(
+        max_workers=int(os.environ.get('PLOT_RENDER_WORKERS', 2)) if max_workers is None else max_workers,
+        dpi=int(os.environ.get('PLOT_DPI', 100)),
+        figsize=tuple(float(size) for size in os.environ.get('PLOT_FIGSIZE', '8,5').split(',')),
+        image_format=os.environ.get('PLOT_FORMAT', 'png'),
+        compress=os.environ.get('PLOT_COMPRESS', '0') == '1'
+    )
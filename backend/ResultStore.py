@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+
+def result_key(kind, **parts):
+    """Stable hash of everything a cached result depends on"""
+    payload = json.dumps({'kind': kind, **parts}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    """Persistent SQLite cache of analysis results with size-based LRU eviction
+
+    Values are pickled; the database is private to the server, which is the
+    only writer. Several processes (e.g. job workers) may share one file.
+    Access times are updated on every hit and the least recently used entries
+    are deleted once the stored bytes exceed max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=1024 ** 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, kind TEXT, value BLOB, nbytes INTEGER, created REAL, last_access REAL)'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)')
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._connection.execute('UPDATE results SET last_access = ? WHERE key = ?', (time.time(), key))
+        return pickle.loads(row[0])
+
+    def put(self, key, value, kind='result'):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO results (key, kind, value, nbytes, created, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, kind, blob, len(blob), now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._connection.execute('SELECT COALESCE(SUM(nbytes), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Walk entries from least recently used until enough bytes are freed
+        to_delete = []
+        for key, nbytes in self._connection.execute('SELECT key, nbytes FROM results ORDER BY last_access'):
+            to_delete.append((key,))
+            total -= nbytes
+            if total <= self.max_bytes:
+                break
+        self._connection.executemany('DELETE FROM results WHERE key = ?', to_delete)
+        self.evictions += len(to_delete)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._connection.execute('SELECT 1 FROM results WHERE key = ?', (key,)).fetchone() is not None
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute('DELETE FROM results')
+
+    def stats(self):
+        with self._lock:
+            items, nbytes = self._connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM results'
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'path': self.path,
+            'items': items,
+            'bytes': nbytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def result_store_from_env():
+    """Result store configured from RESULT_STORE_* environment variables, or None when disabled"""
+    path = os.environ.get('RESULT_STORE_PATH', os.path.join(os.path.expanduser('~'), '.cache', 'effector-backend',
+                                                             'results.sqlite'))
+    if not path:
+        return None
+    return ResultStore(path, max_bytes=int(os.environ.get('RESULT_STORE_MAX_BYTES', 1024 ** 3)))
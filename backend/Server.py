@@ -0,0 +1,409 @@
+import argparse
+import hashlib
+import http.client
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import resource
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+from multiprocessing.connection import wait
+from urllib.parse import parse_qs
+
+from werkzeug.formparser import parse_form_data
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+
+from backend.Metrics import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Request bodies up to this size are read by the router to find their model or dataset ID
+ROUTING_BODY_BYTES = 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+HOP_BY_HOP_HEADERS = frozenset({
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailers',
+    'transfer-encoding', 'upgrade'
+})
+
+# Job IDs of server workers start with w<worker index>-
+JOB_PATH = re.compile(r'^/jobs/w(\d+)-')
+
+
+def resident_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # Peak instead of current RSS where /proc is unavailable
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def serve_worker(index, socket_path, supervisor_pid, max_rss=None, max_data_bytes=None, check_interval=1.0):
+    """Serve the app on a Unix socket until the worker grows past max_rss bytes while idle
+
+    max_data_bytes is a hard RLIMIT_DATA on the heap; allocations past it fail.
+    The worker also stops when the supervisor process is gone.
+    """
+    os.environ['SERVER_WORKER_INDEX'] = str(index)
+    configure_logging()
+    if max_data_bytes:
+        resource.setrlimit(resource.RLIMIT_DATA, (max_data_bytes, max_data_bytes))
+
+    # Imported after the fork, so every worker initializes its own TensorFlow
+    from backend.main import app, shutdown
+
+    inflight = [0]
+    lock = threading.Lock()
+
+    def release():
+        with lock:
+            inflight[0] -= 1
+
+    def counted(environ, start_response):
+        # A request counts until its response is fully sent, including streamed ones
+        with lock:
+            inflight[0] += 1
+        try:
+            return ClosingIterator(app(environ, start_response), [release])
+        except BaseException:
+            release()
+            raise
+
+    server = make_server(f'unix://{socket_path}', 0, counted, threaded=True)
+
+    def watch():
+        while True:
+            time.sleep(check_interval)
+            try:
+                os.kill(supervisor_pid, 0)
+            except ProcessLookupError:
+                logger.warning("Supervisor %s is gone; worker %s stops", supervisor_pid, index)
+                break
+            rss = resident_bytes()
+            if max_rss and inflight[0] == 0 and rss > max_rss:
+                logger.warning("Worker %s uses %.0f MiB, over its limit of %.0f MiB; restarting",
+                               index, rss / 1024 ** 2, max_rss / 1024 ** 2)
+                break
+        server.shutdown()
+
+    threading.Thread(target=watch, name='worker-watch', daemon=True).start()
+    # Stop serving on SIGTERM but exit normally, so the worker's own child processes are shut down too
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    logger.info("Worker %s (pid %s) serving on %s", index, os.getpid(), socket_path)
+    server.serve_forever()
+    server.server_close()
+    # Child processes are stopped explicitly; waiting for them at interpreter exit can deadlock
+    shutdown()
+
+
+class WorkerPool:
+    """Worker processes serving the app on Unix sockets, replaced when they exit
+
+    Workers are forked from a forkserver that has not imported TensorFlow,
+    so the fork is safe and each worker starts from the same clean state.
+    """
+
+    def __init__(self, n_workers, socket_dir, max_rss=None, max_data_bytes=None, preload_modules=()):
+        self._context = multiprocessing.get_context('forkserver')
+        if preload_modules:
+            # Imported once in the forkserver and shared copy-on-write by every worker
+            self._context.set_forkserver_preload(list(preload_modules))
+        self.max_rss = max_rss
+        self.max_data_bytes = max_data_bytes
+        self.workers = [
+            {
+                'index': index,
+                'socket': os.path.join(socket_dir, f'worker-{index}.sock'),
+                'process': None,
+                'restarts': -1,
+                'inflight': 0,
+                'requests': 0
+            }
+            for index in range(n_workers)
+        ]
+        self._stopping = False
+
+    def _spawn(self, worker):
+        process = self._context.Process(
+            target=serve_worker,
+            args=(worker['index'], worker['socket'], os.getpid(), self.max_rss, self.max_data_bytes),
+            # Not daemonic: workers start their own renderer and job processes
+            name=f"server-worker-{worker['index']}"
+        )
+        process.start()
+        worker['process'] = process
+        worker['restarts'] += 1
+
+    def start(self):
+        for worker in self.workers:
+            self._spawn(worker)
+
+    def supervise(self):
+        """Replace exited workers until stop() is called"""
+        while not self._stopping:
+            sentinels = {worker['process'].sentinel: worker for worker in self.workers}
+            for sentinel in wait(list(sentinels), timeout=1.0):
+                worker = sentinels[sentinel]
+                if self._stopping:
+                    break
+                logger.warning("Worker %s (pid %s) exited with code %s; starting a new one", worker['index'],
+                               worker['process'].pid, worker['process'].exitcode)
+                self._spawn(worker)
+
+    def stop(self, timeout=10):
+        self._stopping = True
+        for worker in self.workers:
+            worker['process'].terminate()
+        for worker in self.workers:
+            worker['process'].join(timeout)
+
+    def stats(self):
+        return [
+            {
+                'index': worker['index'],
+                'pid': worker['process'].pid,
+                'alive': worker['process'].is_alive(),
+                'restarts': worker['restarts'],
+                'inflight': worker['inflight'],
+                'requests': worker['requests']
+            }
+            for worker in self.workers
+        ]
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def read_at_most(stream, size):
+    """Read until size bytes or the end of the stream"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(min(COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def routing_key(environ, body):
+    """model_id, or else dataset_id, named by the query string or a buffered form body"""
+    values = {name: items[0] for name, items in parse_qs(environ.get('QUERY_STRING', '')).items()}
+    if body:
+        form_environ = {**environ, 'wsgi.input': io.BytesIO(body), 'CONTENT_LENGTH': str(len(body))}
+        _, form, _ = parse_form_data(form_environ, silent=True)
+        values.update(form.items())
+    return values.get('model_id') or values.get('dataset_id') or None
+
+
+class Router:
+    """WSGI app forwarding each request to a worker chosen by model or dataset affinity
+
+    Requests naming a model_id (or else a dataset_id) go to the worker the ID
+    hashes to, so each model is loaded by as few workers as possible and its
+    Jacobian and prediction caches stay warm. When that worker already has
+    spill_inflight requests in flight, the request goes to the least busy
+    worker instead; the shared store lets any worker serve any request. Job
+    requests go to the worker named by the job ID prefix.
+    """
+
+    def __init__(self, pool, spill_inflight=4, connect_timeout=60, read_timeout=None):
+        self.pool = pool
+        self.spill_inflight = spill_inflight
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._lock = threading.Lock()
+
+    def pick(self, path, key):
+        workers = self.pool.workers
+        match = JOB_PATH.match(path)
+        if match and int(match.group(1)) < len(workers):
+            return workers[int(match.group(1))]
+
+        with self._lock:
+            least_busy = min(workers, key=lambda worker: worker['inflight'])
+            if key is None:
+                return least_busy
+            preferred = workers[int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:8], 16) % len(workers)]
+            if preferred['inflight'] >= self.spill_inflight and least_busy['inflight'] < preferred['inflight']:
+                return least_busy
+            return preferred
+
+    def _connect(self, worker):
+        """Connect to a worker, waiting while it is being (re)started"""
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            connection = UnixHTTPConnection(worker['socket'], timeout=self.read_timeout)
+            try:
+                connection.connect()
+                return connection
+            except (FileNotFoundError, ConnectionRefusedError):
+                connection.close()
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+
+    @staticmethod
+    def _request_headers(environ, length):
+        headers = []
+        for name, value in environ.items():
+            if name.startswith('HTTP_'):
+                header = name[5:].replace('_', '-').title()
+            elif name == 'CONTENT_TYPE' and value:
+                header = 'Content-Type'
+            else:
+                continue
+            if header.lower() not in HOP_BY_HOP_HEADERS and header != 'Content-Length':
+                headers.append((header, value))
+        headers.append(('Content-Length', str(length)))
+        headers.append(('X-Forwarded-For', environ.get('REMOTE_ADDR', '')))
+        return headers
+
+    def _forward(self, worker, environ, body, length):
+        connection = self._connect(worker)
+        try:
+            path = environ.get('PATH_INFO', '/')
+            if environ.get('QUERY_STRING'):
+                path += '?' + environ['QUERY_STRING']
+            connection.putrequest(environ['REQUEST_METHOD'], path, skip_host=True, skip_accept_encoding=True)
+            for header, value in self._request_headers(environ, len(body) if body is not None else length):
+                connection.putheader(header, value)
+            connection.endheaders()
+
+            if body is not None:
+                connection.send(body)
+            else:
+                # Large uploads are streamed through without buffering
+                remaining = length
+                while remaining > 0:
+                    chunk = environ['wsgi.input'].read(min(COPY_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    connection.send(chunk)
+                    remaining -= len(chunk)
+            return connection, connection.getresponse()
+        except BaseException:
+            connection.close()
+            raise
+
+    def _relay(self, worker, connection, response):
+        # read1 returns what has arrived, so streamed (SSE) responses are passed on as they come
+        try:
+            while True:
+                chunk = response.read1(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            connection.close()
+            with self._lock:
+                worker['inflight'] -= 1
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO') == '/server/workers':
+            start_response('200 OK', [('Content-Type', 'application/json')])
+            return [json.dumps({'status': 'success', 'workers': self.pool.stats()}).encode('utf-8')]
+
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        if not environ.get('CONTENT_LENGTH') and environ.get('wsgi.input_terminated'):
+            # Chunked request body; forwarded with its length once read, so only small ones are accepted
+            body = read_at_most(environ['wsgi.input'], ROUTING_BODY_BYTES + 1)
+            if len(body) > ROUTING_BODY_BYTES:
+                start_response('411 Length Required', [('Content-Type', 'application/json')])
+                message = f"Chunked request bodies are limited to {ROUTING_BODY_BYTES} bytes; send a Content-Length"
+                return [json.dumps({'status': 'error', 'message': message}).encode('utf-8')]
+        elif length <= ROUTING_BODY_BYTES:
+            body = environ['wsgi.input'].read(length) if length else b''
+        else:
+            body = None
+        worker = self.pick(environ.get('PATH_INFO', '/'), routing_key(environ, body))
+
+        with self._lock:
+            worker['inflight'] += 1
+            worker['requests'] += 1
+        try:
+            connection, response = self._forward(worker, environ, body, length)
+        except Exception as e:
+            with self._lock:
+                worker['inflight'] -= 1
+            logger.error("Forwarding to worker %s failed: %s", worker['index'], e)
+            start_response('502 Bad Gateway', [('Content-Type', 'application/json')])
+            return [json.dumps({'status': 'error', 'message': f"Worker {worker['index']} unavailable"}).encode('utf-8')]
+
+        headers = [(name, value) for name, value in response.getheaders() if name.lower() not in HOP_BY_HOP_HEADERS]
+        start_response(f'{response.status} {response.reason}', headers)
+        return self._relay(worker, connection, response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-process server: a router in front of pre-forked workers')
+    parser.add_argument('--host', default=os.environ.get('SERVER_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SERVER_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVER_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--shared-dir', default=os.environ.get('SHARED_STORE_DIR'),
+                        help='directory of the datasets and models shared by the workers (default: temporary)')
+    parser.add_argument('--max-rss', type=float, default=float(os.environ.get('SERVER_WORKER_MAX_RSS', 0)),
+                        help='restart a worker once idle above this resident size in bytes (0: no limit)')
+    parser.add_argument('--max-data-bytes', type=float,
+                        default=float(os.environ.get('SERVER_WORKER_MAX_DATA_BYTES', 0)),
+                        help='hard RLIMIT_DATA of each worker in bytes (0: no limit)')
+    parser.add_argument('--spill-inflight', type=int, default=int(os.environ.get('SERVER_SPILL_INFLIGHT', 4)),
+                        help='in-flight requests after which a worker\'s affine requests go to the least busy one')
+    parser.add_argument('--preload-modules', default=os.environ.get('SERVER_FORKSERVER_PRELOAD', ''),
+                        help='comma-separated modules imported once before forking, e.g. effector')
+    args = parser.parse_args()
+    configure_logging()
+
+    socket_dir = tempfile.mkdtemp(prefix='effector-server-')
+    os.environ['SHARED_STORE_DIR'] = args.shared_dir or os.path.join(socket_dir, 'shared')
+    pool = WorkerPool(
+        args.workers,
+        socket_dir,
+        max_rss=int(args.max_rss) or None,
+        max_data_bytes=int(args.max_data_bytes) or None,
+        preload_modules=[name.strip() for name in args.preload_modules.split(',') if name.strip()]
+    )
+    pool.start()
+
+    server = make_server(args.host, args.port, Router(pool, spill_inflight=args.spill_inflight), threaded=True)
+    threading.Thread(target=server.serve_forever, name='router', daemon=True).start()
+    logger.info("Routing http://%s:%s to %s workers (shared store %s)", args.host, args.port, args.workers,
+                os.environ['SHARED_STORE_DIR'])
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        pool.supervise()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        pool.stop()
+        # Holds the worker sockets and, without --shared-dir, the shared store
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# Heavy modules imported on first use; PRELOAD_MODULES=all imports them at startup
+HEAVY_MODULES = ('tensorflow', 'effector', 'matplotlib.figure', 'pandas', 'darts')
+
+STARTED = time.perf_counter()
+
+# Seconds of the first import of each module, including the modules it imports
+_import_times = {}
+
+_preload = {'state': 'idle'}
+
+
+def configure_tensorflow(tf):
+    """Apply TF_INTRA_OP_THREADS and TF_INTER_OP_THREADS to the CPU thread pools
+
+    Only possible before the TensorFlow runtime starts, so it runs right
+    after the import. Unset variables keep TensorFlow's default of one
+    thread per core.
+    """
+    intra_op = os.environ.get('TF_INTRA_OP_THREADS')
+    inter_op = os.environ.get('TF_INTER_OP_THREADS')
+    try:
+        if intra_op:
+            tf.config.threading.set_intra_op_parallelism_threads(int(intra_op))
+        if inter_op:
+            tf.config.threading.set_inter_op_parallelism_threads(int(inter_op))
+    except RuntimeError as e:
+        logger.warning("TensorFlow thread settings not applied: %s", e)
+
+
+# Run once after the first import of a module, before anything uses it
+IMPORT_HOOKS = {'tensorflow': configure_tensorflow}
+
+
+def import_module(name):
+    """Import a module, recording how long its first import took"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    # importlib serializes concurrent imports of the same module; the first to finish records its time
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if name not in _import_times:
+        _import_times[name] = time.perf_counter() - start
+        logger.info("Imported %s in %.2f s", name, _import_times[name])
+        if name in IMPORT_HOOKS:
+            IMPORT_HOOKS[name](module)
+    return module
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that is imported on first attribute access
+
+    on_import(module) runs once, before the first attribute is returned
+    (e.g. to patch the module).
+    """
+
+    def __init__(self, name, on_import=None):
+        super().__init__(name)
+        self._on_import = on_import
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = import_module(self.__name__)
+                    if self._on_import is not None:
+                        self._on_import(module)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+
+def lazy_import(name, on_import=None):
+    return LazyModule(name, on_import=on_import)
+
+
+def import_times():
+    return dict(sorted(list(_import_times.items()), key=lambda item: -item[1]))
+
+
+def warm_up_tensorflow():
+    """Build, run through a tf.function and differentiate a tiny Keras model once
+
+    The first compiled call and the first gradient in a process initialize
+    the TensorFlow runtime and its tracing machinery; doing it here keeps
+    that cost out of the first request.
+    """
+    from backend.KerasInference import KerasInference
+
+    tf = import_module('tensorflow')
+    inputs = tf.keras.Input(shape=(4,))
+    model = tf.keras.Model(inputs, tf.keras.layers.Dense(1)(inputs))
+    x = np.zeros((8, 4), dtype=np.float32)
+    KerasInference(model)(x)
+
+    x = tf.constant(x)
+    with tf.GradientTape() as tape:
+        tape.watch(x)
+        y = model(x)
+    tape.gradient(y, x)
+
+
+def warm_up_model(model_registry, model_id):
+    """Trace the compiled inference and Jacobian of Keras models before the first request"""
+    from backend.Analysis import is_keras_model, make_keras_inference, make_keras_jacobian
+
+    model = model_registry.get(model_id)
+    if not is_keras_model(model):
+        return
+    n_features = model.input_shape[-1] if isinstance(model.input_shape, tuple) else None
+    if n_features is None:
+        return
+    x = np.zeros((1, n_features), dtype=np.float32)
+    model_registry.artifact(model_id, 'inference', make_keras_inference)(x)
+    model_registry.artifact(model_id, 'jacobian', make_keras_jacobian)(x)
+
+
+def register_model(model_registry, source):
+    """Register a model from a local path or an http(s) URL and return its ID"""
+    if source.startswith(('http://', 'https://')):
+        return model_registry.register_upload(model_url=source)
+    with open(source, 'rb') as f:
+        model_bytes = f.read()
+    return model_registry.register(model_bytes, os.path.basename(source).split('.')[-1].lower())
+
+
+def preload(modules=HEAVY_MODULES, warm_tensorflow=False, models=(), model_registry=None):
+    """Import heavy modules, warm up TensorFlow and register models ahead of the first request
+
+    Modules that are not installed are skipped. Returns the preload report,
+    which is also served by startup_report().
+    """
+    _preload.update(state='running', errors=[])
+    start = time.perf_counter()
+
+    for name in modules:
+        try:
+            import_module(name)
+        except ImportError as e:
+            logger.warning("Preload of %s skipped: %s", name, e)
+            _preload['errors'].append(f"{name}: {e}")
+
+    if warm_tensorflow:
+        warm_start = time.perf_counter()
+        try:
+            warm_up_tensorflow()
+            _preload['tensorflow_warmup_seconds'] = time.perf_counter() - warm_start
+        except Exception as e:
+            logger.exception("TensorFlow warm-up failed: %s", e)
+            _preload['errors'].append(f"tensorflow warm-up: {e}")
+
+    registered = {}
+    for source in models:
+        try:
+            model_id = register_model(model_registry, source)
+            warm_up_model(model_registry, model_id)
+            registered[source] = model_id
+        except Exception as e:
+            logger.exception("Preload of model %s failed: %s", source, e)
+            _preload['errors'].append(f"{source}: {e}")
+
+    _preload.update(state='done', seconds=time.perf_counter() - start, models=registered)
+    logger.info("Preload done in %.2f s", _preload['seconds'])
+    return startup_report()
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def preload_from_env(model_registry=None, background=None):
+    """Preload configured by PRELOAD_* environment variables
+
+    PRELOAD_MODULES is a comma-separated module list or 'all',
+    PRELOAD_TENSORFLOW_WARMUP=1 warms up TensorFlow and PRELOAD_MODELS lists
+    model paths or URLs to register (only when a registry is given). With
+    PRELOAD_BACKGROUND=1 the preload runs in a thread and startup_report()
+    tells when it is done.
+    """
+    modules = os.environ.get('PRELOAD_MODULES', '')
+    modules = HEAVY_MODULES if modules == 'all' else _split(modules)
+    warm_tensorflow = os.environ.get('PRELOAD_TENSORFLOW_WARMUP', '0') == '1'
+    models = _split(os.environ.get('PRELOAD_MODELS', '')) if model_registry is not None else []
+    if background is None:
+        background = os.environ.get('PRELOAD_BACKGROUND', '0') == '1'
+
+    if not (modules or warm_tensorflow or models):
+        return startup_report()
+
+    if background:
+        _preload['state'] = 'running'
+        threading.Thread(target=preload, args=(modules, warm_tensorflow, models, model_registry),
+                         name='preload', daemon=True).start()
+        return startup_report()
+    return preload(modules, warm_tensorflow, models, model_registry)
+
+
+def is_ready():
+    return _preload['state'] != 'running'
+
+
+def startup_report():
+    return {
+        'ready': is_ready(),
+        'uptime_seconds': time.perf_counter() - STARTED,
+        'imports': import_times(),
+        'preload': dict(_preload)
+    }
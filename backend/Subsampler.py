@@ -0,0 +1,69 @@
+import time
+
+import numpy as np
+
+SAMPLE_STRATEGIES = ('uniform', 'stratified')
+
+
+class Subsampler:
+    """Seeded row subsampling of the data an analysis is fitted on
+
+    'uniform' draws rows without replacement and 'stratified' draws the same
+    share of rows from each quantile bin of the analyzed feature. Row indices
+    are always returned sorted, so memory-mapped data is read in order.
+    """
+
+    STRATA = 10
+
+    def __init__(self, strategy='uniform', seed=0):
+        if strategy not in SAMPLE_STRATEGIES:
+            raise ValueError(f"Invalid sample strategy {strategy}; choose from {', '.join(SAMPLE_STRATEGIES)}")
+        self.strategy = strategy
+        self.seed = seed
+
+    def indices(self, X, size, feature=None):
+        """Row indices of a sample of at most size rows; None when all rows are used"""
+        n_rows = len(X)
+        if size == 'all' or size is None or size >= n_rows:
+            return None
+        size = max(int(size), 1)
+        rng = np.random.default_rng(self.seed)
+
+        if self.strategy == 'stratified' and feature is not None:
+            return self._stratified(X[:, feature], size, rng)
+        return np.sort(rng.choice(n_rows, size, replace=False))
+
+    def _stratified(self, values, size, rng):
+        # Quantile edges of the feature; ties collapse bins, which is fine for discrete features
+        edges = np.unique(np.nanquantile(values, np.linspace(0, 1, self.STRATA + 1)[1:-1]))
+        strata = np.searchsorted(edges, values, side='right')
+        order = np.argsort(strata, kind='stable')
+        counts = np.bincount(strata, minlength=len(edges) + 1)
+
+        # Proportional allocation, with the rounding remainder going to the largest strata
+        quotas = np.floor(counts * size / len(values)).astype(int)
+        remainder = size - quotas.sum()
+        if remainder > 0:
+            quotas[np.argsort(-(counts * size / len(values) - quotas))[:remainder]] += 1
+        quotas = np.minimum(quotas, counts)
+
+        chosen = []
+        start = 0
+        for count, quota in zip(counts, quotas):
+            if quota:
+                chosen.append(order[start + rng.choice(count, quota, replace=False)])
+            start += count
+        return np.sort(np.concatenate(chosen))
+
+
+def rows_within_budget(predict, X, evaluations_per_row, budget_seconds, probe_rows=256):
+    """Sample rows that fit in a time budget, from a timed probe prediction
+
+    evaluations_per_row is how many model evaluations one sampled row costs
+    over the whole request (e.g. the number of PDP grid points per feature).
+    """
+    probe = X[:min(probe_rows, len(X))]
+    start = time.perf_counter()
+    predict(probe)
+    seconds_per_row = max(time.perf_counter() - start, 1e-6) / len(probe)
+    return max(int(budget_seconds / (seconds_per_row * max(evaluations_per_row, 1))), 1)
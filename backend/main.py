@@ -1,20 +1,26 @@
 import json
+import logging
+import time
 import traceback
 
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, Response, request, jsonify, make_response, stream_with_context
 from flask_cors import CORS, cross_origin
-import numpy as np
-import tensorflow as tf
-from effector import PDP, RHALE, RegionalRHALE, RegionalPDP, binning_methods, utils
 import requests
 import tempfile
 import os
-import io
-import base64
-import matplotlib.pyplot as plt
-import pandas as pd
 
-from backend.DataModelFetcher import DataModelFetcher
+from backend.Analysis import (merge_batch_results, parse_analysis_params, parse_batch_params, parse_bool,
+                              run_analysis, run_batch_analysis, run_progressive_analysis, shutdown_plot_renderer,
+                              split_batch_params)
+from backend.DatasetStore import DatasetStore
+from backend.JobQueue import JobQueue, QueueFullError
+from backend.Metrics import configure_logging, metrics, request_profile
+from backend.ModelRegistry import ModelRegistry
+from backend.ResultStore import result_store_from_env
+from backend.Startup import preload_from_env, startup_report
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app, origins=['http://localhost:4200'], allow_headers=['Content-Type'])
@@ -25,240 +31,407 @@ def after_request(response):
     # Allow specific origin
     response.headers.add('Access-Control-Allow-Origin', 'http://localhost:4200')
     # Allow specific methods
-    response.headers.add('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+    response.headers.add('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
     # Allow specific headers
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
     # Allow credentials
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     return response
 
+# Directory shared by the processes of a multi-worker server (backend.Server), if any
+shared_store_dir = os.environ.get('SHARED_STORE_DIR')
+
+# Loaded models shared across requests, keyed by content hash
+model_registry = ModelRegistry(
+    max_models=int(os.environ.get('MODEL_REGISTRY_MAX_MODELS', 8)),
+    max_bytes=int(os.environ.get('MODEL_REGISTRY_MAX_BYTES', 2 * 1024 ** 3)),
+    shared_dir=os.path.join(shared_store_dir, 'models') if shared_store_dir else None
+)
+
+# Parsed datasets shared across requests, keyed by content hash
+dataset_store = DatasetStore(
+    max_datasets=int(os.environ.get('DATASET_STORE_MAX_DATASETS', 16)),
+    max_bytes=int(os.environ.get('DATASET_STORE_MAX_BYTES', 4 * 1024 ** 3)),
+    shared_dir=os.path.join(shared_store_dir, 'datasets') if shared_store_dir else None,
+    max_shared_bytes=int(os.environ.get('SHARED_STORE_MAX_DATASET_BYTES', 32 * 1024 ** 3))
+)
+
+# Computed analyses and rendered plots, persisted across restarts
+result_store = result_store_from_env()
+
+# Long-running analyses (e.g. regional methods) submitted with async=true
+job_queue = JobQueue(
+    'backend.Analysis:run_analysis_job',
+    max_workers=int(os.environ.get('JOB_QUEUE_MAX_WORKERS', 2)),
+    max_queued=int(os.environ.get('JOB_QUEUE_MAX_QUEUED', 16)),
+    initializer='backend.Startup:preload_from_env',
+    # Server workers prefix their job IDs so the router sends job requests back to them
+    id_prefix=f"w{os.environ['SERVER_WORKER_INDEX']}-" if 'SERVER_WORKER_INDEX' in os.environ else ''
+)
+
+# Longest a batch request waits for the jobs it split its features into
+batch_job_timeout = float(os.environ.get('BATCH_JOB_TIMEOUT_SECONDS', 3600))
+
 # Handle preflight requests
 @app.route('/analyze', methods=['OPTIONS'])
-def handle_preflight():
+@app.route('/analyze/batch', methods=['OPTIONS'])
+@app.route('/models', methods=['OPTIONS'])
+@app.route('/datasets', methods=['OPTIONS'])
+@app.route('/datasets/<dataset_id>/append', methods=['OPTIONS'])
+@app.route('/jobs/<job_id>', methods=['OPTIONS'])
+@app.route('/jobs/<job_id>/result', methods=['OPTIONS'])
+def handle_preflight(job_id=None, dataset_id=None):
     response = make_response()
     response.headers.add('Access-Control-Allow-Origin', 'http://localhost:4200')
-    response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
+    response.headers.add('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     return response
 
-def encode_plot_to_base64():
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    plot_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-    plt.close()
-    return plot_base64
+@app.route('/models', methods=['POST'])
+def upload_model():
+    """Register a model once and return its content-addressed ID"""
+    try:
+        if 'model' in request.files:
+            model_id = model_registry.register_upload(model_file=request.files['model'])
+        elif request.form.get('model_url'):
+            model_id = model_registry.register_upload(model_url=request.form.get('model_url'))
+        else:
+            return jsonify({
+                'status': 'error',
+                'message': 'No model provided'
+            }), 400
 
+        return jsonify({
+            'status': 'success',
+            **model_registry.describe(model_id)
+        })
 
-def compute_bin_effect(xs, df_dxs, limits):
-    """Modified version of Effector's compute_bin_effect function using np.nan instead of np.NaN"""
-    empty_symbol = np.nan  # Changed from np.NaN to np.nan
+    except Exception as e:
+        error_msg = f"Error registering model: {str(e)}\nTraceback: {traceback.format_exc()}"
+        logger.error(error_msg)
+        return jsonify({
+            'status': 'error',
+            'message': error_msg
+        }), 500
 
-    # Prepare output arrays
-    nof_bins = len(limits) - 1
-    bin_effects = np.full([nof_bins], empty_symbol)
-    points_per_bin = np.zeros([nof_bins], dtype=int)
+@app.route('/datasets', methods=['POST'])
+def upload_dataset():
+    """Parse a dataset once and return its content-addressed ID"""
+    try:
+        if 'data' not in request.files:
+            return jsonify({
+                'status': 'error',
+                'message': 'No data file provided'
+            }), 400
 
-    # Compute effect for each bin
-    for k in range(nof_bins):
-        # Get points inside bin k
-        indices = np.logical_and(xs >= limits[k], xs < limits[k + 1])
-        points_per_bin[k] = np.sum(indices)
+        dataset_id = dataset_store.add(request.files['data'])
+        return jsonify({
+            'status': 'success',
+            **dataset_store.describe(dataset_id)
+        })
 
-        if points_per_bin[k] > 0:
-            bin_effects[k] = np.mean(df_dxs[indices])
+    except Exception as e:
+        error_msg = f"Error storing dataset: {str(e)}\nTraceback: {traceback.format_exc()}"
+        logger.error(error_msg)
+        return jsonify({
+            'status': 'error',
+            'message': error_msg
+        }), 500
 
-    return bin_effects, points_per_bin
+@app.route('/datasets/<dataset_id>/append', methods=['POST'])
+def append_dataset(dataset_id):
+    """Append uploaded rows to a stored dataset and return the ID of the extended dataset
 
-# Override the utils function
-utils.compute_bin_effect = compute_bin_effect
+    Analyses of the new dataset with incremental=true update the RHALE
+    results of this one with the new rows only.
+    """
+    try:
+        if 'data' not in request.files:
+            return jsonify({
+                'status': 'error',
+                'message': 'No data file provided'
+            }), 400
+
+        try:
+            appended_id = dataset_store.append(dataset_id, request.files['data'])
+        except KeyError:
+            return jsonify({
+                'status': 'error',
+                'message': f'Unknown dataset_id: {dataset_id}. Upload the data to /datasets again.'
+            }), 404
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+
+        return jsonify({
+            'status': 'success',
+            **dataset_store.describe(appended_id)
+        })
+
+    except Exception as e:
+        error_msg = f"Error appending to dataset: {str(e)}\nTraceback: {traceback.format_exc()}"
+        logger.error(error_msg)
+        return jsonify({
+            'status': 'error',
+            'message': error_msg
+        }), 500
+
+def resolve_inputs():
+    """Resolve the dataset and model of an analysis request
+
+    Returns ((dataset_id, X_train, feature_names, model_id), None) or
+    (None, error_response).
+    """
+    if 'data' not in request.files and not request.form.get('dataset_id'):
+        return None, (jsonify({
+            'status': 'error',
+            'message': 'No data file provided'
+        }), 400)
+
+    # Get the dataset, parsing it only if it is not stored yet
+    if request.form.get('dataset_id'):
+        dataset_id = request.form.get('dataset_id')
+    else:
+        dataset_id = dataset_store.add(request.files['data'])
+
+    try:
+        X_train, feature_names = dataset_store.get(dataset_id)
+    except KeyError:
+        return None, (jsonify({
+            'status': 'error',
+            'message': f'Unknown dataset_id: {dataset_id}. Upload the data to /datasets again.'
+        }), 404)
+
+    # Handle model input, loading it only if it is not registered yet
+    if request.form.get('model_id'):
+        model_id = request.form.get('model_id')
+    elif 'model' in request.files:
+        model_id = model_registry.register_upload(model_file=request.files['model'])
+    elif request.form.get('model_url'):
+        model_id = model_registry.register_upload(model_url=request.form.get('model_url'))
+    else:
+        return None, (jsonify({
+            'status': 'error',
+            'message': 'No model provided'
+        }), 400)
+
+    if model_id not in model_registry:
+        return None, (jsonify({
+            'status': 'error',
+            'message': f'Unknown model_id: {model_id}. Upload the model to /models again.'
+        }), 404)
+
+    return (dataset_id, X_train, feature_names, model_id), None
+
+def job_payload(model_id, dataset_id, X_train, feature_names, params):
+    model_bytes, file_extension = model_registry.source(model_id)
+    data_path = dataset_store.shared_path(dataset_id)
+    return {
+        'model_bytes': model_bytes,
+        'dataset_id': dataset_id,
+        'file_extension': file_extension,
+        'data': None if data_path else X_train,
+        'data_path': data_path,
+        'feature_names': feature_names,
+        'params': params,
+        'lineage': dataset_store.lineage(dataset_id)
+    }
+
+def queue_full_response(error):
+    response = jsonify({
+        'status': 'error',
+        'message': str(error)
+    })
+    response.headers['Retry-After'] = '5'
+    return response, 429
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def progressive_response(model_id, dataset_id, X_train, feature_names, params):
+    """Server-Sent Events stream of coarse results, ending with the exact one"""
+    def events():
+        try:
+            for stage, n_stages, results in run_progressive_analysis(
+                    model_registry, model_id, X_train, feature_names, params,
+                    dataset_id=dataset_id, result_store=result_store, lineage=dataset_store.lineage(dataset_id)):
+                yield sse_event('result' if stage == n_stages else 'progress', {
+                    'status': 'success' if stage == n_stages else 'running',
+                    'stage': stage,
+                    'n_stages': n_stages,
+                    'model_id': model_id,
+                    'dataset_id': dataset_id,
+                    'results': results
+                })
+        except Exception as e:
+            error_msg = f"Error during analysis: {str(e)}\nTraceback: {traceback.format_exc()}"
+            logger.error(error_msg)
+            yield sse_event('error', {
+                'status': 'error',
+                'message': error_msg
+            })
 
-def model_jacobian(model, x):
-    with tf.GradientTape() as tape:
-        x_tensor = tf.convert_to_tensor(x, dtype=tf.float32)
-        tape.watch(x_tensor)
-        prediction = model(x_tensor)
-    return tape.gradient(prediction, x_tensor).numpy()
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/analyze', methods=['POST'])
 def analyze_data():
     try:
-        data_fetcher = DataModelFetcher()
+        inputs, error = resolve_inputs()
+        if error is not None:
+            return error
+        dataset_id, X_train, feature_names, model_id = inputs
 
-        if 'data' not in request.files:
+        try:
+            params = parse_analysis_params(request.form)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'No data file provided'
+                'message': str(e)
             }), 400
 
         try:
-            # Get the data file
-            data_file = request.files['data']
-
-            # For CSV files, get column names before processing
-            feature_names = None
-            if data_file.filename.endswith('.csv'):
-                df = pd.read_csv(io.BytesIO(data_file.read()))
-                # Remove timestamp if present
-                if 'Timestamp' in df.columns:
-                    df = df.drop('Timestamp', axis=1)
-                feature_names = df.columns.tolist()
-                # Reset file pointer for parse_data_file
-                data_file.seek(0)
-
-            # Parse the data
-            X_train = data_fetcher.parse_data_file(data_file)
-
-            # If feature names weren't obtained from CSV, generate them
-            if not feature_names:
-                feature_names = [f'feature_{i}' for i in range(X_train.shape[1])]
-
-            # Handle model input
-            if 'model' in request.files:
-                model = data_fetcher.handle_model(model_file=request.files['model'])
-            elif request.form.get('model_url'):
-                model = data_fetcher.handle_model(model_url=request.form.get('model_url'))
-            else:
+            if parse_bool(request.form.get('async'), False):
+                try:
+                    job_id = job_queue.submit(job_payload(model_id, dataset_id, X_train, feature_names, params))
+                except QueueFullError as e:
+                    return queue_full_response(e)
+
                 return jsonify({
-                    'status': 'error',
-                    'message': 'No model provided'
-                }), 400
-
-            # Get analysis parameters
-            method = request.form.get('method', 'pdp')
-            feature_index = int(request.form.get('feature_index', 0))
-            target_name = request.form.get('target_name', 'prediction')
-            node_idx = int(request.form.get('node_idx', 1))
-
-            # Generate feature names if not provided
-            feature_names = [f'feature_{i}' for i in range(X_train.shape[1])]
-
-            results = {}
-
-            if method == 'pdp':
-                pdp = PDP(
-                    data=X_train,
-                    model=model.predict,
-                    feature_names=feature_names,
-                    target_name=target_name,
-                    nof_instances=300
-                )
-                pdp.plot(
-                    feature=feature_index,
-                    centering=True,
-                    show_avg_output=True
-                )
-                results['pdp_plot'] = encode_plot_to_base64()
-
-            elif method == 'rhale':
-                def model_jac(x):
-                    return model_jacobian(model, x)
-
-                rhale = RHALE(
-                    data=X_train,
-                    model=model.predict,
-                    model_jac=model_jac,
-                    feature_names=feature_names,
-                    target_name=target_name
-                )
-                rhale.plot(
-                    feature=feature_index,
-                    centering=True,
-                    show_avg_output=True
-                )
-                results['rhale_plot'] = encode_plot_to_base64()
-
-            elif method == 'regional_rhale':
-                def model_jac(x):
-                    return model_jacobian(model, x)
-
-                regional_rhale = RegionalRHALE(
-                    data=X_train,
-                    model=model.predict,
-                    model_jac=model_jac,
-                    cat_limit=10,
-                    feature_names=feature_names,
-                    nof_instances="all"
-                )
-
-                regional_rhale.fit(
-                    features=feature_index,
-                    heter_small_enough=0.1,
-                    heter_pcg_drop_thres=0.2,
-                    binning_method=binning_methods.Greedy(
-                        init_nof_bins=100,
-                        min_points_per_bin=100,
-                        discount=1.,
-                        cat_limit=10
-                    ),
-                    max_depth=2,
-                    nof_candidate_splits_for_numerical=10,
-                    min_points_per_subregion=10,
-                    candidate_conditioning_features="all",
-                    split_categorical_features=True
-                )
-
-                # Capture partitioning info
-                partitioning_buffer = io.StringIO()
-                regional_rhale.show_partitioning(
-                    features=feature_index,
-                    only_important=True
-                )
-                results['partitioning_info'] = partitioning_buffer.getvalue()
-
-                regional_rhale.plot(
-                    feature=feature_index,
-                    node_idx=node_idx,
-                    heterogeneity=True,
-                    centering=True
-                )
-                results['regional_rhale_plot'] = encode_plot_to_base64()
-
-            elif method == 'regional_pdp':
-                regional_pdp = RegionalPDP(
-                    data=X_train,
-                    model=model.predict,
-                    cat_limit=10,
-                    feature_names=feature_names,
-                    nof_instances="all"
-                )
-
-                regional_pdp.fit(
-                    features=feature_index,
-                    heter_small_enough=0.1,
-                    heter_pcg_drop_thres=0.1,
-                    max_depth=2,
-                    nof_candidate_splits_for_numerical=5,
-                    min_points_per_subregion=10,
-                    candidate_conditioning_features="all",
-                    split_categorical_features=True,
-                    nof_instances=1000
-                )
-
-                # Capture partitioning info
-                partitioning_buffer = io.StringIO()
-                regional_pdp.show_partitioning(
-                    features=feature_index,
-                    only_important=True,
-                )
-                results['partitioning_info'] = partitioning_buffer.getvalue()
-
-                regional_pdp.plot(
-                    feature=feature_index,
-                    node_idx=node_idx,
-                    centering=True
-                )
-                results['regional_pdp_plot'] = encode_plot_to_base64()
+                    'status': 'queued',
+                    'job_id': job_id,
+                    'model_id': model_id,
+                    'dataset_id': dataset_id
+                }), 202
+
+            if parse_bool(request.form.get('progressive'), False):
+                return progressive_response(model_id, dataset_id, X_train, feature_names, params)
+
+            with request_profile(parse_bool(request.form.get('profile'), False)) as profile, metrics.timed('analyze'):
+                results = run_analysis(model_registry, model_id, X_train, feature_names, params,
+                                       dataset_id=dataset_id, result_store=result_store,
+                                       lineage=dataset_store.lineage(dataset_id))
+
+            response = {
+                'status': 'success',
+                'model_id': model_id,
+                'dataset_id': dataset_id,
+                'results': results
+            }
+            if profile is not None:
+                response['profile'] = profile
+            return jsonify(response)
+
+        except Exception as e:
+            error_msg = f"Error during analysis: {str(e)}\nTraceback: {traceback.format_exc()}"
+            logger.error(error_msg)
+            return jsonify({
+                'status': 'error',
+                'message': error_msg
+            }), 500
 
+    except Exception as e:
+        error_msg = f"Unexpected error: {str(e)}\nTraceback: {traceback.format_exc()}"
+        logger.error(error_msg)
+        return jsonify({
+            'status': 'error',
+            'message': error_msg
+        }), 500
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Run several methods on several features in one request
+
+    With n_jobs > 1 the features are split across the job queue workers. The
+    jobs get the dataset lineage, so incremental=true works there too.
+    """
+    try:
+        inputs, error = resolve_inputs()
+        if error is not None:
+            return error
+        dataset_id, X_train, feature_names, model_id = inputs
+
+        try:
+            params = parse_batch_params(request.form, X_train.shape[1])
+        except ValueError as e:
             return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+
+        if params['n_jobs'] > 1 and parse_bool(request.form.get('profile'), False):
+            return jsonify({
+                'status': 'error',
+                'message': 'profile=true is not supported with n_jobs > 1; the work runs in the job workers'
+            }), 400
+
+        try:
+            if parse_bool(request.form.get('async'), False):
+                try:
+                    job_id = job_queue.submit(job_payload(model_id, dataset_id, X_train, feature_names, params))
+                except QueueFullError as e:
+                    return queue_full_response(e)
+
+                return jsonify({
+                    'status': 'queued',
+                    'job_id': job_id,
+                    'model_id': model_id,
+                    'dataset_id': dataset_id
+                }), 202
+
+            if params['n_jobs'] > 1:
+                job_ids = []
+                try:
+                    for job_params in split_batch_params(params, params['n_jobs']):
+                        payload = job_payload(model_id, dataset_id, X_train, feature_names, job_params)
+                        job_ids.append(job_queue.submit(payload))
+                except QueueFullError as e:
+                    for job_id in job_ids:
+                        job_queue.cancel(job_id)
+                    return queue_full_response(e)
+
+                results_list = []
+                deadline = time.monotonic() + batch_job_timeout
+                for job_id in job_ids:
+                    timeout = max(0., deadline - time.monotonic())
+                    job_status, results, job_error = job_queue.wait(job_id, timeout=timeout)
+                    if job_status in ('queued', 'running'):
+                        # A stuck worker must not hold the request forever
+                        for pending_id in job_ids:
+                            job_queue.cancel(pending_id)
+                        return jsonify({
+                            'status': 'error',
+                            'message': f'Batch jobs did not finish within {batch_job_timeout:g} seconds'
+                        }), 504
+                    if job_status != 'done':
+                        raise RuntimeError(f"Batch job {job_id} {job_status}: {job_error}")
+                    results_list.append(results)
+                results = merge_batch_results(results_list)
+                profile = None
+            else:
+                with request_profile(parse_bool(request.form.get('profile'), False)) as profile, \
+                        metrics.timed('analyze_batch'):
+                    results = run_batch_analysis(model_registry, model_id, X_train, feature_names, params,
+                                                 dataset_id=dataset_id, result_store=result_store,
+                                                 lineage=dataset_store.lineage(dataset_id))
+
+            response = {
                 'status': 'success',
+                'model_id': model_id,
+                'dataset_id': dataset_id,
+                'feature_names': feature_names,
                 'results': results
-            })
+            }
+            if profile is not None:
+                response['profile'] = profile
+            return jsonify(response)
 
         except Exception as e:
             error_msg = f"Error during analysis: {str(e)}\nTraceback: {traceback.format_exc()}"
-            print(error_msg)
+            logger.error(error_msg)
             return jsonify({
                 'status': 'error',
                 'message': error_msg
@@ -266,11 +439,119 @@ def analyze_data():
 
     except Exception as e:
         error_msg = f"Unexpected error: {str(e)}\nTraceback: {traceback.format_exc()}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             'status': 'error',
             'message': error_msg
         }), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    try:
+        return jsonify({
+            'status': 'success',
+            'job': job_queue.status(job_id)
+        })
+    except KeyError:
+        return jsonify({
+            'status': 'error',
+            'message': f'Unknown job_id: {job_id}'
+        }), 404
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    try:
+        job_status, results, error = job_queue.result(job_id)
+    except KeyError:
+        return jsonify({
+            'status': 'error',
+            'message': f'Unknown job_id: {job_id}'
+        }), 404
+
+    if job_status in ('queued', 'running'):
+        return jsonify({
+            'status': job_status,
+            'job_id': job_id
+        }), 202
+    if job_status != 'done':
+        return jsonify({
+            'status': 'error',
+            'job_id': job_id,
+            'message': error or f'Job {job_status}'
+        }), 409
+
+    return jsonify({
+        'status': 'success',
+        'job_id': job_id,
+        'results': results
+    })
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    try:
+        cancelled = job_queue.cancel(job_id)
+    except KeyError:
+        return jsonify({
+            'status': 'error',
+            'message': f'Unknown job_id: {job_id}'
+        }), 404
+
+    return jsonify({
+        'status': 'success' if cancelled else 'error',
+        'job': job_queue.status(job_id),
+        'message': None if cancelled else 'Job already finished'
+    }), 200 if cancelled else 409
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'status': 'success',
+        'models': model_registry.stats(),
+        'predictions': model_registry.artifact_stats('prediction_cache'),
+        'inference': model_registry.artifact_stats('inference'),
+        'datasets': dataset_store.stats(),
+        'results': result_store.stats() if result_store is not None else None,
+        'jobs': job_queue.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Stage timing histograms, counters and cache statistics of this server process
+
+    Job queue workers keep their own metrics, which are not included.
+    format=prometheus returns the stage histograms in the Prometheus text format.
+    """
+    if request.args.get('format') == 'prometheus':
+        return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+    return jsonify({
+        'status': 'success',
+        **metrics.snapshot(),
+        'caches': {
+            'models': model_registry.stats(),
+            'datasets': dataset_store.stats(),
+            'results': result_store.stats() if result_store is not None else None,
+            'predictions': model_registry.artifact_stats('prediction_cache'),
+            'inference': model_registry.artifact_stats('inference'),
+            'downloads': model_registry.data_fetcher.stats()
+        },
+        'jobs': job_queue.stats(),
+        'startup': startup_report()
+    })
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 503 while a background preload is still running"""
+    report = startup_report()
+    return jsonify({'status': 'ready' if report['ready'] else 'starting', **report}), 200 if report['ready'] else 503
+
+def shutdown():
+    """Stop the job and rendering processes, e.g. before a server worker exits"""
+    job_queue.shutdown()
+    shutdown_plot_renderer()
+
+# Heavy imports, TensorFlow warm-up and models configured by PRELOAD_* (nothing by default)
+preload_from_env(model_registry)
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
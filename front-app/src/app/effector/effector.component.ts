@@ -77,7 +77,7 @@ export class EffectorComponent {
   selectedFile: FileData | null = null;
   selectedModel: FileData | null = null;
   dataSource: string = 'url';
-  dataAcceptTypes = '.json,.npy,.csv';
+  dataAcceptTypes = '.json,.jsonl,.npy,.csv,.parquet,.feather,.arrow';
   modelAcceptTypes = '.h5,.keras,.pkl';
   config = {
     dataUrl: '',
@@ -0,0 +1,107 @@
+"""Per-call latency of Keras predict against the compiled KerasInference path
+
+Not collected by pytest. Run from the repository root, e.g.
+
+    python test/bench_inference.py --batches 1,10,100,1e3,1e4 --repeats 50
+    TF_INTRA_OP_THREADS=1 python test/bench_inference.py --xla
+
+Prints the median milliseconds per call of each batch size, then the total
+time of a seeded sequence of mixed batch sizes like the ones effector sends
+while evaluating grids and searching splits. Every path is checked to return
+the same predictions. First calls, which trace and compile, are timed
+separately.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from backend.Startup import import_module
+
+
+def make_keras_model(features, hidden=32):
+    tf = import_module('tensorflow')
+    tf.random.set_seed(0)
+    inputs = tf.keras.Input(shape=(features,))
+    x = tf.keras.layers.Dense(hidden, activation='relu')(inputs)
+    x = tf.keras.layers.Dense(hidden, activation='relu')(x)
+    return tf.keras.Model(inputs, tf.keras.layers.Dense(1)(x))
+
+
+def time_calls(predict, x, repeats):
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(x)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+
+def parse_ints(value):
+    return [int(float(item)) for item in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--features', type=int, default=10)
+    parser.add_argument('--batches', type=parse_ints, default=[1, 10, 100, 1_000, 10_000, 100_000],
+                        help='comma-separated batch sizes')
+    parser.add_argument('--repeats', type=int, default=20, help='timed calls per batch size')
+    parser.add_argument('--mixed-calls', type=int, default=200, help='calls of the mixed batch size sequence')
+    parser.add_argument('--xla', action='store_true', help='also time the XLA-compiled path')
+    args = parser.parse_args()
+
+    from backend.KerasInference import KerasInference
+
+    model = make_keras_model(args.features)
+    paths = {
+        'predict': lambda x: model.predict(x, verbose=0),
+        'compiled': KerasInference(model)
+    }
+    if args.xla:
+        paths['compiled_xla'] = KerasInference(model, jit_compile=True)
+
+    rng = np.random.default_rng(0)
+    data = rng.uniform(-1, 1, size=(max(args.batches), args.features)).astype(np.float32)
+
+    first = {}
+    for name, predict in paths.items():
+        start = time.perf_counter()
+        predict(data[:args.batches[0]])
+        first[name] = (time.perf_counter() - start) * 1000
+    print('first call ms: ' + ', '.join(f"{name} {seconds:.1f}" for name, seconds in first.items()) + '\n')
+
+    print(f"{'rows':>8} " + ' '.join(f"{name + ' ms':>16}" for name in paths) + f" {'speedup':>8}")
+    for rows in args.batches:
+        x = data[:rows]
+        reference = paths['predict'](x)
+        timings = {}
+        for name, predict in paths.items():
+            np.testing.assert_allclose(predict(x), reference, rtol=1e-4, atol=1e-5)
+            timings[name] = time_calls(predict, x, args.repeats) * 1000
+        best = min(seconds for name, seconds in timings.items() if name != 'predict')
+        print(f"{rows:>8} " + ' '.join(f"{seconds:>16.3f}" for seconds in timings.values()) +
+              f" {timings['predict'] / best:>7.1f}x")
+
+    # Varying batch sizes, each new to predict's per-shape caches
+    sizes = rng.integers(1, 2_000, size=args.mixed_calls)
+    print(f"\nmixed: {args.mixed_calls} calls of 1 to 2000 rows")
+    for name, predict in paths.items():
+        start = time.perf_counter()
+        for rows in sizes:
+            predict(data[:rows])
+        total = time.perf_counter() - start
+        print(f"{name:>16}: {total:.2f} s, {total / args.mixed_calls * 1000:.2f} ms per call")
+    for name, predict in paths.items():
+        if hasattr(predict, 'stats'):
+            print(f"{name:>16}: {predict.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""Stage timings of the analysis pipeline across data sizes, feature counts and model types
+
+Not collected by pytest. Run from the repository root, e.g.
+
+    python test/bench_pipeline.py --rows 1e3,1e5 --features 3,10 --models linear,keras
+    python test/bench_pipeline.py --compare before.jsonl after.jsonl
+
+Every configuration runs in a fresh process, so its peak RSS is its own.
+Results are appended as JSON lines, one per stage, tagged with the commit.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import pickle
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from test_app import generate_dataset, predict
+
+METHODS = ('pdp', 'rhale', 'regional_rhale', 'regional_pdp')
+MODELS = ('linear', 'keras', 'tree')
+
+
+class LinearModel:
+    """test_app.predict on the first three features, plus small weights on the rest"""
+
+    def predict(self, x):
+        x = np.asarray(x)
+        extra = x[:, 3:] @ np.linspace(0.1, 1.0, x.shape[1] - 3) if x.shape[1] > 3 else 0.0
+        return predict(x) + extra
+
+
+def make_dataset(rows, features, seed=0):
+    np.random.seed(seed)
+    X = generate_dataset(rows, -1, 1, 0.1, 0.1).astype(np.float32)
+    if features > 3:
+        noise = np.random.uniform(-1, 1, size=(rows, features - 3)).astype(np.float32)
+        X = np.concatenate([X, noise], axis=1)
+    return X[:, :features]
+
+
+def make_model(kind, X):
+    """Model file bytes and extension of a benchmark model fitted to X"""
+    if kind == 'linear':
+        return pickle.dumps(LinearModel()), 'pkl'
+
+    y = LinearModel().predict(X[:20_000])
+    if kind == 'tree':
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        model = HistGradientBoostingRegressor(max_iter=50, random_state=0).fit(X[:20_000], y)
+        return pickle.dumps(model), 'pkl'
+
+    import tensorflow as tf
+
+    inputs = tf.keras.Input(shape=(X.shape[1],))
+    hidden = tf.keras.layers.Dense(32, activation='relu')(inputs)
+    hidden = tf.keras.layers.Dense(32, activation='relu')(hidden)
+    model = tf.keras.Model(inputs, tf.keras.layers.Dense(1)(hidden))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'mlp.keras')
+        model.save(path)
+        with open(path, 'rb') as f:
+            return f.read(), 'keras'
+
+
+def encode_dataset(X, file_format):
+    buffer = io.BytesIO()
+    if file_format == 'npy':
+        np.save(buffer, X)
+    elif file_format == 'parquet':
+        import pandas as pd
+
+        pd.DataFrame(X, columns=[f'x{i}' for i in range(X.shape[1])]).to_parquet(buffer)
+    else:
+        np.savetxt(buffer, X, delimiter=',', fmt='%.7g',
+                   header=','.join(f'x{i}' for i in range(X.shape[1])), comments='')
+    return buffer.getvalue()
+
+
+class StageTimer:
+    """Times pipeline stages and records their peak memory"""
+
+    def __init__(self, config, trace_memory):
+        self.config = config
+        self.trace_memory = trace_memory
+        self.records = []
+
+    @contextlib.contextmanager
+    def stage(self, stage, method=None, **extra):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            record = {**self.config, **extra, 'method': method, 'stage': stage, 'seconds': seconds,
+                      'rss_peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+            if self.trace_memory:
+                record['py_peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+                tracemalloc.stop()
+            self.records.append(record)
+
+
+def run_config(config, methods, trace_memory):
+    """Run every stage of one (rows, features, model) configuration; returns stage records"""
+    from werkzeug.datastructures import FileStorage
+
+    from backend.Analysis import (analyze_feature, create_effect, get_model_jacobian, get_model_predict,
+                                  parse_analysis_params, sample_sizes)
+    from backend.DataModelFetcher import DataModelFetcher
+    from backend.ModelRegistry import ModelRegistry
+    from backend.PlotRenderer import render_curve
+    from backend.Subsampler import Subsampler
+
+    timer = StageTimer(config, trace_memory)
+    X = make_dataset(config['rows'], config['features'])
+    content = encode_dataset(X, config['format'])
+    model_bytes, extension = make_model(config['model'], X)
+    del X
+    fetcher = DataModelFetcher()
+    registry = ModelRegistry(data_fetcher=fetcher)
+    quiet = contextlib.redirect_stdout(io.StringIO())
+
+    with quiet:
+        with timer.stage('parse'):
+            X, names = fetcher.parse_dataset(FileStorage(io.BytesIO(content), filename=f"data.{config['format']}"))
+        del content
+        with timer.stage('model_load'):
+            model_id = registry.register(model_bytes, extension)
+        model = registry.get(model_id)
+
+        for method in methods:
+            params = parse_analysis_params({'method': method})
+            predict = get_model_predict(registry, model_id, model, params)
+            size = sample_sizes(predict, X, [(method, 0)], params)[method]
+            rows = Subsampler(seed=0).indices(X, size)
+            data = X if rows is None else X[rows]
+
+            data_effect = None
+            if method in ('rhale', 'regional_rhale'):
+                with timer.stage('jacobian', method, sample_size=len(data)):
+                    data_effect = np.asarray(get_model_jacobian(registry, model_id, model, params, [0])(data))
+            with timer.stage('fit', method, sample_size=len(data)):
+                effect = create_effect(method, data, predict, names, params, data_effect=data_effect)
+                analysis = analyze_feature(effect, method, 0, params)
+            with timer.stage('render', method):
+                render_curve(analysis['curve'], method, feature_name=names[0], title=analysis['title'])
+
+    print(f"{config}: {sum(record['seconds'] for record in timer.records):.2f}s")
+    return timer.records
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    header = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count()
+    }
+    configs = [
+        {'rows': rows, 'features': features, 'model': model, 'format': args.format}
+        for rows in args.rows for features in args.features for model in args.models
+        if rows * features * 4 <= args.max_bytes
+    ]
+
+    with open(args.output, 'a') as output:
+        for config in configs:
+            # A fresh process per configuration keeps peak RSS and model caches separate
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                try:
+                    records = pool.submit(run_config, config, args.methods, args.trace_memory).result()
+                except Exception as e:
+                    print(f"{config}: failed: {e}")
+                    continue
+            for record in records:
+                output.write(json.dumps({**header, **record}) + '\n')
+            output.flush()
+    print(f"Results appended to {args.output}")
+
+
+def load_results(path):
+    """Median seconds per (rows, features, model, method, stage) of a results file"""
+    timings = {}
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            key = (record['rows'], record['features'], record['model'], record['method'] or '-', record['stage'])
+            timings.setdefault(key, []).append(record['seconds'])
+    return {key: statistics.median(values) for key, values in timings.items()}
+
+
+def compare(before_path, after_path, threshold):
+    before, after = load_results(before_path), load_results(after_path)
+    print(f"{'rows':>9} {'feat':>4} {'model':<7} {'method':<15} {'stage':<11} {'before':>9} {'after':>9} {'ratio':>6}")
+    regressions = 0
+    for key in sorted(set(before) & set(after)):
+        ratio = after[key] / before[key] if before[key] > 0 else float('inf')
+        flag = ' !' if ratio > threshold else ''
+        regressions += bool(flag)
+        print(f"{key[0]:>9} {key[1]:>4} {key[2]:<7} {key[3]:<15} {key[4]:<11} "
+              f"{before[key]:>9.3f} {after[key]:>9.3f} {ratio:>6.2f}{flag}")
+    print(f"{regressions} stage(s) slower than {threshold}x")
+    return regressions
+
+
+def parse_ints(value):
+    return [int(float(item)) for item in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=parse_ints, default=[1_000, 10_000, 100_000],
+                        help='comma-separated row counts, e.g. 1e3,1e5,1e7')
+    parser.add_argument('--features', type=parse_ints, default=[3, 10], help='comma-separated feature counts')
+    parser.add_argument('--models', type=lambda value: value.split(','), default=list(MODELS))
+    parser.add_argument('--methods', type=lambda value: value.split(','), default=list(METHODS))
+    parser.add_argument('--format', choices=('npy', 'csv', 'parquet'), default='npy')
+    parser.add_argument('--max-bytes', type=float, default=4 * 1024 ** 3,
+                        help='skip configurations whose float32 data is larger')
+    parser.add_argument('--trace-memory', action='store_true', help='also record Python peak memory per stage')
+    parser.add_argument('--output', default='bench_results.jsonl')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    parser.add_argument('--threshold', type=float, default=1.2, help='slowdown ratio flagged by --compare')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
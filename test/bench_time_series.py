@@ -0,0 +1,69 @@
+"""Time series construction of ModelWrapper against the original DataFrame-based one
+
+Not collected by pytest. Run from the repository root, e.g.
+
+    python test/bench_time_series.py --rows 24,168,1000 --covariates 1,11,50 --repeats 50
+
+Prints the median milliseconds per call of the original construction
+(test_model_wrapper.legacy_time_series) and of _create_time_series for each
+number of rows and covariates, after checking that both build the same series.
+The wrapper's date index is built on its first call, which is not timed.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from test_model_wrapper import CatBoostModel, legacy_time_series
+from backend.ModelWrapper import ModelWrapper
+
+
+def time_calls(build, X, repeats):
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        build(X)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+
+def parse_ints(value):
+    return [int(float(item)) for item in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=parse_ints, default=[24, 168, 1_000, 10_000],
+                        help='comma-separated series lengths')
+    parser.add_argument('--covariates', type=parse_ints, default=[1, 11, 50], help='comma-separated covariate counts')
+    parser.add_argument('--repeats', type=int, default=20, help='timed calls per configuration')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>8} {'covariates':>10} {'legacy ms':>10} {'direct ms':>10} {'speedup':>8}")
+    for n_covariates in args.covariates:
+        for rows in args.rows:
+            wrapper = ModelWrapper(CatBoostModel())
+            wrapper.input_chunk_length = min(24, rows)
+            wrapper.n_covariates = n_covariates
+            X = rng.uniform(size=(rows, n_covariates + 1))
+
+            legacy = legacy_time_series(wrapper, X)
+            direct = wrapper._create_time_series(X)
+            for expected, actual in zip(legacy, direct):
+                np.testing.assert_array_equal(actual.values(), expected.values())
+
+            legacy_ms = time_calls(lambda x: legacy_time_series(wrapper, x), X, args.repeats) * 1000
+            direct_ms = time_calls(wrapper._create_time_series, X, args.repeats) * 1000
+            print(f"{rows:>8} {n_covariates:>10} {legacy_ms:>10.3f} {direct_ms:>10.3f} {legacy_ms / direct_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""Model and registry stand-ins shared by the analysis, cache and store tests"""
+
+
+def quadratic(x):
+    """2 * x0 - x1, plus the square of every further column"""
+    return 2 * x[:, 0] - x[:, 1] + (x[:, 2:] ** 2).sum(axis=1)
+
+
+class CountingModel:
+    """Records the number of rows of every predict call"""
+
+    def __init__(self, function=quadratic):
+        self.function = function
+        self.calls = 0
+        self.rows = []
+
+    def predict(self, x):
+        self.calls += 1
+        self.rows.append(len(x))
+        return self.function(x)
+
+
+class SingleModelRegistry:
+    def __init__(self, model):
+        self.model = model
+
+    def get(self, model_id):
+        return self.model
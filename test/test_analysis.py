@@ -0,0 +1,129 @@
+import base64
+
+import numpy as np
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from backend.Analysis import (merge_batch_results, parse_analysis_params, parse_batch_params, run_batch_analysis,
+                              run_progressive_analysis, split_batch_params)
+from backend.EffectCurves import encode_curves
+from stubs import CountingModel, SingleModelRegistry
+
+
+def test_parse_batch_params_validates_features_and_methods():
+    params = parse_batch_params(MultiDict({'features': '2, 0', 'methods': 'rhale,pdp'}), 3)
+    assert params['features'] == [2, 0]
+    assert params['methods'] == ['rhale', 'pdp']
+    assert parse_batch_params(MultiDict(), 3)['features'] == [0, 1, 2]
+
+    with pytest.raises(ValueError):
+        parse_batch_params(MultiDict({'features': '3'}), 3)
+    with pytest.raises(ValueError):
+        parse_batch_params(MultiDict({'methods': 'ale'}), 3)
+    for n_jobs in ('0', 'two'):
+        with pytest.raises(ValueError):
+            parse_batch_params(MultiDict({'n_jobs': n_jobs}), 3)
+    assert parse_batch_params(MultiDict({'n_jobs': '2'}), 3)['n_jobs'] == 2
+
+
+def test_split_and_merge_batches():
+    params = {'features': [0, 1, 2, 3, 4], 'methods': ['pdp']}
+    batches = split_batch_params(params, 2)
+    assert [batch['features'] for batch in batches] == [[0, 2, 4], [1, 3]]
+    assert len(split_batch_params(params, 10)) == 5
+
+    merged = merge_batch_results([{'pdp': {'0': 'a'}}, {'pdp': {'1': 'b'}, 'rhale': {'1': 'c'}}])
+    assert merged == {'pdp': {'0': 'a', '1': 'b'}, 'rhale': {'1': 'c'}}
+
+
+def test_rhale_batch_predicts_jacobian_and_average_once():
+    model = CountingModel()
+    X = np.random.default_rng(0).uniform(size=(400, 3))
+    params = parse_batch_params(MultiDict({'methods': 'rhale'}), 3)
+
+    results = run_batch_analysis(SingleModelRegistry(model), 'model', X, ['a', 'b', 'c'], params)
+
+    assert sorted(results['rhale']) == ['0', '1', '2']
+    assert all(result['rhale_plot'] for result in results['rhale'].values())
+    # One batched finite-difference call plus one call for the average output
+    assert model.calls == 2
+
+
+class InteractionModel:
+    def predict(self, x):
+        return np.where(x[:, 1] > 0.5, 5 * x[:, 0], -5 * x[:, 0])
+
+
+def test_curves_output_returns_bins_and_partition_tree():
+    X = np.random.default_rng(1).uniform(size=(2000, 3))
+    form = MultiDict({'methods': 'rhale,regional_rhale', 'features': '0', 'output': 'curves'})
+    params = parse_batch_params(form, 3)
+
+    results = run_batch_analysis(SingleModelRegistry(InteractionModel()), 'model', X, ['a', 'b', 'c'], params)
+
+    curve = results['rhale']['0']['rhale_curve']
+    assert curve['x'] == curve['bin_limits']
+    assert len(curve['bin_effect']) == len(curve['bin_limits']) - 1
+
+    regional = results['regional_rhale']['0']
+    assert 'regional_rhale_plot' not in regional
+    assert [node['split_feature'] for node in regional['partition_tree']] == [None, 1, 1]
+    assert 'b <= 0.5' in regional['partitioning_info']
+    # Node 1 (b <= 0.5) has slope -5 over the whole range of a
+    np.testing.assert_allclose(regional['regional_rhale_curve']['bin_effect'], -5)
+
+
+def test_base64_curve_encoding_round_trips():
+    values = np.array([0.5, np.nan, -2.0])
+
+    encoded = encode_curves({'y': values}, 'base64')['y']
+
+    decoded = np.frombuffer(base64.b64decode(encoded['data']), dtype='<f4')
+    np.testing.assert_array_equal(decoded, values.astype(np.float32))
+    assert encode_curves({'y': values}, 'json')['y'] == [0.5, None, -2.0]
+
+
+def test_batch_reports_seeded_sample_sizes_within_the_row_budget():
+    X = np.random.default_rng(2).uniform(size=(2000, 3))
+    form = MultiDict({'methods': 'pdp,regional_pdp', 'features': '0,1', 'output': 'curves',
+                      'sample_strategy': 'stratified', 'budget_rows': '200', 'seed': '7'})
+    params = parse_batch_params(form, 3)
+
+    first = run_batch_analysis(SingleModelRegistry(InteractionModel()), 'model', X, ['a', 'b', 'c'], params)
+    second = run_batch_analysis(SingleModelRegistry(InteractionModel()), 'model', X, ['a', 'b', 'c'], params)
+
+    assert first['pdp']['0']['sample_size'] == 200
+    assert first['regional_pdp']['1']['sample_size'] == 200
+    assert first['pdp']['1']['pdp_curve'] == second['pdp']['1']['pdp_curve']
+
+
+def test_progressive_analysis_refines_up_to_the_exact_sample():
+    X = np.random.default_rng(3).uniform(size=(5000, 3))
+    params = parse_analysis_params(MultiDict({'method': 'rhale', 'output': 'curves'}))
+
+    stages = list(run_progressive_analysis(SingleModelRegistry(InteractionModel()), 'model', X, ['a', 'b', 'c'], params))
+
+    assert [(stage, n_stages) for stage, n_stages, _ in stages] == [(1, 3), (2, 3), (3, 3)]
+    assert [results['sample_size'] for _, _, results in stages] == [500, 4000, 5000]
+    # Coarse stages use few fixed bins
+    assert len(stages[0][2]['rhale_curve']['bin_effect']) == 10
+
+
+def test_incremental_rhale_evaluates_only_the_appended_rows():
+    model = CountingModel()
+    X = np.random.default_rng(4).uniform(size=(1200, 3))
+    params = parse_batch_params(MultiDict({'methods': 'rhale', 'output': 'curves', 'incremental': 'true'}), 3)
+
+    first = run_batch_analysis(SingleModelRegistry(model), 'model', X[:1000], ['a', 'b', 'c'], params,
+                               dataset_id='d1')
+    model.rows.clear()
+    second = run_batch_analysis(SingleModelRegistry(model), 'model', X, ['a', 'b', 'c'], params,
+                                dataset_id='d2', lineage=[['d2', 1200], ['d1', 1000]])
+
+    # Central differences over 3 features plus the average output, on the 200 new rows only
+    assert sum(model.rows) == 200 * 7
+    assert first['rhale']['0']['updated_rows'] == 1000 and second['rhale']['0']['updated_rows'] == 200
+    curve = second['rhale']['0']['rhale_curve']
+    assert sum(curve['points_per_bin']) == 1200
+    np.testing.assert_allclose(curve['bin_effect'], 2, rtol=1e-6)
+    assert curve['avg_output'] == pytest.approx(np.mean(model.predict(X)))
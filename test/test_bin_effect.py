@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from backend.BinEffect import BinStatistics, compute_bin_effect, compute_bin_effect_batched
+
+
+def compute_bin_effect_loop(xs, df_dxs, limits):
+    """Reference per-bin mask implementation previously patched into effector"""
+    nof_bins = len(limits) - 1
+    bin_effects = np.full([nof_bins], np.nan)
+    points_per_bin = np.zeros([nof_bins], dtype=int)
+    for k in range(nof_bins):
+        indices = np.logical_and(xs >= limits[k], xs < limits[k + 1])
+        points_per_bin[k] = np.sum(indices)
+        if points_per_bin[k] > 0:
+            bin_effects[k] = np.mean(df_dxs[indices])
+    return bin_effects, points_per_bin
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_matches_loop_implementation(seed):
+    rng = np.random.default_rng(seed)
+    xs = rng.uniform(-1, 2, size=5000)
+    xs[:10] = np.nan
+    df_dxs = rng.normal(size=5000)
+    # Include empty bins, duplicated limits and points exactly on the edges
+    limits = np.sort(np.concatenate([rng.uniform(0, 1, size=40), [0.5, 0.5, 1.5, 1.5001]]))
+    xs[10:20] = limits[3]
+    xs[20:30] = limits[-1]
+
+    expected_effects, expected_points = compute_bin_effect_loop(xs, df_dxs, limits)
+    bin_effects, points_per_bin = compute_bin_effect(xs, df_dxs, limits)
+
+    np.testing.assert_array_equal(points_per_bin, expected_points)
+    np.testing.assert_allclose(bin_effects, expected_effects, rtol=1e-12, atol=0)
+    assert np.array_equal(np.isnan(bin_effects), np.isnan(expected_effects))
+
+
+def test_batched_matches_single_calls():
+    rng = np.random.default_rng(3)
+    xs_list = [rng.uniform(0, 1, size=n) for n in (100, 2000, 7)]
+    df_dxs_list = [rng.normal(size=len(xs)) for xs in xs_list]
+    limits_list = [np.linspace(0, 1, 11), np.linspace(0, 1, 101), np.array([0., 0.5, 1.])]
+
+    batched = compute_bin_effect_batched(xs_list, df_dxs_list, limits_list)
+
+    for xs, df_dxs, limits, (bin_effects, points_per_bin) in zip(xs_list, df_dxs_list, limits_list, batched):
+        expected_effects, expected_points = compute_bin_effect(xs, df_dxs, limits)
+        np.testing.assert_array_equal(points_per_bin, expected_points)
+        np.testing.assert_allclose(bin_effects, expected_effects, rtol=1e-12)
+
+
+def test_batched_shares_a_single_limits_array():
+    xs = np.array([[0.1, 0.6], [0.2, 0.9]])
+    df_dxs = np.array([[1., 3.], [5., 7.]])
+    limits = np.array([0., 0.5, 1.])
+
+    (effects_a, points_a), (effects_b, points_b) = compute_bin_effect_batched(xs, df_dxs, limits)
+
+    np.testing.assert_array_equal(effects_a, [1., 3.])
+    np.testing.assert_array_equal(effects_b, [5., 7.])
+    np.testing.assert_array_equal(points_a + points_b, [2, 2])
+
+
+def test_bin_statistics_updates_match_a_single_pass():
+    rng = np.random.default_rng(3)
+    xs = rng.uniform(0, 1, size=3000)
+    df_dxs = np.sin(6 * xs) + rng.normal(scale=0.5, size=3000)
+    limits = np.linspace(0, 1, 11)
+
+    statistics = BinStatistics(limits)
+    for chunk in np.array_split(np.arange(3000), 7):
+        statistics.update(xs[chunk], df_dxs[chunk])
+
+    ind = np.minimum((xs * 10).astype(int), 9)
+    np.testing.assert_array_equal(statistics.count, np.bincount(ind, minlength=10))
+    np.testing.assert_allclose(statistics.bin_effect(), [df_dxs[ind == k].mean() for k in range(10)])
+    np.testing.assert_allclose(statistics.bin_variance(), [df_dxs[ind == k].var() for k in range(10)])
+
+
+def test_bin_statistics_add_bins_for_points_beyond_the_limits():
+    statistics = BinStatistics([0., 1.]).update(np.array([0.2, 0.4, 1.0]), np.array([1., 3., 5.]))
+    statistics.update(np.array([-1.0, 1.5, 2.0]), np.array([4., 6., 8.]))
+
+    np.testing.assert_array_equal(statistics.limits, [-1., 0., 1., 2.])
+    np.testing.assert_array_equal(statistics.count, [1, 3, 2])
+    np.testing.assert_allclose(statistics.bin_effect(), [4., 3., 7.])
+    params = statistics.ale_params()
+    # The single-point bin takes its variance from its neighbour
+    np.testing.assert_allclose(params['bin_variance'], [8 / 3, 8 / 3, 1.])
+
+
+def test_bin_statistics_without_points_or_variance_are_rejected():
+    with pytest.raises(ValueError, match='No bin holds any points'):
+        BinStatistics([0., 0.5, 1.]).ale_params()
+    with pytest.raises(ValueError, match='at most one point'):
+        BinStatistics([0., 0.5, 1.]).update(np.array([0.2, 0.7]), np.array([1., 2.])).ale_params()
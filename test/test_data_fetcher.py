@@ -0,0 +1,122 @@
+import contextlib
+import io
+import json
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from werkzeug.datastructures import FileStorage
+
+from backend.DataModelFetcher import DataModelFetcher
+from backend.ModelDownloader import ModelDownloader
+
+
+def upload(content, filename):
+    return FileStorage(stream=io.BytesIO(content), filename=filename)
+
+
+def make_fetcher(chunk_rows):
+    fetcher = DataModelFetcher()
+    fetcher.CSV_CHUNK_ROWS = chunk_rows
+    return fetcher
+
+
+def parse(fetcher, file_data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fetcher.parse_dataset(file_data)
+
+
+def test_csv_is_streamed_in_chunks_with_mean_imputation():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'Timestamp': pd.date_range('2024-01-01', periods=250, freq='h').astype(str),
+        'a': rng.normal(size=250),
+        'flag': rng.uniform(size=250) > 0.5,
+        'label': ['x'] * 250,
+        'b': rng.integers(0, 10, size=250).astype(float)
+    })
+    df.loc[[3, 120, 240], 'a'] = np.nan
+    df.loc[200, 'b'] = np.nan
+
+    data, names = parse(make_fetcher(chunk_rows=64), upload(df.to_csv(index=False).encode(), 'data.csv'))
+
+    assert names == ['a', 'flag', 'b']
+    assert data.dtype == np.float32 and data.shape == (250, 3)
+    expected = df[['a', 'flag', 'b']].astype(float)
+    expected = expected.fillna(expected.mean()).to_numpy(dtype=np.float32)
+    np.testing.assert_allclose(data, expected, rtol=1e-6)
+
+
+def test_npy_is_memory_mapped_copy_on_write():
+    values = np.arange(12, dtype=np.float64).reshape(4, 3)
+    values[1, 2] = np.nan
+    buffer = io.BytesIO()
+    np.save(buffer, values)
+
+    data, names = parse(DataModelFetcher(), upload(buffer.getvalue(), 'data.npy'))
+
+    assert isinstance(data, np.memmap)
+    assert names == ['feature_0', 'feature_1', 'feature_2']
+    assert data[1, 2] == np.nanmean(values[:, 2])
+
+
+def test_csv_peak_memory_stays_below_one_compact_copy():
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=(100_000, 8))
+    content = pd.DataFrame(values).to_csv(index=False).encode()
+    compact_bytes = values.size * 4
+
+    tracemalloc.start()
+    data, _ = parse(make_fetcher(chunk_rows=5_000), upload(content, 'data.csv'))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert data.shape == (100_000, 8)
+    assert peak < compact_bytes
+
+
+def sample_frame():
+    return pd.DataFrame({
+        'Timestamp': ['2024-01-01'] * 4,
+        'a': [1.0, None, 3.0, 5.0],
+        'flag': [True, False, True, True],
+        'label': ['x', 'y', 'z', 'w'],
+        'n': np.arange(4, dtype=np.int64)
+    })
+
+
+def test_parquet_and_feather_project_numeric_columns():
+    for extension, write in [('parquet', 'to_parquet'), ('feather', 'to_feather')]:
+        buffer = io.BytesIO()
+        getattr(sample_frame(), write)(buffer)
+
+        data, names = parse(DataModelFetcher(), upload(buffer.getvalue(), f'data.{extension}'))
+
+        assert names == ['a', 'flag', 'n']
+        assert data.dtype == np.float32
+        np.testing.assert_allclose(data, [[1, 1, 0], [3, 0, 1], [3, 1, 2], [5, 1, 3]])
+
+
+def test_json_layouts_give_the_same_data():
+    expected = np.array([[1, 2], [3, 4], [5, 6]], dtype=np.float32)
+    layouts = {
+        'rows': [[1, 2], [3, 4], [5, 6]],
+        'data': {'data': [[1, 2], [3, 4], [5, 6]], 'feature_names': ['u', 'v']},
+        'records': [{'u': 1, 'v': 2}, {'u': 3, 'v': 4}, {'u': 5, 'v': 6}],
+        'columns': {'u': [1, 3, 5], 'v': [2, 4, 6], 'label': ['a', 'b', 'c']}
+    }
+    for layout, content in layouts.items():
+        data, names = parse(DataModelFetcher(), upload(json.dumps(content).encode(), 'data.json'))
+        np.testing.assert_array_equal(data, expected)
+        assert names == (['feature_0', 'feature_1'] if layout == 'rows' else ['u', 'v'])
+
+    lines = '\n'.join(json.dumps(record) for record in layouts['records']).encode()
+    data, names = parse(DataModelFetcher(), upload(lines, 'data.jsonl'))
+    np.testing.assert_array_equal(data, expected)
+    assert names == ['u', 'v']
+
+
+def test_download_stats_are_none_until_a_downloader_exists(tmp_path):
+    assert DataModelFetcher().stats() is None
+    downloader = ModelDownloader(str(tmp_path))
+    assert DataModelFetcher(downloader=downloader).stats() == downloader.stats()
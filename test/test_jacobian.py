@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from backend.JacobianEngine import FiniteDifferenceJacobian, KerasJacobian
+
+
+@pytest.fixture(scope='module')
+def keras_model():
+    tf.random.set_seed(0)
+    inputs = tf.keras.Input(shape=(3,))
+    hidden = tf.keras.layers.Dense(8, activation='tanh')(inputs)
+    outputs = tf.keras.layers.Dense(1)(hidden)
+    return tf.keras.Model(inputs, outputs)
+
+
+def eager_jacobian(model, x):
+    with tf.GradientTape() as tape:
+        x_tensor = tf.convert_to_tensor(x, dtype=tf.float32)
+        tape.watch(x_tensor)
+        prediction = model(x_tensor)
+    return tape.gradient(prediction, x_tensor).numpy()
+
+
+@pytest.mark.parametrize('jit_compile', [False, True])
+def test_keras_jacobian_matches_eager_tape_across_chunks(keras_model, jit_compile):
+    x = np.random.default_rng(0).normal(size=(1000, 3))
+    jacobian = KerasJacobian(keras_model, chunk_size=256, jit_compile=jit_compile)
+
+    np.testing.assert_allclose(jacobian(x), eager_jacobian(keras_model, x), rtol=1e-5, atol=1e-6)
+
+
+def test_keras_jacobian_does_not_retrace_for_new_batch_sizes(keras_model):
+    jacobian = KerasJacobian(keras_model, chunk_size=128)
+    for rows in (10, 77, 128, 300):
+        jacobian(np.random.rand(rows, 3))
+
+    assert jacobian._function.experimental_get_tracing_count() == 1
+
+
+class CountingPredict:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, x):
+        self.calls += 1
+        return 7 * x[:, 0] - 3 * x[:, 1] + x[:, 2] ** 2
+
+
+def test_finite_differences_use_one_predict_call():
+    x = np.random.default_rng(1).normal(size=(500, 3))
+    predict = CountingPredict()
+    jacobian = FiniteDifferenceJacobian(predict, step=1e-3)(x)
+
+    assert predict.calls == 1
+    np.testing.assert_allclose(jacobian[:, 0], 7, rtol=1e-6)
+    np.testing.assert_allclose(jacobian[:, 1], -3, rtol=1e-6)
+    np.testing.assert_allclose(jacobian[:, 2], 2 * x[:, 2], atol=1e-6)
+
+
+def test_forward_differences_on_feature_subset():
+    x = np.random.default_rng(2).normal(size=(50, 3))
+    jacobian = FiniteDifferenceJacobian(CountingPredict(), step=1e-6, relative_step=False,
+                                        central=False, features=[2])(x)
+
+    assert np.isnan(jacobian[:, :2]).all()
+    np.testing.assert_allclose(jacobian[:, 2], 2 * x[:, 2], atol=1e-4)
+
+
+def test_finite_differences_respect_batch_bound():
+    x = np.random.default_rng(3).normal(size=(100, 3))
+    predict = CountingPredict()
+    jacobian = FiniteDifferenceJacobian(predict, max_batch_rows=120)(x)
+
+    assert predict.calls == 5
+    np.testing.assert_allclose(jacobian[:, 0], 7, rtol=1e-6)
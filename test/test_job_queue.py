@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from backend.JobQueue import JobQueue, QueueFullError
+
+
+def wait_for(queue, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status, result, error = queue.result(job_id)
+        if status not in ('queued', 'running'):
+            return status, result, error
+        time.sleep(0.05)
+    raise TimeoutError(job_id)
+
+
+@pytest.fixture
+def sqrt_queue():
+    queue = JobQueue('math:sqrt', max_workers=1, max_queued=2)
+    yield queue
+    queue.shutdown()
+
+
+def test_jobs_run_in_worker_and_report_errors(sqrt_queue):
+    ok = sqrt_queue.submit(16.0)
+    failed = sqrt_queue.submit(-1.0)
+
+    assert sqrt_queue.wait(ok, timeout=60) == ('done', 4.0, None)
+    status, result, error = wait_for(sqrt_queue, failed)
+    assert status == 'failed' and 'math domain error' in error
+
+
+def test_queue_applies_backpressure_and_cancels_running_jobs():
+    queue = JobQueue('time:sleep', max_workers=1, max_queued=1)
+    try:
+        running = queue.submit(30)
+        while queue.status(running)['status'] != 'running':
+            time.sleep(0.05)
+        queued = queue.submit(0)
+        with pytest.raises(QueueFullError):
+            queue.submit(0)
+
+        assert queue.cancel(running)
+        assert queue.status(running)['status'] == 'cancelled'
+        # The replacement worker picks up the queued job
+        assert wait_for(queue, queued)[0] == 'done'
+        assert not queue.cancel(queued)
+    finally:
+        queue.shutdown()
+
+
+def test_dead_idle_worker_is_replaced_and_its_job_requeued(sqrt_queue):
+    assert sqrt_queue.wait(sqrt_queue.submit(4.0), timeout=60)[0] == 'done'
+    worker = sqrt_queue._workers[0]['process']
+    worker.kill()
+    worker.join()
+
+    assert sqrt_queue.wait(sqrt_queue.submit(9.0), timeout=60) == ('done', 3.0, None)
+    assert sqrt_queue._workers[0]['process'] is not worker
+
+
+def test_shutdown_cancels_running_and_queued_jobs():
+    queue = JobQueue('time:sleep', max_workers=1, max_queued=1)
+    running = queue.submit(30)
+    while queue.status(running)['status'] != 'running':
+        time.sleep(0.05)
+    queued = queue.submit(0)
+    outcomes = []
+    waiter = threading.Thread(target=lambda: outcomes.append(queue.wait(running)), daemon=True)
+    waiter.start()
+
+    queue.shutdown()
+
+    waiter.join(timeout=10)
+    assert not waiter.is_alive()
+    assert outcomes == [('cancelled', None, 'Job queue shut down')]
+    assert queue.wait(queued, timeout=10) == ('cancelled', None, 'Job queue shut down')
+    assert queue.stats()['queued'] == 0
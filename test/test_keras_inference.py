@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from backend.KerasInference import KerasInference
+
+
+@pytest.fixture(scope='module')
+def keras_model():
+    tf.random.set_seed(0)
+    inputs = tf.keras.Input(shape=(3,))
+    hidden = tf.keras.layers.Dense(8, activation='tanh')(inputs)
+    outputs = tf.keras.layers.Dense(1)(hidden)
+    return tf.keras.Model(inputs, outputs)
+
+
+@pytest.mark.parametrize('jit_compile', [False, True])
+def test_inference_matches_predict_across_chunks(keras_model, jit_compile):
+    x = np.random.default_rng(0).normal(size=(1000, 3))
+    inference = KerasInference(keras_model, max_batch=256, jit_compile=jit_compile)
+
+    np.testing.assert_allclose(inference(x), keras_model.predict(x, verbose=0), rtol=1e-5, atol=1e-6)
+
+
+def test_inference_does_not_retrace_for_new_batch_sizes(keras_model):
+    inference = KerasInference(keras_model, max_batch=128)
+    for rows in (1, 10, 77, 128, 300):
+        assert inference(np.random.rand(rows, 3)).shape == (rows, 1)
+
+    assert inference.tracing_count() == 1
+    assert inference.stats()['rows'] == inference.stats()['padded_rows'] == 516
+
+
+def test_xla_inference_pads_to_a_few_buckets(keras_model):
+    inference = KerasInference(keras_model, max_batch=128, jit_compile=True)
+    for rows in (1, 20, 33, 50, 64, 100):
+        inference(np.random.rand(rows, 3))
+
+    # Buckets of 32, 64 and 128 rows
+    assert inference.stats()['padded_rows'] == 32 + 32 + 64 + 64 + 64 + 128
@@ -0,0 +1,33 @@
+import numpy as np
+
+from backend.Metrics import Histogram, Metrics, request_profile
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.1, 1, 10))
+    for value in (0.05, 0.5, 0.5, 5, 50):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 5 and snapshot['max'] == 50
+    assert snapshot['buckets'] == {'0.1': 1, '1': 2, '10': 1, '+Inf': 1}
+    assert histogram.quantile(0.5) == 1
+
+
+def test_timed_predict_counts_calls_and_rows_in_the_request_profile():
+    metrics = Metrics()
+    predict = metrics.timed_predict(lambda x: x.sum(axis=1))
+
+    with request_profile() as profile:
+        predict(np.ones((10, 2)))
+        predict(np.ones((5, 2)))
+        with metrics.timed('fit'):
+            pass
+    predict(np.ones((1, 2)))
+
+    assert profile['predict']['count'] == 2 and profile['counters']['predict_rows'] == 15
+    assert profile['fit']['count'] == 1 and profile['total_seconds'] >= 0
+    snapshot = metrics.snapshot()
+    assert snapshot['stages']['predict']['count'] == 3
+    assert snapshot['counters']['predict_rows'] == 16
+    assert 'effector_predict_seconds_bucket{le="+Inf"} 3' in metrics.prometheus()
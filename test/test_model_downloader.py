@@ -0,0 +1,61 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.ModelDownloader import DownloadTooLargeError, ModelDownloader
+
+BODY = b'model' * 100_000
+
+
+class ModelHandler(BaseHTTPRequestHandler):
+    """Serves BODY with an ETag and records every request"""
+
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get('If-None-Match')))
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), ModelHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    ModelHandler.requests_seen = []
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_download_is_streamed_and_revalidated_with_etag(server, tmp_path):
+    downloader = ModelDownloader(str(tmp_path))
+    downloader.CHUNK_SIZE = 4096
+    url = f'{server}/models/net.keras?token=abc'
+
+    assert downloader.read(url) == (BODY, 'keras')
+    assert downloader.read(url) == (BODY, 'keras')
+
+    assert [etag for _, etag in ModelHandler.requests_seen] == [None, '"v1"']
+    stats = downloader.stats()
+    assert stats['downloads'] == 1 and stats['revalidations'] == 1
+
+
+def test_downloads_over_the_size_limit_are_rejected(server, tmp_path):
+    downloader = ModelDownloader(str(tmp_path), max_bytes=1000)
+
+    with pytest.raises(DownloadTooLargeError):
+        downloader.download(f'{server}/model.pkl')
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,89 @@
+from functools import reduce
+
+import numpy as np
+import pytest
+
+from backend.ModelWrapper import ModelWrapper
+
+
+class RecordingRegressor:
+    """Stand-in for the native CatBoost regressor that records its input"""
+
+    def predict(self, features):
+        self.features = features
+        return features.sum(axis=1)
+
+
+class CatBoostModel:
+    """Stand-in for a fitted Darts CatBoostModel with target and future covariate lags"""
+
+    def __init__(self):
+        self.lags = {'target': [-2, -1], 'future': [-1, 0]}
+        self.model = RecordingRegressor()
+
+
+def make_wrapper():
+    wrapper = ModelWrapper(CatBoostModel())
+    wrapper.input_chunk_length = 2
+    wrapper.n_covariates = 2
+    return wrapper
+
+
+def test_batched_predict_returns_one_prediction_per_row():
+    wrapper = make_wrapper()
+    X = np.arange(15, dtype=float).reshape(5, 3)
+
+    predictions = wrapper.predict(X)
+
+    assert predictions.shape == (5,)
+    features = wrapper.model.model.features
+    # Row 3: target lags -2, -1 -> rows 2, 3; covariate lag -1 -> row 3; lag 0 reuses row 3
+    np.testing.assert_array_equal(features[3], [X[2, -1], X[3, -1], X[3, 0], X[3, 1], X[3, 0], X[3, 1]])
+    # Row 0 has no history and is padded with its own values
+    np.testing.assert_array_equal(features[0], [X[0, -1], X[0, -1], X[0, 0], X[0, 1], X[0, 0], X[0, 1]])
+    np.testing.assert_allclose(predictions, features.sum(axis=1))
+
+
+def test_sliding_windows_are_a_view():
+    wrapper = make_wrapper()
+    X = np.random.rand(10, 3)
+
+    windows = wrapper._sliding_windows(X)
+
+    assert windows.shape == (10, 3, 2)
+    assert not windows.flags.owndata
+    np.testing.assert_array_equal(windows[4, :, -1], X[4])
+
+
+def legacy_time_series(wrapper, X):
+    """The original DataFrame-based construction: one series per column, concatenated"""
+    darts = pytest.importorskip('darts')
+    pd = pytest.importorskip('pandas')
+    dates = pd.date_range(end=pd.Timestamp.now(), periods=len(X), freq='h')
+    target = darts.TimeSeries.from_dataframe(
+        pd.DataFrame(X[:, wrapper.target_idx].reshape(-1, 1), index=dates, columns=['target']),
+        freq='h', fill_missing_dates=True
+    )
+    covariates = [
+        darts.TimeSeries.from_dataframe(
+            pd.DataFrame(X[:, i].reshape(-1, 1), index=dates, columns=[f'feature_{i}']),
+            freq='h', fill_missing_dates=True
+        )
+        for i in range(wrapper.n_covariates)
+    ]
+    return target, reduce(lambda x, y: x.concatenate(y, axis=1), covariates)
+
+
+def test_time_series_match_the_legacy_construction():
+    pytest.importorskip('darts')
+    wrapper = make_wrapper()
+    X = np.random.rand(48, 3)
+
+    legacy_target, legacy_covariates = legacy_time_series(wrapper, X)
+    target, covariates = wrapper._create_time_series(X)
+
+    np.testing.assert_array_equal(target.values(), legacy_target.values())
+    np.testing.assert_array_equal(covariates.values(), legacy_covariates.values())
+    assert list(covariates.components) == list(legacy_covariates.components)
+    # The date index is built once per length
+    assert wrapper._date_index(48) is wrapper._date_index(48)
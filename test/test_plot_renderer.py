@@ -0,0 +1,58 @@
+import io
+
+import numpy as np
+import pytest
+
+from backend.PlotRenderer import PlotRenderer, render_curve
+
+CURVE = {
+    'x': np.linspace(0, 1, 11),
+    'y': np.linspace(-1, 1, 11),
+    'std': np.full(11, 0.1),
+    'bin_limits': np.linspace(0, 1, 11),
+    'bin_effect': np.full(10, 2.0),
+    'bin_std': [0.1] * 9 + [None],
+    'avg_output': 0.5
+}
+
+
+def test_render_formats():
+    png = render_curve(CURVE, 'rhale', feature_name='a', dpi=50)
+    webp = render_curve(CURVE, 'rhale', image_format='webp', dpi=50)
+    compressed = render_curve(CURVE, 'regional_rhale', compress=True, dpi=50)
+
+    assert png.startswith(b'\x89PNG')
+    assert webp[:4] == b'RIFF' and webp[8:12] == b'WEBP'
+    assert compressed.startswith(b'\x89PNG') and len(compressed) < len(png)
+    with pytest.raises(ValueError):
+        render_curve(CURVE, 'pdp', image_format='gif')
+
+
+def test_webp_does_not_need_matplotlib_webp_support(monkeypatch):
+    from matplotlib.figure import Figure
+    from PIL import Image
+
+    savefig = Figure.savefig
+
+    def savefig_without_webp(self, fname, **kwargs):
+        # Matplotlib before 3.6 cannot save WebP
+        if kwargs.get('format') == 'webp':
+            raise ValueError("Format 'webp' is not supported")
+        return savefig(self, fname, **kwargs)
+
+    monkeypatch.setattr(Figure, 'savefig', savefig_without_webp)
+    png = render_curve(CURVE, 'pdp', dpi=50)
+    for compress in (False, True):
+        webp = render_curve(CURVE, 'pdp', image_format='webp', compress=compress, dpi=50)
+        assert Image.open(io.BytesIO(webp)).size == Image.open(io.BytesIO(png)).size
+
+
+def test_pool_and_inline_renderers_agree():
+    curve = {key: CURVE[key] for key in ('x', 'y', 'std')}
+    pool = PlotRenderer(max_workers=1, dpi=40)
+    try:
+        pooled = pool.render(curve, 'pdp', title='PDP plot')
+    finally:
+        pool.shutdown()
+
+    assert pooled == PlotRenderer(max_workers=0, dpi=40).render(curve, 'pdp', title='PDP plot')
@@ -0,0 +1,49 @@
+import numpy as np
+
+from backend.PredictionCache import PredictionCache
+from stubs import CountingModel
+
+
+def row_sums(x):
+    return x.sum(axis=1, keepdims=True)
+
+
+def test_repeated_rows_only_reach_the_model_once():
+    model = CountingModel(row_sums)
+    cache = PredictionCache(model.predict)
+    x = np.random.default_rng(0).normal(size=(50, 3))
+    batch = np.concatenate([x, x[:10]])
+
+    np.testing.assert_allclose(cache(batch), batch.sum(axis=1, keepdims=True))
+    grid = x.copy()
+    grid[:, 0] = 1.0
+    np.testing.assert_allclose(cache(np.concatenate([x, grid])), np.concatenate([x, grid]).sum(axis=1, keepdims=True))
+
+    assert model.rows == [50, 50]
+    stats = cache.stats()
+    assert stats['hits'] == 10 + 50 and stats['misses'] == 100
+
+
+def test_lru_is_bounded_by_rows():
+    model = CountingModel(row_sums)
+    cache = PredictionCache(model.predict, max_rows=20)
+    x = np.arange(60, dtype=float).reshape(30, 2)
+
+    cache(x)
+    cache(x[-10:])
+    cache(x[:5])
+
+    assert model.rows == [30, 5]
+    assert cache.stats()['rows'] == 20
+
+
+def test_sequence_models_cache_whole_blocks():
+    model = CountingModel(row_sums)
+    cache = PredictionCache(model.predict, rows_independent=False)
+    x = np.ones((8, 2))
+
+    cache(x)
+    cache(x)
+    cache(x[:4])
+
+    assert model.rows == [8, 4]
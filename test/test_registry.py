@@ -0,0 +1,140 @@
+import io
+
+import numpy as np
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from backend.DatasetStore import DatasetStore
+from backend.LRUCache import LRUCache
+from backend.ModelRegistry import ModelRegistry
+
+
+class CountingFetcher:
+    """Stand-in for DataModelFetcher that records how often it loads or parses"""
+
+    def __init__(self):
+        self.loads = 0
+
+    def load_model(self, model_bytes, file_extension):
+        self.loads += 1
+        return {'bytes': model_bytes, 'ext': file_extension}
+
+    def parse_dataset(self, file_data):
+        self.loads += 1
+        return np.loadtxt(file_data, delimiter=',', skiprows=1, ndmin=2), ['x1', 'x2']
+
+
+def csv_upload(text):
+    return FileStorage(stream=io.BytesIO(text.encode()), filename='data.csv')
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_items=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert 'b' not in cache
+    assert cache.keys() == ['a', 'c']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_cache_respects_byte_bound():
+    cache = LRUCache(max_bytes=100)
+    cache.put('a', 'x', nbytes=60)
+    cache.put('b', 'y', nbytes=60)
+
+    assert 'a' not in cache
+    assert cache.total_bytes == 60
+
+
+def test_registry_loads_identical_model_once():
+    fetcher = CountingFetcher()
+    registry = ModelRegistry(data_fetcher=fetcher)
+
+    first = registry.register(b'model-bytes', 'pkl')
+    second = registry.register(b'model-bytes', 'pkl')
+
+    assert first == second
+    assert fetcher.loads == 1
+    assert registry.get(first)['ext'] == 'pkl'
+
+
+def test_registry_evicts_and_reports_unknown_ids():
+    registry = ModelRegistry(data_fetcher=CountingFetcher(), max_models=1)
+    first = registry.register(b'one', 'pkl')
+    registry.register(b'two', 'pkl')
+
+    with pytest.raises(KeyError):
+        registry.get(first)
+
+
+def test_registry_artifacts_are_created_once():
+    registry = ModelRegistry(data_fetcher=CountingFetcher())
+    model_id = registry.register(b'model', 'h5')
+    calls = []
+
+    def factory(model):
+        calls.append(model)
+        return object()
+
+    assert registry.artifact(model_id, 'jacobian', factory) is registry.artifact(model_id, 'jacobian', factory)
+    assert len(calls) == 1
+
+
+def test_dataset_store_parses_identical_upload_once():
+    fetcher = CountingFetcher()
+    store = DatasetStore(data_fetcher=fetcher)
+
+    first = store.add(csv_upload('x1,x2\n1,2\n3,4\n'))
+    second = store.add(csv_upload('x1,x2\n1,2\n3,4\n'))
+    data, feature_names = store.get(first)
+
+    assert first == second
+    assert fetcher.loads == 1
+    assert data.shape == (2, 2)
+    assert feature_names == ['x1', 'x2']
+
+
+def test_dataset_store_evicts_by_bytes():
+    store = DatasetStore(data_fetcher=CountingFetcher(), max_bytes=32)
+    first = store.put('a', np.zeros((2, 2)), ['x1', 'x2'])
+    store.put('b', np.zeros((2, 2)), ['x1', 'x2'])
+
+    assert first not in store
+    assert 'b' in store
+
+
+def test_stores_share_datasets_and_models_through_a_directory(tmp_path):
+    writer = DatasetStore(data_fetcher=CountingFetcher(), shared_dir=str(tmp_path / 'datasets'))
+    dataset_id = writer.add(csv_upload('x1,x2\n1,2\n3,4\n'))
+
+    # Another process: same directory, empty caches
+    fetcher = CountingFetcher()
+    reader = DatasetStore(data_fetcher=fetcher, shared_dir=str(tmp_path / 'datasets'))
+    assert dataset_id in reader
+    data, feature_names = reader.get(dataset_id)
+    assert isinstance(data, np.memmap) and data.tolist() == [[1, 2], [3, 4]]
+    assert feature_names == ['x1', 'x2'] and fetcher.loads == 0
+    assert reader.shared_path('../' + dataset_id) is None
+
+    model_id = ModelRegistry(data_fetcher=CountingFetcher(), shared_dir=str(tmp_path / 'models')).register(b'm', 'pkl')
+    registry = ModelRegistry(data_fetcher=fetcher, shared_dir=str(tmp_path / 'models'))
+    assert model_id in registry
+    assert registry.get(model_id) == {'bytes': b'm', 'ext': 'pkl'} and fetcher.loads == 1
+
+
+def test_dataset_store_appends_rows_and_records_lineage():
+    store = DatasetStore(data_fetcher=CountingFetcher())
+    parent = store.add(csv_upload('x1,x2\n1,2\n3,4\n'))
+
+    child = store.append(parent, csv_upload('x1,x2\n5,6\n'))
+    data, _ = store.get(child)
+
+    assert data.tolist() == [[1, 2], [3, 4], [5, 6]]
+    assert store.lineage(child) == [[child, 3], [parent, 2]]
+    assert store.describe(child)['parent_id'] == parent
+    assert store.append(parent, csv_upload('x1,x2\n5,6\n')) == child
+    with pytest.raises(ValueError):
+        store.append(parent, csv_upload('x1\n5\n'))
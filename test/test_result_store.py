@@ -0,0 +1,53 @@
+import numpy as np
+from werkzeug.datastructures import MultiDict
+
+from backend.Analysis import parse_batch_params, run_batch_analysis
+from backend.ResultStore import ResultStore, result_key
+from stubs import CountingModel, SingleModelRegistry
+
+
+def test_results_persist_across_instances(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    key = result_key('analysis', model_id='m', feature_index=1)
+    store = ResultStore(path)
+    store.put(key, {'curve': np.arange(3.)})
+    store.close()
+
+    reopened = ResultStore(path)
+    np.testing.assert_array_equal(reopened.get(key)['curve'], [0., 1., 2.])
+    assert reopened.get(result_key('analysis', model_id='m', feature_index=2)) is None
+    assert reopened.stats()['hits'] == 1 and reopened.stats()['misses'] == 1
+
+
+def test_least_recently_used_entries_are_evicted_by_size(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.sqlite'), max_bytes=2500)
+    store.put('a', b'x' * 1000)
+    store.put('b', b'x' * 1000)
+    store.get('a')
+    store.put('c', b'x' * 1000)
+
+    assert 'a' in store and 'c' in store and 'b' not in store
+    assert store.stats()['evictions'] == 1
+
+
+def test_repeated_analysis_is_served_from_the_store(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.sqlite'))
+    X = np.random.default_rng(0).uniform(size=(300, 2))
+    params = parse_batch_params(MultiDict({'methods': 'pdp,rhale', 'output': 'curves'}), 2)
+
+    model = CountingModel()
+    first = run_batch_analysis(SingleModelRegistry(model), 'model', X, ['a', 'b'], params,
+                               dataset_id='data', result_store=store)
+    assert model.calls > 0
+
+    model.calls = 0
+    second = run_batch_analysis(SingleModelRegistry(model), 'model', X, ['a', 'b'], params,
+                                dataset_id='data', result_store=store)
+    assert model.calls == 0
+    assert second == first
+
+    # Forcing a recomputation still refreshes the store
+    params['use_cache'] = False
+    run_batch_analysis(SingleModelRegistry(model), 'model', X, ['a', 'b'], params,
+                       dataset_id='data', result_store=store)
+    assert model.calls > 0
@@ -0,0 +1,57 @@
+import io
+from urllib.parse import urlencode
+
+from backend.Server import Router, routing_key
+
+
+class StubPool:
+    def __init__(self, n_workers):
+        self.workers = [{'index': index, 'inflight': 0, 'requests': 0} for index in range(n_workers)]
+
+
+def form_environ(fields, query=''):
+    body = urlencode(fields).encode()
+    return {
+        'REQUEST_METHOD': 'POST',
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body)
+    }, body
+
+
+def test_routing_key_prefers_model_id():
+    environ, body = form_environ({'dataset_id': 'd1', 'model_id': 'm1', 'method': 'pdp'})
+    assert routing_key(environ, body) == 'm1'
+
+    environ, body = form_environ({'method': 'pdp'}, query='dataset_id=d2')
+    assert routing_key(environ, body) == 'd2'
+    assert routing_key({'QUERY_STRING': ''}, b'') is None
+
+
+def test_router_keeps_affinity_until_the_worker_is_busy():
+    pool = StubPool(4)
+    router = Router(pool, spill_inflight=2)
+
+    preferred = router.pick('/analyze', 'model-a')
+    assert all(router.pick('/analyze', 'model-a') is preferred for _ in range(5))
+
+    preferred['inflight'] = 2
+    assert router.pick('/analyze', 'model-a') is not preferred
+
+    # Jobs always go back to the worker that owns them, busy or not
+    assert router.pick(f"/jobs/w{preferred['index']}-abc", None) is preferred
+
+
+def test_large_chunked_bodies_are_rejected_before_routing(monkeypatch):
+    monkeypatch.setattr('backend.Server.ROUTING_BODY_BYTES', 16)
+    environ = {'REQUEST_METHOD': 'POST', 'QUERY_STRING': '', 'wsgi.input_terminated': True,
+               'wsgi.input': io.BytesIO(b'x' * 1000)}
+    statuses = []
+
+    response = Router(StubPool(2))(environ, lambda status, headers: statuses.append(status))
+
+    assert statuses == ['411 Length Required']
+    assert b'16 bytes' in b''.join(response)
+    # Only the limit and one more byte were read
+    assert environ['wsgi.input'].tell() == 17
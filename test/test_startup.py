@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+from backend.Startup import import_times, lazy_import, preload
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_lazy_module_imports_on_first_attribute_access(tmp_path, monkeypatch):
+    (tmp_path / 'startup_probe.py').write_text('VALUE = 42\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    calls = []
+
+    module = lazy_import('startup_probe', on_import=calls.append)
+    assert 'startup_probe' not in sys.modules
+
+    assert module.VALUE == 42 and module.VALUE == 42
+    assert len(calls) == 1 and calls[0] is sys.modules['startup_probe']
+    assert 'startup_probe' in import_times()
+    monkeypatch.delitem(sys.modules, 'startup_probe')
+
+
+def test_preload_skips_missing_modules():
+    report = preload(modules=('json', 'no_such_module_for_preload'))
+
+    assert report['ready'] and report['preload']['state'] == 'done'
+    assert report['preload']['errors'] == ["no_such_module_for_preload: No module named 'no_such_module_for_preload'"]
+
+
+def test_server_starts_without_heavy_imports():
+    heavy = ('tensorflow', 'effector', 'matplotlib', 'darts')
+    code = f"import sys, backend.main; print([m for m in {heavy!r} if m in sys.modules])"
+    env = {**os.environ, 'RESULT_STORE_PATH': '', 'PRELOAD_MODULES': ''}
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    assert output.strip().splitlines()[-1] == '[]'
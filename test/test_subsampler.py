@@ -0,0 +1,31 @@
+import numpy as np
+
+from backend.Subsampler import Subsampler, rows_within_budget
+
+
+def test_samples_are_reproducible_and_sorted():
+    X = np.random.default_rng(0).normal(size=(1000, 2))
+    for strategy in ('uniform', 'stratified'):
+        rows = Subsampler(strategy, seed=3).indices(X, 100, feature=0)
+        assert len(rows) == len(np.unique(rows)) == 100
+        assert np.all(np.diff(rows) > 0)
+        np.testing.assert_array_equal(rows, Subsampler(strategy, seed=3).indices(X, 100, feature=0))
+    assert Subsampler().indices(X, 'all') is None
+    assert Subsampler().indices(X, 5000) is None
+
+
+def test_stratified_sample_covers_every_quantile_bin():
+    values = np.concatenate([np.zeros(900), np.linspace(1, 2, 100)])
+    X = np.random.default_rng(1).permutation(values)[:, None]
+
+    rows = Subsampler('stratified').indices(X, 50, feature=0)
+
+    # The top 10% of the feature gets its share of the sample
+    assert np.sum(X[rows, 0] >= 1) == 5
+
+
+def test_time_budget_scales_with_model_cost():
+    X = np.ones((512, 2))
+    cheap = rows_within_budget(lambda x: x.sum(axis=1), X, 10, budget_seconds=1.0)
+    slow = rows_within_budget(lambda x: [sum(sum(row) for _ in range(200)) for row in x], X, 10, budget_seconds=1.0)
+    assert slow < cheap